@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
+from operaciones import consumo
 from operaciones.models import Transaccion
 from django.utils import timezone
 import json
@@ -136,6 +137,8 @@ def cambiar_estado_transaccion(request):
         
     except Transaccion.DoesNotExist:
         return JsonResponse({"success": False, "error": "Transacción no encontrada"}, status=404)
+    except consumo.LimiteExcedido as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=409)
     except ValueError as e:
         return JsonResponse({"success": False, "error": str(e)}, status=400)
     except json.JSONDecodeError:
@@ -5,5 +5,5 @@ class CotizacionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cotizaciones'
 
-
-
+    def ready(self):
+        import cotizaciones.signals  # velas OHLC de las tasas
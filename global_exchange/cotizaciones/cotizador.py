@@ -0,0 +1,210 @@
+"""
+Motor de cotización (cotizaciones).
+
+Concentra en un único lugar la fórmula de precios que antes se repetía, con
+floats, en ``usuarios.views.home``, ``usuarios.views.pagina_aterrizaje`` y
+``operaciones.views.simulador_operaciones``:
+
+    TC_VTA  = PB_MONEDA + COMISION_VTA - COMISION_VTA * descuento / 100
+    TC_COMP = PB_MONEDA - (COMISION_COM - COMISION_COM * descuento / 100)
+
+Todos los cálculos se hacen con ``Decimal``. Las cotizaciones de un libro de
+tasas se calculan en una sola pasada y se memorizan sobre la instantánea
+(que es inmutable) por descuento, de modo que las peticiones siguientes con
+la misma versión del libro no vuelven a recorrer las tasas.
+
+Las comisiones y la fórmula están en guaraníes por unidad de la moneda
+destino, así que ``cotizar`` (indexado por moneda destino) sólo toma los
+pares cuyo origen es ``MONEDA_BASE``; ``cotizar_pares`` cotiza todos los
+pares del libro indexados por ``(origen, destino)``.
+
+Funciones públicas:
+    cotizar(libro, descuento)               -> {destino: Cotizacion}  (origen PYG)
+    cotizar_pares(libro, descuento)         -> {(origen, destino): Cotizacion}
+    cotizar_tasa(tasa, descuento)           -> Cotizacion
+    memorizar(libro, clave, calcular_valor) -> valor memorizado en la instantánea
+    calcular(cotizacion, operacion, monto)  -> ResultadoOperacion | None
+    cotizar_lote(libro, descuento, montos, monedas, operacion)
+                                            -> {destino: [ResultadoOperacion | None, ...]}
+"""
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+CENTIMOS = Decimal("0.01")
+CIEN = Decimal("100")
+CERO = Decimal("0")
+
+#: Moneda en la que están expresados los precios de las tasas.
+MONEDA_BASE = "PYG"
+
+#: Monto máximo que se cotiza: lo que entra en ``Transaccion.monto`` (15 dígitos
+#: enteros). Con montos mayores ``redondear`` supera la precisión de Decimal.
+MONTO_MAXIMO = Decimal("1e15")
+
+#: Precios de una moneda para un descuento dado.
+Cotizacion = namedtuple("Cotizacion", [
+    "moneda",
+    "tasa_id",
+    "vigencia",
+    "precio_base",
+    "comision_compra",
+    "comision_venta",
+    "venta",
+    "compra",
+    "venta_sin_descuento",
+    "compra_sin_descuento",
+    "descuento",
+])
+
+#: Resultado de convertir un monto con una cotización.
+ResultadoOperacion = namedtuple("ResultadoOperacion", [
+    "monto",
+    "resultado",
+    "resultado_sin_desc",
+    "ganancia",
+    "tasa",
+])
+
+
+def redondear(valor):
+    """Redondea a 2 decimales con ROUND_HALF_UP."""
+    return valor.quantize(CENTIMOS, rounding=ROUND_HALF_UP)
+
+
+def _decimal(valor):
+    if valor is None:
+        return CERO
+    if isinstance(valor, Decimal):
+        return valor
+    return Decimal(str(valor))
+
+
+def cotizar_tasa(tasa, descuento=0):
+    """
+    Calcula los precios de compra y venta de una tasa.
+
+    :param tasa: Objeto con ``precio_base``, ``comision_compra``, ``comision_venta``,
+        ``destino`` (o ``moneda_destino``), ``id`` y ``vigencia``.
+    :param descuento: Porcentaje de descuento sobre las comisiones (segmentación).
+    :rtype: Cotizacion
+    """
+    descuento = _decimal(descuento)
+    factor = 1 - descuento / CIEN
+    precio_base = _decimal(tasa.precio_base)
+    comision_compra = _decimal(tasa.comision_compra)
+    comision_venta = _decimal(tasa.comision_venta)
+    moneda = getattr(tasa, "destino", None) or tasa.moneda_destino.abreviacion
+    return Cotizacion(
+        moneda=moneda,
+        tasa_id=tasa.id,
+        vigencia=tasa.vigencia,
+        precio_base=precio_base,
+        comision_compra=comision_compra,
+        comision_venta=comision_venta,
+        venta=precio_base + comision_venta * factor,
+        compra=precio_base - comision_compra * factor,
+        venta_sin_descuento=precio_base + comision_venta,
+        compra_sin_descuento=precio_base - comision_compra,
+        descuento=descuento,
+    )
+
+
+def memorizar(libro, clave, calcular_valor):
+    """
+    Calcula ``calcular_valor()`` una sola vez por instantánea del libro y clave.
+
+    El libro es inmutable y se reemplaza al cambiar de versión, así que lo
+    memorizado se descarta junto con él.
+    """
+    memo = libro.__dict__.setdefault("_memo_cotizador", {})
+    if clave not in memo:
+        memo[clave] = calcular_valor()
+    return memo[clave]
+
+
+def cotizar_pares(libro, descuento=0):
+    """
+    Cotiza, en una sola pasada, la tasa vigente de cada par del libro.
+
+    :param libro: Instantánea de ``cotizaciones.libro_tasas``.
+    :param descuento: Porcentaje de descuento del segmento del cliente.
+    :return: Diccionario ``{(origen, destino): Cotizacion}`` en el orden del libro.
+    """
+    descuento = _decimal(descuento)
+    return memorizar(libro, ("cotizar_pares", descuento), lambda: {
+        par: cotizar_tasa(tasa, descuento)
+        for par, tasa in libro.actuales().items()
+    })
+
+
+def cotizar(libro, descuento=0):
+    """
+    Cotizaciones contra el guaraní: la tasa vigente de cada par
+    ``(MONEDA_BASE, destino)`` del libro.
+
+    Los pares con otro origen quedan fuera (para ellos ver ``cotizar_pares``);
+    si no, dos pares con el mismo destino se pisarían en el diccionario.
+
+    :param libro: Instantánea de ``cotizaciones.libro_tasas``.
+    :param descuento: Porcentaje de descuento del segmento del cliente.
+    :return: Diccionario ``{abreviacion_destino: Cotizacion}`` en el orden del libro.
+    """
+    descuento = _decimal(descuento)
+    return memorizar(libro, ("cotizar", descuento), lambda: {
+        destino: cotizacion
+        for (origen, destino), cotizacion in cotizar_pares(libro, descuento).items()
+        if origen == MONEDA_BASE
+    })
+
+
+def calcular(cotizacion, operacion, monto):
+    """
+    Convierte un monto con una cotización.
+
+    - ``venta``: el cliente entrega PYG y recibe la moneda extranjera.
+    - ``compra``: el cliente entrega la moneda extranjera y recibe PYG.
+
+    :return: ``ResultadoOperacion`` con valores redondeados a 2 decimales, o
+        ``None`` si la tasa aplicable es cero.
+    :rtype: ResultadoOperacion | None
+    """
+    monto = _decimal(monto)
+    if operacion == "venta":
+        if not cotizacion.venta or not cotizacion.venta_sin_descuento:
+            return None
+        resultado = redondear(monto / cotizacion.venta)
+        return ResultadoOperacion(
+            monto=monto,
+            resultado=resultado,
+            resultado_sin_desc=redondear(monto / cotizacion.venta_sin_descuento),
+            ganancia=redondear(monto - resultado * cotizacion.precio_base),
+            tasa=cotizacion.venta,
+        )
+    factor = 1 - cotizacion.descuento / CIEN
+    return ResultadoOperacion(
+        monto=monto,
+        resultado=redondear(monto * cotizacion.compra),
+        resultado_sin_desc=redondear(monto * cotizacion.compra_sin_descuento),
+        ganancia=redondear(monto * cotizacion.comision_compra * factor),
+        tasa=cotizacion.compra,
+    )
+
+
+def cotizar_lote(libro, descuento, montos, monedas=None, operacion="venta"):
+    """
+    Cotiza N montos contra M monedas de una sola vez.
+
+    :param montos: Iterable de montos (Decimal, int, float o str numérico).
+    :param monedas: Abreviaciones a cotizar; por defecto todas las del libro.
+    :return: ``{abreviacion: [ResultadoOperacion | None, ...]}`` con un resultado
+        por monto, en el mismo orden. Las monedas sin tasa quedan fuera.
+    """
+    cotizaciones = cotizar(libro, descuento)
+    montos = [_decimal(m) for m in montos]
+    if monedas is None:
+        monedas = cotizaciones.keys()
+    return {
+        moneda: [calcular(cotizaciones[moneda], operacion, monto) for monto in montos]
+        for moneda in monedas
+        if moneda in cotizaciones
+    }
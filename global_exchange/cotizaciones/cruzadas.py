@@ -0,0 +1,126 @@
+"""
+Tasas cruzadas (cotizaciones).
+
+Todas las tasas del libro están expresadas contra la moneda base (PYG). Una
+operación ``cambio`` entre dos monedas extranjeras (p. ej. USD → BRL) se
+resuelve pasando por la base, con las comisiones de los dos tramos:
+
+    1. la casa compra la moneda de origen:   PYG = monto * TC_COMP(origen)
+    2. la casa vende la moneda de destino:   resultado = PYG / TC_VTA(destino)
+
+    tasa cruzada = TC_COMP(origen) / TC_VTA(destino)   (destino por unidad de origen)
+
+La matriz N×N (incluida la base, cuyo tramo vale 1) se arma una sola vez por
+versión del libro y descuento, y queda memorizada sobre la instantánea; cotizar
+un par es una búsqueda en un diccionario.
+
+Funciones públicas:
+    matriz(libro, descuento)                  -> {(origen, destino): Cruce}
+    cruzar(libro, origen, destino, descuento) -> Cruce | None
+    calcular_cruce(cruce, monto)              -> ResultadoOperacion
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from .cotizador import MONEDA_BASE, ResultadoOperacion, _decimal, cotizar, memorizar, redondear
+
+UNO = Decimal("1")
+
+#: Conversión directa entre dos monedas. ``entrada``/``salida`` son los PYG por
+#: unidad de cada tramo (con descuento); ``tasa`` = ``entrada / salida``.
+Cruce = namedtuple("Cruce", [
+    "origen",
+    "destino",
+    "tasa",
+    "tasa_sin_descuento",
+    "entrada",
+    "salida",
+    "entrada_sin_descuento",
+    "salida_sin_descuento",
+    "precio_base_origen",
+    "precio_base_destino",
+    "tasa_origen_id",
+    "tasa_destino_id",
+    "vigencia",
+])
+
+#: Tramo de una moneda contra la base.
+_Tramo = namedtuple("_Tramo", ["compra", "venta", "compra_sin_descuento", "venta_sin_descuento",
+                               "precio_base", "tasa_id", "vigencia"])
+
+_TRAMO_BASE = _Tramo(UNO, UNO, UNO, UNO, UNO, None, None)
+
+
+def _tramos(libro, descuento):
+    tramos = {MONEDA_BASE: _TRAMO_BASE}
+    for moneda, cot in cotizar(libro, descuento).items():
+        if moneda == MONEDA_BASE:
+            continue
+        tramos[moneda] = _Tramo(
+            cot.compra, cot.venta, cot.compra_sin_descuento, cot.venta_sin_descuento,
+            cot.precio_base, cot.tasa_id, cot.vigencia,
+        )
+    return tramos
+
+
+def matriz(libro, descuento=0):
+    """
+    Matriz de conversión entre todas las monedas del libro (incluida la base).
+
+    Los pares cuyo tramo de destino tiene precio de venta cero quedan fuera.
+
+    :return: ``{(origen, destino): Cruce}``
+    """
+    descuento = _decimal(descuento)
+
+    def construir():
+        tramos = _tramos(libro, descuento)
+        cruces = {}
+        for origen, entrada in tramos.items():
+            for destino, salida in tramos.items():
+                if origen == destino or not salida.venta or not salida.venta_sin_descuento:
+                    continue
+                vigencias = [v for v in (entrada.vigencia, salida.vigencia) if v is not None]
+                cruces[(origen, destino)] = Cruce(
+                    origen=origen,
+                    destino=destino,
+                    tasa=entrada.compra / salida.venta,
+                    tasa_sin_descuento=entrada.compra_sin_descuento / salida.venta_sin_descuento,
+                    entrada=entrada.compra,
+                    salida=salida.venta,
+                    entrada_sin_descuento=entrada.compra_sin_descuento,
+                    salida_sin_descuento=salida.venta_sin_descuento,
+                    precio_base_origen=entrada.precio_base,
+                    precio_base_destino=salida.precio_base,
+                    tasa_origen_id=entrada.tasa_id,
+                    tasa_destino_id=salida.tasa_id,
+                    vigencia=max(vigencias) if vigencias else None,
+                )
+        return cruces
+
+    return memorizar(libro, ("matriz_cruzada", descuento), construir)
+
+
+def cruzar(libro, origen, destino, descuento=0):
+    """Conversión directa ``origen`` → ``destino`` o ``None`` si falta alguna tasa."""
+    return matriz(libro, descuento).get((origen, destino))
+
+
+def calcular_cruce(cruce, monto):
+    """
+    Convierte un monto de ``cruce.origen`` a ``cruce.destino``.
+
+    La ganancia (en PYG) es la suma de los márgenes de los dos tramos:
+    ``monto * PB(origen) - resultado * PB(destino)``.
+
+    :rtype: ResultadoOperacion
+    """
+    monto = _decimal(monto)
+    resultado = redondear(monto * cruce.entrada / cruce.salida)
+    return ResultadoOperacion(
+        monto=monto,
+        resultado=resultado,
+        resultado_sin_desc=redondear(monto * cruce.entrada_sin_descuento / cruce.salida_sin_descuento),
+        ganancia=redondear(monto * cruce.precio_base_origen - resultado * cruce.precio_base_destino),
+        tasa=cruce.tasa,
+    )
@@ -0,0 +1,65 @@
+"""
+Feed público de cotizaciones (cotizaciones).
+
+Arma, a partir del libro de tasas en memoria, el cuerpo JSON del feed
+``/api/tasas/`` y los validadores HTTP para GET condicional:
+
+    - ETag: versión del libro + firma de las tasas vigentes (cambia también
+      cuando se activa una tasa programada sin nueva versión).
+    - Last-Modified: mayor ``fecha_actualizacion`` o ``vigencia`` vigente.
+
+Mientras el libro en memoria siga válido, calcular los validadores no
+consulta la base de datos; un sondeo sin cambios recibe 304.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cotizador import cotizar_pares, memorizar, redondear
+
+
+def _firma(libro):
+    tasas = ",".join(str(tasa.id) for tasa in libro.actuales().values())
+    return hashlib.md5(tasas.encode(), usedforsecurity=False).hexdigest()[:12]
+
+
+def etag(libro):
+    """ETag (sin comillas) de la instantánea del libro."""
+    return memorizar(libro, ("feed", "etag"), lambda: f"{libro.version}-{_firma(libro)}")
+
+
+def ultima_modificacion(libro):
+    """Fecha de la última modificación visible en el feed (o ``None``)."""
+    def calcular():
+        fechas = [libro.ultima_actualizacion] + [tasa.vigencia for tasa in libro.actuales().values()]
+        fechas = [fecha for fecha in fechas if fecha is not None]
+        return max(fechas, default=None)
+    return memorizar(libro, ("feed", "ultima_modificacion"), calcular)
+
+
+def contenido(libro):
+    """Cuerpo JSON (bytes) con todas las cotizaciones vigentes, sin descuento."""
+    def serializar():
+        modificado = ultima_modificacion(libro)
+        cotizaciones = cotizar_pares(libro)
+        return json.dumps({
+            "version": etag(libro),
+            "actualizado": modificado.isoformat() if modificado else None,
+            "tasas": [
+                {
+                    "origen": tasa.origen,
+                    "destino": tasa.destino,
+                    "tasa_id": tasa.id,
+                    "precio_base": cot.precio_base,
+                    "compra": redondear(cot.compra),
+                    "venta": redondear(cot.venta),
+                    "comision_compra": cot.comision_compra,
+                    "comision_venta": cot.comision_venta,
+                    "vigencia": tasa.vigencia,
+                }
+                for par, tasa in libro.actuales().items()
+                for cot in [cotizaciones[par]]
+            ],
+        }, cls=DjangoJSONEncoder).encode()
+    return memorizar(libro, ("feed", "contenido"), serializar)
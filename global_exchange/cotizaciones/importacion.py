@@ -0,0 +1,271 @@
+"""
+Importación masiva de tasas de cambio (cotizaciones).
+
+Permite que tesorería cargue las tasas de todas las monedas de una sola vez
+(comando ``importar_tasas`` o carga JSON/CSV desde el panel) sin disparar la
+cascada de señales de ``TasaDeCambio`` por cada fila:
+
+    1. Valida todas las filas resolviendo las monedas con una sola consulta.
+    2. Inserta las tasas con ``bulk_create`` dentro de una única transacción.
+    3. Registra las auditorías (``AuditoriaTasaCambio``) también con ``bulk_create``.
+    4. Recalcula las velas afectadas y publica una nueva versión del libro de tasas.
+    5. Al confirmar, envía una sola notificación por moneda cuya tasa vigente cambió.
+
+Si alguna fila es inválida no se importa ninguna.
+
+Formato de cada fila (CSV con encabezado o lista JSON de objetos):
+    moneda_destino  Abreviación (obligatoria), ej. USD
+    precio_base     Decimal (obligatorio)
+    comision_compra Decimal (opcional, 0 por defecto)
+    comision_venta  Decimal (opcional, 0 por defecto)
+    vigencia        ``YYYY-MM-DD HH:MM``, ``DD/MM/YYYY HH:MM`` o ISO 8601 (opcional, ahora por defecto)
+    moneda_origen   Abreviación (opcional, PYG por defecto)
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from monedas.models import Moneda
+from notificaciones.models import AuditoriaTasaCambio
+from notificaciones import alertas
+from notificaciones.servicios import enviar_cambio_tasa
+
+from . import libro_tasas, velas
+from .models import TasaDeCambio
+
+MONEDA_BASE = "PYG"
+FORMATOS_VIGENCIA = ["%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M", "%Y-%m-%d"]
+
+#: Máximo absoluto admitido por los DecimalField(max_digits=12, decimal_places=2).
+MAXIMO_MONTO = Decimal("9999999999.99")
+
+#: Umbral (en %) a partir del cual se notifica un cambio de tasa vigente.
+UMBRAL_CAMBIO = Decimal("0.01")
+
+ResultadoImportacion = namedtuple("ResultadoImportacion", ["tasas", "errores", "notificaciones"])
+
+
+def leer_archivo(contenido, formato):
+    """
+    Convierte el contenido de un archivo en una lista de filas (diccionarios).
+
+    :param contenido: Texto o bytes del archivo.
+    :param formato: ``csv`` o ``json``.
+    :raises ValueError: Si el contenido no tiene el formato esperado.
+    """
+    if isinstance(contenido, bytes):
+        contenido = contenido.decode("utf-8-sig")
+    if formato == "json":
+        try:
+            filas = json.loads(contenido)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"JSON inválido: {exc}")
+        if isinstance(filas, dict):
+            filas = filas.get("tasas")
+        if not isinstance(filas, list) or not all(isinstance(f, dict) for f in filas):
+            raise ValueError("El JSON debe ser una lista de tasas o un objeto con la clave 'tasas'.")
+        return filas
+    if formato == "csv":
+        lector = csv.DictReader(io.StringIO(contenido))
+        return [{(k or "").strip(): (v or "").strip() for k, v in fila.items()} for fila in lector]
+    raise ValueError(f"Formato no soportado: {formato}")
+
+
+def _monto(valor, campo, errores, obligatorio=False):
+    if valor in (None, ""):
+        if obligatorio:
+            errores.append(f"{campo}: es obligatorio.")
+        return Decimal("0.00")
+    try:
+        monto = Decimal(str(valor).replace(",", "."))
+    except InvalidOperation:
+        errores.append(f"{campo}: '{valor}' no es un número válido.")
+        return None
+    if not monto.is_finite() or monto < 0 or monto > MAXIMO_MONTO:
+        errores.append(f"{campo}: '{valor}' fuera de rango.")
+        return None
+    return monto.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _vigencia(valor, ahora, errores):
+    if valor in (None, ""):
+        return ahora
+    vigencia = parse_datetime(str(valor))
+    if vigencia is None:
+        for formato in FORMATOS_VIGENCIA:
+            try:
+                vigencia = datetime.strptime(str(valor), formato)
+                break
+            except ValueError:
+                continue
+    if vigencia is None:
+        errores.append(f"vigencia: '{valor}' no es una fecha válida.")
+        return None
+    if settings.USE_TZ and timezone.is_naive(vigencia):
+        vigencia = timezone.make_aware(vigencia)
+    return vigencia
+
+
+def validar(filas):
+    """
+    Valida las filas y construye las ``TasaDeCambio`` sin guardarlas.
+
+    Las monedas se resuelven con una sola consulta para todas las filas.
+
+    :return: Tupla ``(tasas, errores)``; ``errores`` es una lista de
+        ``{"fila": n, "errores": [...]}`` (filas numeradas desde 1).
+    """
+    abreviaciones = set()
+    for fila in filas:
+        abreviaciones.add(str(fila.get("moneda_origen") or MONEDA_BASE).strip().upper())
+        abreviaciones.add(str(fila.get("moneda_destino") or "").strip().upper())
+    monedas = Moneda.objects.in_bulk([a for a in abreviaciones if a], field_name="abreviacion")
+
+    ahora = timezone.now()
+    tasas, errores = [], []
+    for numero, fila in enumerate(filas, start=1):
+        errores_fila = []
+        origen = monedas.get(str(fila.get("moneda_origen") or MONEDA_BASE).strip().upper())
+        abrev_destino = str(fila.get("moneda_destino") or "").strip().upper()
+        destino = monedas.get(abrev_destino)
+        if origen is None:
+            errores_fila.append(f"moneda_origen: '{fila.get('moneda_origen') or MONEDA_BASE}' no existe.")
+        if not abrev_destino:
+            errores_fila.append("moneda_destino: es obligatoria.")
+        elif destino is None:
+            errores_fila.append(f"moneda_destino: '{abrev_destino}' no existe.")
+        if origen is not None and origen == destino:
+            errores_fila.append("La moneda base y la moneda destino no pueden ser iguales.")
+
+        precio_base = _monto(fila.get("precio_base"), "precio_base", errores_fila, obligatorio=True)
+        if precio_base is not None and precio_base <= 0 and "precio_base: es obligatorio." not in errores_fila:
+            errores_fila.append("precio_base: debe ser mayor a cero.")
+        comision_compra = _monto(fila.get("comision_compra"), "comision_compra", errores_fila)
+        comision_venta = _monto(fila.get("comision_venta"), "comision_venta", errores_fila)
+        vigencia = _vigencia(fila.get("vigencia"), ahora, errores_fila)
+
+        if errores_fila:
+            errores.append({"fila": numero, "errores": errores_fila})
+            continue
+        tasas.append(TasaDeCambio(
+            moneda_origen=origen,
+            moneda_destino=destino,
+            precio_base=precio_base,
+            comision_compra=comision_compra,
+            comision_venta=comision_venta,
+            vigencia=vigencia,
+            estado=True,
+        ))
+    return tasas, errores
+
+
+def _vigentes_por_par(pares):
+    """Tasa vigente de cada par indicado, con una sola consulta."""
+    origenes = {origen for origen, _ in pares}
+    destinos = {destino for _, destino in pares}
+    return {
+        (tasa.moneda_origen_id, tasa.moneda_destino_id): tasa
+        for tasa in TasaDeCambio.objects.filter(
+            moneda_origen_id__in=origenes, moneda_destino_id__in=destinos
+        ).vigentes()
+        if (tasa.moneda_origen_id, tasa.moneda_destino_id) in pares
+    }
+
+
+def importar(filas, usuario=None, solo_validar=False):
+    """
+    Valida e importa un lote de tasas en una única transacción.
+
+    :param filas: Lista de diccionarios (ver formato en el docstring del módulo).
+    :param usuario: Usuario responsable, se guarda en las auditorías.
+    :param solo_validar: Si es True, valida sin guardar nada.
+    :return: ``ResultadoImportacion(tasas, errores, notificaciones)``; si hay
+        errores no se importa ninguna fila. ``notificaciones`` son los avisos
+        (uno por moneda) que se envían al confirmar la transacción.
+    """
+    tasas, errores = validar(filas)
+    if errores or solo_validar or not tasas:
+        return ResultadoImportacion([] if errores else tasas, errores, [])
+
+    pares = {(t.moneda_origen_id, t.moneda_destino_id) for t in tasas}
+    with transaction.atomic():
+        anteriores = _vigentes_por_par(pares)
+        TasaDeCambio.objects.bulk_create(tasas)
+
+        # Auditoría: cada tasa se compara con la vigente del par en ese momento
+        # (la previa a la importación o la anterior del mismo lote)
+        ahora = timezone.now()
+        vigente = dict(anteriores)
+        vigente_ahora = dict(anteriores)
+        auditorias = []
+        for tasa in sorted(tasas, key=lambda t: (t.vigencia, t.pk)):
+            par = (tasa.moneda_origen_id, tasa.moneda_destino_id)
+            previa = vigente.get(par)
+            es_mas_actual = previa is None or tasa.vigencia >= previa.vigencia
+            auditorias.append(AuditoriaTasaCambio(
+                tasa=tasa,
+                tipo_cambio="CREACION",
+                precio_anterior=previa.precio_base if previa and es_mas_actual else None,
+                vigencia_anterior=previa.vigencia if previa and es_mas_actual else None,
+                estado_anterior=previa.estado if previa and es_mas_actual else None,
+                precio_nuevo=tasa.precio_base,
+                vigencia_nueva=tasa.vigencia,
+                estado_nuevo=tasa.estado,
+                usuario_cambio=usuario,
+            ))
+            if es_mas_actual:
+                vigente[par] = tasa
+                if tasa.vigencia <= ahora:
+                    vigente_ahora[par] = tasa
+        AuditoriaTasaCambio.objects.bulk_create(auditorias)
+
+        # bulk_create no dispara señales: velas y libro se actualizan aquí
+        for vela in {
+            (t.moneda_origen_id, t.moneda_destino_id, intervalo, velas.inicio_intervalo(t.vigencia, intervalo))
+            for t in tasas
+            for intervalo in velas.INTERVALOS
+        }:
+            velas.recalcular_intervalo(*vela)
+        transaction.on_commit(libro_tasas.incrementar_version)
+
+        # Una notificación por moneda cuya tasa vigente cambió; las tasas con
+        # vigencia futura las anuncia el programador al activarse
+        notificaciones = []
+        cruces = []
+        for par, nueva in vigente_ahora.items():
+            previa = anteriores.get(par)
+            if previa is None or nueva is previa or not previa.precio_base:
+                continue
+            # Las alertas de precio no dependen del umbral
+            cruces.append((nueva.moneda_destino.abreviacion, alertas.precios_referencia(previa, nueva)))
+            cambio = abs((nueva.precio_base - previa.precio_base) / previa.precio_base * 100)
+            if cambio < UMBRAL_CAMBIO:
+                continue
+            notificaciones.append({
+                "moneda": nueva.moneda_destino.abreviacion,
+                "precio_anterior": float(previa.precio_base),
+                "precio_nuevo": float(nueva.precio_base),
+                "porcentaje_cambio": float(cambio),
+                "es_nueva": True,
+                "tipo_cambio": "CREACION",
+                "vigencia": nueva.vigencia.isoformat(),
+                "timestamp": datetime.now().isoformat(),
+            })
+
+        def notificar():
+            for moneda, precios in cruces:
+                alertas.disparar(moneda, precios)
+            for evento in notificaciones:
+                enviar_cambio_tasa(evento)
+
+        transaction.on_commit(notificar)
+
+    return ResultadoImportacion(tasas, [], notificaciones)
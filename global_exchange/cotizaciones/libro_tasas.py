@@ -0,0 +1,184 @@
+"""
+Libro de tasas en memoria (cotizaciones).
+
+Mantiene, en cada proceso (worker de gunicorn/daphne), una instantánea de la
+tasa de cambio vigente de cada par ``(moneda_origen, moneda_destino)``.
+Las vistas que antes consultaban y reordenaban todas las ``TasaDeCambio`` en
+cada petición leen ahora esta instantánea.
+
+La instantánea lleva un número de versión publicado en la caché compartida
+(``CACHES['default']``). Los receptores ``post_save`` de
+``notificaciones.signals`` incrementan esa versión cuando una tasa cambia, y
+cada worker reconstruye su copia sólo cuando detecta una versión distinta.
+
+Uso:
+    libro = obtener_libro()
+    libro.actual("PYG", "USD")       # tasa vigente del par (TasaDeCambio.objects.vigentes())
+    libro.actuales()                 # {(origen, destino): tasa vigente}
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import TasaDeCambio
+
+#: Clave de la caché compartida donde se publica la versión del libro.
+CLAVE_VERSION = "cotizaciones:libro_tasas:version"
+
+#: Representación inmutable de una tasa dentro del libro.
+TasaRegistrada = namedtuple("TasaRegistrada", [
+    "id",
+    "origen",
+    "destino",
+    "origen_id",
+    "destino_id",
+    "precio_base",
+    "comision_compra",
+    "comision_venta",
+    "vigencia",
+    "fecha_actualizacion",
+])
+
+
+class LibroTasas:
+    """
+    Instantánea inmutable de las tasas vigentes (una por par).
+
+    El historial ya no forma parte del libro: los gráficos leen un número fijo
+    de velas (``cotizaciones.velas``), de modo que el costo de reconstruir la
+    instantánea no crece con la tabla de tasas.
+
+    Las tasas con vigencia futura no son vigentes hasta que llega su momento.
+    La instantánea guarda cuándo ocurre la próxima activación programada y deja
+    de ser válida a partir de ese instante (ver ``vencido``), aunque el
+    programador (``manage.py activar_tasas_programadas``) todavía no haya
+    publicado una nueva versión.
+
+    Atributos:
+        version (int): Versión de la caché compartida con la que se construyó.
+        ultima_actualizacion (datetime|None): Mayor ``fecha_actualizacion`` de
+            todas las tasas (activas o no).
+        proxima_activacion (datetime|None): Vigencia de la próxima tasa programada.
+    """
+
+    def __init__(self, version, vigentes, actualizaciones_por_par=None, proxima_activacion=None):
+        self.version = version
+        self.proxima_activacion = proxima_activacion
+        self._vigentes = {(tasa.origen, tasa.destino): tasa for tasa in vigentes}
+        self._actualizaciones_por_par = dict(actualizaciones_por_par or {})
+        self.ultima_actualizacion = max(self._actualizaciones_por_par.values(), default=None)
+
+    def vencido(self, momento=None):
+        """True si ya llegó la próxima activación programada y hay que reconstruir."""
+        if self.proxima_activacion is None:
+            return False
+        return (momento or timezone.now()) >= self.proxima_activacion
+
+    def actual(self, origen, destino):
+        """Tasa vigente (la de mayor vigencia) del par o ``None`` si no hay."""
+        return self._vigentes.get((origen, destino))
+
+    def actuales(self):
+        """
+        Diccionario ``{(origen, destino): TasaRegistrada}`` con la tasa vigente
+        de cada par, en orden de moneda destino.
+        """
+        return self._vigentes
+
+    def ultima_actualizacion_par(self, origen, destino):
+        """Última ``fecha_actualizacion`` registrada para el par (incluye tasas inactivas)."""
+        return self._actualizaciones_por_par.get((origen, destino))
+
+
+_libro = None
+_lock = threading.Lock()
+
+
+def version_actual():
+    """
+    Devuelve la versión publicada del libro de tasas.
+
+    Si la clave no existe (caché recién iniciada o purgada) se siembra con la
+    hora actual en milisegundos, de modo que nunca coincida con una versión
+    que un worker ya tenga en memoria.
+    """
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def incrementar_version():
+    """Publica una nueva versión para que todos los workers reconstruyan su instantánea."""
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        version_actual()
+        return cache.incr(CLAVE_VERSION)
+
+
+def _registrar(tasa):
+    return TasaRegistrada(
+        id=tasa.id,
+        origen=tasa.moneda_origen.abreviacion,
+        destino=tasa.moneda_destino.abreviacion,
+        origen_id=tasa.moneda_origen_id,
+        destino_id=tasa.moneda_destino_id,
+        precio_base=tasa.precio_base,
+        comision_compra=tasa.comision_compra,
+        comision_venta=tasa.comision_venta,
+        vigencia=tasa.vigencia,
+        fecha_actualizacion=tasa.fecha_actualizacion,
+    )
+
+
+def _construir(version):
+    ahora = timezone.now()
+    vigentes = sorted(
+        (_registrar(tasa) for tasa in TasaDeCambio.objects.vigentes(ahora).select_related("moneda_origen", "moneda_destino")),
+        key=lambda tasa: (tasa.destino_id, tasa.origen_id),
+    )
+    proxima_activacion = TasaDeCambio.objects.programadas(ahora).values_list("vigencia", flat=True).first()
+    actualizaciones = (
+        TasaDeCambio.objects
+        .values_list("moneda_origen__abreviacion", "moneda_destino__abreviacion")
+        .annotate(ultima=Max("fecha_actualizacion"))
+        .order_by()
+    )
+    return LibroTasas(
+        version,
+        vigentes,
+        {(origen, destino): ultima for origen, destino, ultima in actualizaciones},
+        proxima_activacion,
+    )
+
+
+def obtener_libro():
+    """
+    Devuelve la instantánea vigente del libro de tasas.
+
+    Sólo consulta la base de datos cuando la versión publicada difiere de la
+    que el proceso tiene en memoria o cuando llegó la vigencia de una tasa
+    programada. Dentro de un bloque ``atomic`` la
+    instantánea se construye pero no se guarda, porque podría contener
+    cambios que luego se reviertan.
+    """
+    global _libro
+    version = version_actual()
+    libro = _libro
+    if libro is not None and libro.version == version and not libro.vencido():
+        return libro
+
+    if connection.in_atomic_block:
+        return _construir(version)
+
+    with _lock:
+        if _libro is None or _libro.version != version or _libro.vencido():
+            _libro = _construir(version)
+        return _libro
@@ -0,0 +1,130 @@
+"""
+Listado paginado de tasas de cambio (cotizaciones).
+
+Arma la página que muestra ``cotizacion_lista`` (y las pantallas de error de
+``cotizacion_nuevo``/``cotizacion_editar``) a partir de los parámetros GET:
+
+    q, campo     Búsqueda por nombre de moneda (destino, o ambas si no hay campo).
+    destino      Id de la moneda destino.
+    desde, hasta Rango de fechas de vigencia (``YYYY-MM-DD``, ambos inclusive).
+    despues      Cursor de la última fila mostrada → página siguiente (más antiguas).
+    antes        Cursor de la primera fila mostrada → página anterior (más recientes).
+    tamano       Filas por página (por defecto ``TAMANO_PAGINA``, máximo ``TAMANO_MAXIMO``).
+
+Las monedas (pocas filas) se resuelven primero en memoria y las tasas se
+filtran por id de moneda y rango de vigencia, columnas indexadas; la página
+se obtiene por cursor (``TasaDeCambio.objects.pagina``), sin ``COUNT`` ni
+``OFFSET``, así el costo no crece con el historial.
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from monedas.models import Moneda
+
+from .models import TasaDeCambio
+
+TAMANO_PAGINA = 25
+TAMANO_MAXIMO = 100
+
+Pagina = namedtuple("Pagina", ["tasas", "siguiente", "anterior", "tamano", "filtros", "monedas"])
+
+
+def cursor(tasa):
+    """Cursor opaco (apto para URL) con la vigencia y el id de una tasa."""
+    return urlsafe_base64_encode(f"{tasa.vigencia.isoformat()}|{tasa.pk}".encode())
+
+
+def leer_cursor(valor):
+    """``(vigencia, id)`` de un cursor, o ``None`` si falta o es inválido."""
+    if not valor:
+        return None
+    try:
+        vigencia, pk = force_str(urlsafe_base64_decode(valor)).split("|")
+        vigencia = parse_datetime(vigencia)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return (vigencia, pk) if vigencia is not None else None
+
+
+def _tamano(valor):
+    try:
+        return min(max(int(valor), 1), TAMANO_MAXIMO)
+    except (TypeError, ValueError):
+        return TAMANO_PAGINA
+
+
+def _fecha(valor):
+    try:
+        return parse_date((valor or "").strip())
+    except ValueError:
+        return None
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def pagina_tasas(params):
+    """
+    Página de tasas según los parámetros GET (ver docstring del módulo).
+
+    :param params: ``request.GET`` (o cualquier diccionario).
+    :rtype: Pagina
+    """
+    monedas = list(Moneda.objects.filter(estado=True).order_by("nombre"))
+    ids_activas = [m.id for m in monedas]
+    tasas = TasaDeCambio.objects.filter(
+        moneda_origen_id__in=ids_activas,
+        moneda_destino_id__in=ids_activas,
+    )
+
+    q = params.get("q", "").strip()
+    campo = params.get("campo", "").strip()
+    if q:
+        coinciden = [m.id for m in monedas if q.lower() in m.nombre.lower()]
+        if campo == "moneda_destino":
+            tasas = tasas.filter(moneda_destino_id__in=coinciden)
+        else:
+            tasas = tasas.filter(Q(moneda_destino_id__in=coinciden) | Q(moneda_origen_id__in=coinciden))
+
+    destino = params.get("destino", "").strip()
+    if destino.isdigit():
+        tasas = tasas.filter(moneda_destino_id=int(destino))
+
+    desde = _fecha(params.get("desde"))
+    hasta = _fecha(params.get("hasta"))
+    if desde:
+        tasas = tasas.filter(vigencia__gte=_inicio_del_dia(desde))
+    if hasta:
+        tasas = tasas.filter(vigencia__lt=_inicio_del_dia(hasta + timedelta(days=1)))
+
+    tamano = _tamano(params.get("tamano"))
+    despues = leer_cursor(params.get("despues"))
+    antes = leer_cursor(params.get("antes"))
+    filas, hay_mas = tasas.select_related("moneda_origen", "moneda_destino").pagina(
+        tamano, despues=despues, antes=antes,
+    )
+    hay_mas_antiguas = hay_mas if antes is None else True
+    hay_mas_recientes = hay_mas if antes is not None else despues is not None
+
+    return Pagina(
+        tasas=filas,
+        siguiente=cursor(filas[-1]) if filas and hay_mas_antiguas else None,
+        anterior=cursor(filas[0]) if filas and hay_mas_recientes else None,
+        tamano=tamano,
+        filtros={
+            "q": q,
+            "campo": campo,
+            "destino": destino,
+            "desde": desde.isoformat() if desde else "",
+            "hasta": hasta.isoformat() if hasta else "",
+        },
+        monedas=monedas,
+    )
@@ -0,0 +1,55 @@
+"""
+Comando ``activar_tasas_programadas``.
+
+Bucle que duerme hasta la próxima ``vigencia`` programada de cualquier par y,
+al llegar, publica una nueva versión del libro de tasas y avisa por WebSocket
+a los suscritos (ver ``cotizaciones.programador``). En producción lo corre
+el servicio ``tasas_programadas`` de ``docker-compose.prod.yml``.
+
+Uso:
+    python manage.py activar_tasas_programadas
+    python manage.py activar_tasas_programadas --espera-maxima 30
+    python manage.py activar_tasas_programadas --una-vez     # p. ej. desde cron
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from cotizaciones import programador
+
+
+class Command(BaseCommand):
+    help = "Activa las tasas de cambio programadas cuando llega su vigencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--espera-maxima",
+            type=float,
+            default=60,
+            help="Segundos máximos entre revisiones, para detectar tasas programadas nuevas (por defecto 60).",
+        )
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Procesa lo vencido y termina.",
+        )
+
+    def handle(self, *args, **options):
+        espera_maxima = max(options["espera_maxima"], 1)
+        while True:
+            close_old_connections()
+            activadas, proxima = programador.procesar()
+            for tasa in activadas:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Activada tasa programada {tasa.moneda_origen.abreviacion}/"
+                    f"{tasa.moneda_destino.abreviacion}: {tasa.precio_base}"
+                ))
+            if options["una_vez"]:
+                return
+
+            espera = espera_maxima
+            if proxima is not None:
+                espera = min(espera, max((proxima - timezone.now()).total_seconds(), 0))
+            time.sleep(espera)
@@ -0,0 +1,57 @@
+"""
+Comando ``importar_tasas``.
+
+Importa un lote de tasas de cambio desde un archivo CSV o JSON en una única
+transacción (ver ``cotizaciones.importacion`` para el formato).
+
+Uso:
+    python manage.py importar_tasas tasas.csv
+    python manage.py importar_tasas tasas.json --validar
+"""
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cotizaciones import importacion
+
+
+class Command(BaseCommand):
+    help = "Importa tasas de cambio en lote desde un archivo CSV o JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo .csv o .json")
+        parser.add_argument(
+            "--formato",
+            choices=["csv", "json"],
+            help="Formato del archivo. Por defecto se deduce de la extensión.",
+        )
+        parser.add_argument(
+            "--validar",
+            action="store_true",
+            help="Sólo valida el archivo, sin guardar nada.",
+        )
+
+    def handle(self, *args, **options):
+        ruta = Path(options["archivo"])
+        if not ruta.exists():
+            raise CommandError(f"No existe el archivo {ruta}")
+        formato = options["formato"] or ("json" if ruta.suffix.lower() == ".json" else "csv")
+
+        try:
+            filas = importacion.leer_archivo(ruta.read_bytes(), formato)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        resultado = importacion.importar(filas, solo_validar=options["validar"])
+        if resultado.errores:
+            for error in resultado.errores:
+                self.stderr.write(f"Fila {error['fila']}: {' '.join(error['errores'])}")
+            raise CommandError(f"{len(resultado.errores)} fila(s) inválida(s); no se importó ninguna tasa.")
+
+        if options["validar"]:
+            self.stdout.write(self.style.SUCCESS(f"{len(resultado.tasas)} fila(s) válida(s)."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Tasas importadas: {len(resultado.tasas)}. "
+            f"Monedas notificadas: {len(resultado.notificaciones)}."
+        ))
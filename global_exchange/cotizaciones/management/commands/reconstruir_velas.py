@@ -0,0 +1,33 @@
+"""
+Comando ``reconstruir_velas``.
+
+Rearma las velas OHLC (``VelaTasa``) desde todo el historial de tasas.
+Se usa una vez tras desplegar las velas y cuando se sospecha que quedaron
+desincronizadas (por ejemplo tras cargas masivas con ``QuerySet.update``).
+
+Uso:
+    python manage.py reconstruir_velas
+    python manage.py reconstruir_velas --intervalo dia
+"""
+from django.core.management.base import BaseCommand
+
+from cotizaciones import velas
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las velas OHLC de tasas de cambio desde el historial."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--intervalo",
+            action="append",
+            choices=velas.INTERVALOS,
+            help="Intervalo a reconstruir (se puede repetir). Por defecto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        intervalos = tuple(options["intervalo"] or velas.INTERVALOS)
+        creadas = velas.reconstruir(intervalos)
+        self.stdout.write(self.style.SUCCESS(
+            f"Velas reconstruidas ({', '.join(intervalos)}): {creadas}"
+        ))
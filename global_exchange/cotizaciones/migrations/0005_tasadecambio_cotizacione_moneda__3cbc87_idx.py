@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0004_alter_tasadecambio_comision_compra_and_more'),
+        ('monedas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tasadecambio',
+            index=models.Index(fields=['moneda_origen', 'moneda_destino', 'estado', 'vigencia'], name='cotizacione_moneda__3cbc87_idx'),
+        ),
+    ]
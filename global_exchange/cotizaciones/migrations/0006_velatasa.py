@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0005_tasadecambio_cotizacione_moneda__3cbc87_idx'),
+        ('monedas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VelaTasa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('intervalo', models.CharField(choices=[('hora', 'Hora'), ('dia', 'Día')], max_length=4)),
+                ('inicio', models.DateTimeField()),
+                ('apertura', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('maximo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('minimo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('cierre', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('comision_compra', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('comision_venta', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('vigencia_apertura', models.DateTimeField()),
+                ('vigencia_cierre', models.DateTimeField()),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('moneda_destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='velas_destino', to='monedas.moneda')),
+                ('moneda_origen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='velas_origen', to='monedas.moneda')),
+                ('tasa_cierre', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cotizaciones.tasadecambio')),
+            ],
+            options={
+                'verbose_name': 'Vela de Tasa',
+                'verbose_name_plural': 'Velas de Tasas',
+                'ordering': ['moneda_origen', 'moneda_destino', 'intervalo', 'inicio'],
+                'constraints': [models.UniqueConstraint(fields=('moneda_origen', 'moneda_destino', 'intervalo', 'inicio'), name='vela_unica_por_par_e_intervalo')],
+            },
+        ),
+    ]
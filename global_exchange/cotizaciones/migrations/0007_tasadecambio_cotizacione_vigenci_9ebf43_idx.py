@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0006_velatasa'),
+        ('monedas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tasadecambio',
+            index=models.Index(fields=['vigencia', 'id'], name='cotizacione_vigenci_9ebf43_idx'),
+        ),
+    ]
@@ -1,10 +1,157 @@
-from django.db import models
+from django.db import connections, models
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.utils import timezone
 from monedas.models import Moneda
+from global_exchange.mixins import SeguimientoCambiosMixin
 from decimal import Decimal, ROUND_HALF_UP
 
 
-class TasaDeCambio(models.Model):
+class TasaDeCambioQuerySet(models.QuerySet):
+    """
+    Conjunto de consultas personalizadas para el modelo TasaDeCambio.
+
+    Métodos
+    -------
+    vigentes(momento=None)
+        Devuelve exactamente una tasa activa (la de mayor vigencia ya alcanzada) por par de monedas.
+    programadas(momento=None)
+        Tasas activas cuya vigencia todavía no llegó.
+    del_par(moneda_origen, moneda_destino)
+        Tasas activas de un par, de la más reciente a la más antigua.
+    pagina(limite, despues=None, antes=None)
+        Una página del historial por cursor (vigencia, id), sin OFFSET.
+    """
+    def vigentes(self, momento=None):
+        """
+        Obtiene la tasa vigente de cada par ``(moneda_origen, moneda_destino)`` en una sola consulta.
+
+        Una tasa con vigencia futura (programada) no es vigente hasta que llega
+        su momento; mientras tanto sigue vigente la anterior.
+
+        En PostgreSQL usa ``DISTINCT ON``; en motores sin soporte (SQLite) usa
+        ``ROW_NUMBER()`` particionado por par. A igual vigencia gana el id mayor.
+        Ambas variantes aprovechan el índice (moneda_origen, moneda_destino, estado, vigencia).
+
+        Parameters
+        ----------
+        momento : datetime, opcional
+            Instante de referencia (por defecto, ahora).
+
+        Returns
+        -------
+        QuerySet
+            Una fila por par, ordenadas por moneda_origen y moneda_destino.
+        """
+        qs = self.filter(estado=True, vigencia__lte=momento or timezone.now())
+        if connections[self.db].features.can_distinct_on_fields:
+            return qs.order_by(
+                "moneda_origen_id", "moneda_destino_id", "-vigencia", "-id"
+            ).distinct("moneda_origen_id", "moneda_destino_id")
+        return qs.annotate(
+            fila=Window(
+                expression=RowNumber(),
+                partition_by=[F("moneda_origen_id"), F("moneda_destino_id")],
+                order_by=[F("vigencia").desc(), F("id").desc()],
+            )
+        ).filter(fila=1).order_by("moneda_origen_id", "moneda_destino_id")
+
+    def programadas(self, momento=None):
+        """
+        Tasas activas con vigencia posterior a ``momento`` (por defecto, ahora),
+        de la más próxima a la más lejana.
+        """
+        return self.filter(estado=True, vigencia__gt=momento or timezone.now()).order_by("vigencia", "id")
+
+    def del_par(self, moneda_origen, moneda_destino):
+        """
+        Tasas activas de un par, de la más reciente a la más antigua.
+
+        ``del_par(origen, destino)[:2]`` devuelve la tasa actual y la anterior
+        en una sola consulta.
+        """
+        return self.filter(
+            moneda_origen=moneda_origen,
+            moneda_destino=moneda_destino,
+            estado=True,
+        ).order_by("-vigencia", "-id")
+
+    def pagina(self, limite, despues=None, antes=None):
+        """
+        Página del historial (de la más reciente a la más antigua) por cursor.
+
+        En lugar de ``OFFSET``, se parte de la última fila mostrada, así el costo
+        de cada página no crece con el tamaño del historial (índice por
+        vigencia, id).
+
+        Parameters
+        ----------
+        limite : int
+            Cantidad de filas de la página.
+        despues : tuple(datetime, int), opcional
+            ``(vigencia, id)`` de la última fila de la página actual: devuelve las
+            siguientes (más antiguas).
+        antes : tuple(datetime, int), opcional
+            ``(vigencia, id)`` de la primera fila de la página actual: devuelve
+            las anteriores (más recientes).
+
+        Returns
+        -------
+        tuple(list, bool)
+            Filas de la página (siempre de la más reciente a la más antigua) y
+            si hay más filas en la dirección pedida.
+        """
+        if antes is not None:
+            vigencia, pk = antes
+            filas = list(
+                self.filter(Q(vigencia__gt=vigencia) | Q(vigencia=vigencia, id__gt=pk))
+                .order_by("vigencia", "id")[:limite + 1]
+            )
+            return filas[:limite][::-1], len(filas) > limite
+        qs = self
+        if despues is not None:
+            vigencia, pk = despues
+            qs = qs.filter(Q(vigencia__lt=vigencia) | Q(vigencia=vigencia, id__lt=pk))
+        filas = list(qs.order_by("-vigencia", "-id")[:limite + 1])
+        return filas[:limite], len(filas) > limite
+
+
+class TasaDeCambioManager(models.Manager):
+    """
+    Administrador personalizado para el modelo TasaDeCambio.
+
+    Sobrescribe el queryset por defecto para utilizar TasaDeCambioQuerySet.
+    """
+
+    def get_queryset(self):
+        return TasaDeCambioQuerySet(self.model, using=self._db)
+
+    def vigentes(self, momento=None):
+        """
+        Delegación a QuerySet.vigentes para mantener API uniforme.
+        """
+        return self.get_queryset().vigentes(momento)
+
+    def programadas(self, momento=None):
+        """
+        Delegación a QuerySet.programadas para mantener API uniforme.
+        """
+        return self.get_queryset().programadas(momento)
+
+    def del_par(self, moneda_origen, moneda_destino):
+        """
+        Delegación a QuerySet.del_par para mantener API uniforme.
+        """
+        return self.get_queryset().del_par(moneda_origen, moneda_destino)
+
+    def pagina(self, limite, despues=None, antes=None):
+        """
+        Delegación a QuerySet.pagina para mantener API uniforme.
+        """
+        return self.get_queryset().pagina(limite, despues=despues, antes=antes)
+
+
+class TasaDeCambio(SeguimientoCambiosMixin, models.Model):
     """
     Modelo que representa la tasa de cambio entre dos monedas.
 
@@ -63,11 +210,16 @@ class TasaDeCambio(models.Model):
         verbose_name_plural = "Tasas de Cambio"
         ordering = ["-fecha_actualizacion"]  
         # Ordena los registros de más reciente a más antiguo por fecha_actualizacion.
+        indexes = [Index(moneda_origen, moneda_destino, estado, vigencia)]
+        # Respaldo de TasaDeCambio.objects.vigentes() y del_par().
 
     Métodos:
         __str__:
             Devuelve una representación legible de la tasa de cambio, mostrando
             el par de monedas y sus valores de compra y venta.
+        changed_fields() / previous_value(campo):
+            Cambios respecto de lo leído (``SeguimientoCambiosMixin``); las
+            señales los usan para las velas y los eventos sin volver a consultar.
 
     """
     moneda_origen = models.ForeignKey(Moneda,related_name="tasas_origen",on_delete=models.CASCADE)
@@ -78,11 +230,19 @@ class TasaDeCambio(models.Model):
     vigencia = models.DateTimeField(default=timezone.now)  # antes: sin default / null=False
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     estado = models.BooleanField(default=True)
-    
+
+    objects = TasaDeCambioManager()
+
     class Meta:
         verbose_name = "Tasa de Cambio"
         verbose_name_plural = "Tasas de Cambio"
         ordering = ["-fecha_actualizacion"]
+        indexes = [
+            # Tasa vigente por par (vigentes(), del_par())
+            models.Index(fields=["moneda_origen", "moneda_destino", "estado", "vigencia"]),
+            # Listado paginado por cursor (pagina())
+            models.Index(fields=["vigencia", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.moneda_origen}/{self.moneda_destino} - Precio: {self.precio_base} (+{self.comision_venta}/-{self.comision_compra})"
@@ -110,4 +270,59 @@ class TasaDeCambio(models.Model):
         base = self.precio_base or Decimal('0')
         com = self.comision_venta or Decimal('0')
         valor = base + com
-        return valor.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
\ No newline at end of file
+        return valor.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class VelaTasa(models.Model):
+    """
+    Vela OHLC del ``precio_base`` de un par de monedas en un intervalo (hora o día).
+
+    Se mantiene de forma incremental desde las señales de TasaDeCambio
+    (``cotizaciones.signals``) y se reconstruye con ``manage.py reconstruir_velas``.
+    Los gráficos leen un número fijo de velas en lugar de todo el historial.
+
+    Atributos:
+        moneda_origen / moneda_destino (ForeignKey[Moneda]): Par de monedas.
+        intervalo (CharField): ``hora`` o ``dia``.
+        inicio (DateTimeField): Comienzo del intervalo (hora local).
+        apertura, maximo, minimo, cierre (DecimalField): Precios base OHLC.
+        comision_compra / comision_venta (DecimalField): Comisiones de la tasa de cierre.
+        vigencia_apertura / vigencia_cierre (DateTimeField): Vigencias de la primera y última tasa.
+        tasa_cierre (ForeignKey[TasaDeCambio]): Tasa que fija el cierre.
+        cantidad (PositiveIntegerField): Tasas activas incluidas en la vela.
+    """
+    INTERVALO_HORA = "hora"
+    INTERVALO_DIA = "dia"
+    INTERVALOS = [
+        (INTERVALO_HORA, "Hora"),
+        (INTERVALO_DIA, "Día"),
+    ]
+
+    moneda_origen = models.ForeignKey(Moneda, related_name="velas_origen", on_delete=models.CASCADE)
+    moneda_destino = models.ForeignKey(Moneda, related_name="velas_destino", on_delete=models.CASCADE)
+    intervalo = models.CharField(max_length=4, choices=INTERVALOS)
+    inicio = models.DateTimeField()
+    apertura = models.DecimalField(max_digits=12, decimal_places=2)
+    maximo = models.DecimalField(max_digits=12, decimal_places=2)
+    minimo = models.DecimalField(max_digits=12, decimal_places=2)
+    cierre = models.DecimalField(max_digits=12, decimal_places=2)
+    comision_compra = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    comision_venta = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    vigencia_apertura = models.DateTimeField()
+    vigencia_cierre = models.DateTimeField()
+    tasa_cierre = models.ForeignKey(TasaDeCambio, related_name="+", null=True, on_delete=models.SET_NULL)
+    cantidad = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Vela de Tasa"
+        verbose_name_plural = "Velas de Tasas"
+        ordering = ["moneda_origen", "moneda_destino", "intervalo", "inicio"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["moneda_origen", "moneda_destino", "intervalo", "inicio"],
+                name="vela_unica_por_par_e_intervalo",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.moneda_origen}/{self.moneda_destino} {self.intervalo} {self.inicio:%Y-%m-%d %H:%M} - Cierre: {self.cierre}"
@@ -0,0 +1,124 @@
+"""
+Programador de activación de tasas (cotizaciones).
+
+Una ``TasaDeCambio`` con ``vigencia`` futura queda programada: no es vigente
+hasta que llega su momento. Este módulo sigue la próxima activación de cada
+par y, cuando ocurre:
+
+    - publica una nueva versión del libro de tasas, para que todos los workers
+      reconstruyan su puntero "tasa actual";
+    - envía un único aviso por WebSocket a los suscritos a la moneda.
+
+El bucle lo ejecuta ``manage.py activar_tasas_programadas``. Aunque el
+programador no esté corriendo, el libro de tasas deja de servir una
+instantánea vencida (``LibroTasas.vencido``); lo que se pierde es el aviso.
+
+El último instante procesado se guarda en la caché compartida para que un
+reinicio no repita ni pierda activaciones.
+"""
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from notificaciones import alertas
+from notificaciones.servicios import enviar_cambio_tasa
+
+from . import libro_tasas
+from .models import TasaDeCambio
+
+#: Clave de la caché con el último instante procesado por el programador.
+CLAVE_ULTIMO_PROCESADO = "cotizaciones:programador:ultimo"
+
+
+def proximas_activaciones(momento=None):
+    """
+    Próxima activación programada de cada par.
+
+    :return: ``{(moneda_origen_id, moneda_destino_id): vigencia}``
+    """
+    return {
+        (origen_id, destino_id): vigencia
+        for origen_id, destino_id, vigencia in (
+            TasaDeCambio.objects.programadas(momento)
+            .order_by()
+            .values_list("moneda_origen_id", "moneda_destino_id")
+            .annotate(vigencia=Min("vigencia"))
+        )
+    }
+
+
+def proxima_activacion(momento=None):
+    """Vigencia de la próxima tasa programada (de cualquier par) o ``None``."""
+    return TasaDeCambio.objects.programadas(momento).values_list("vigencia", flat=True).first()
+
+
+def ultimo_procesado():
+    """Último instante procesado (o ``None`` si el programador nunca corrió)."""
+    return cache.get(CLAVE_ULTIMO_PROCESADO)
+
+
+def activar(desde, hasta):
+    """
+    Procesa las tasas que entraron en vigencia en el intervalo ``(desde, hasta]``.
+
+    Por cada par con activaciones se toma la última tasa activada y se compara
+    con la que estaba vigente antes. Se publica una nueva versión del libro (una
+    vez, si hubo activaciones) y se envía un aviso por par.
+
+    :return: Lista de las ``TasaDeCambio`` activadas (una por par).
+    """
+    activadas = {}
+    for tasa in (
+        TasaDeCambio.objects
+        .filter(estado=True, vigencia__gt=desde, vigencia__lte=hasta)
+        .select_related("moneda_origen", "moneda_destino")
+        .order_by("vigencia", "id")
+    ):
+        activadas[(tasa.moneda_origen_id, tasa.moneda_destino_id)] = tasa
+
+    if activadas:
+        libro_tasas.incrementar_version()
+
+    for tasa in activadas.values():
+        anterior = (
+            TasaDeCambio.objects.del_par(tasa.moneda_origen_id, tasa.moneda_destino_id)
+            .filter(vigencia__lte=desde)
+            .only("precio_base", "comision_compra", "comision_venta")
+            .first()
+        )
+        precio_anterior = anterior.precio_base if anterior else None
+        cambio = 0
+        if precio_anterior:
+            cambio = abs((tasa.precio_base - precio_anterior) / precio_anterior * 100)
+        if anterior is not None:
+            alertas.disparar(tasa.moneda_destino.abreviacion, alertas.precios_referencia(anterior, tasa))
+        enviar_cambio_tasa({
+            "moneda": tasa.moneda_destino.abreviacion,
+            "precio_anterior": float(precio_anterior) if precio_anterior is not None else None,
+            "precio_nuevo": float(tasa.precio_base),
+            "porcentaje_cambio": float(cambio),
+            "es_nueva": False,
+            "tipo_cambio": "ACTIVACION_PROGRAMADA",
+            "vigencia": tasa.vigencia.isoformat(),
+            "timestamp": datetime.now().isoformat(),
+        })
+
+    return list(activadas.values())
+
+
+def procesar(momento=None):
+    """
+    Activa todo lo que venció desde la última pasada y avanza el puntero.
+
+    En la primera ejecución no se anuncia el pasado: sólo se fija el puntero.
+
+    :return: Tupla ``(activadas, proxima)`` con las tasas activadas y la
+        vigencia de la próxima activación programada (o ``None``).
+    """
+    momento = momento or timezone.now()
+    desde = ultimo_procesado()
+    activadas = activar(desde, momento) if desde is not None and desde < momento else []
+    cache.set(CLAVE_ULTIMO_PROCESADO, momento, timeout=None)
+    return activadas, proxima_activacion(momento)
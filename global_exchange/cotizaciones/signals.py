@@ -0,0 +1,40 @@
+"""
+Signals de la aplicación Cotizaciones.
+
+Mantiene las velas OHLC (``VelaTasa``) al día cuando cambia una tasa de cambio:
+    - Creación: la tasa se fusiona en su vela horaria y diaria (incremental).
+    - Edición / desactivación: se recalculan las velas donde estaba y donde quedó.
+    - Borrado: se recalculan las velas donde estaba.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cotizaciones import libro_tasas, velas
+from cotizaciones.models import TasaDeCambio
+
+
+def _valores_originales(instance):
+    """Par y vigencia con los que se leyó (o guardó por última vez) la tasa."""
+    return {
+        campo: instance.previous_value(campo)
+        for campo in ("moneda_origen_id", "moneda_destino_id", "vigencia")
+    }
+
+
+@receiver(post_save, sender=TasaDeCambio)
+def actualizar_velas(sender, instance, created, raw=False, **kwargs):
+    """Actualiza las velas del par después de guardar una tasa."""
+    if raw:
+        return
+    if created:
+        velas.registrar_tasa(instance)
+    else:
+        velas.recalcular_tasa(instance, _valores_originales(instance))
+
+
+@receiver(post_delete, sender=TasaDeCambio)
+def quitar_de_velas(sender, instance, **kwargs):
+    """Recalcula las velas de donde salió una tasa eliminada y publica una nueva versión del libro."""
+    transaction.on_commit(libro_tasas.incrementar_version)
+    velas.recalcular_tasa(instance, _valores_originales(instance))
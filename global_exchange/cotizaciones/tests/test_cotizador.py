@@ -0,0 +1,83 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from cotizaciones import cotizador, libro_tasas
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+
+
+class CotizadorTest(TestCase):
+    """Tests para el motor de cotización compartido"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        ahora = timezone.now()
+        TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7300.00"), comision_compra=Decimal("40.00"),
+            comision_venta=Decimal("60.00"), vigencia=ahora - timedelta(days=1),
+        )
+        cls.usd = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7400.00"), comision_compra=Decimal("50.00"),
+            comision_venta=Decimal("100.00"), vigencia=ahora,
+        )
+        cls.eur = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.euro,
+            precio_base=Decimal("8000.00"), comision_compra=Decimal("80.00"),
+            comision_venta=Decimal("120.00"), vigencia=ahora,
+        )
+
+    def test_cotizar_usa_la_tasa_mas_reciente_con_descuento(self):
+        cotizaciones = cotizador.cotizar(libro_tasas.obtener_libro(), 10)
+        usd = cotizaciones["USD"]
+        self.assertEqual(usd.tasa_id, self.usd.id)
+        self.assertEqual(usd.venta, Decimal("7490"))
+        self.assertEqual(usd.compra, Decimal("7355"))
+        self.assertEqual(usd.venta_sin_descuento, Decimal("7500"))
+        self.assertEqual(set(cotizaciones), {"USD", "EUR"})
+
+    def test_cotizar_solo_toma_pares_contra_el_guarani(self):
+        TasaDeCambio.objects.create(
+            moneda_origen=self.euro, moneda_destino=self.dolar,
+            precio_base=Decimal("1.08"), vigencia=timezone.now(),
+        )
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(cotizador.cotizar(libro)["USD"].tasa_id, self.usd.id)
+        pares = cotizador.cotizar_pares(libro)
+        self.assertEqual(pares[("PYG", "USD")].precio_base, Decimal("7400.00"))
+        self.assertEqual(pares[("EUR", "USD")].precio_base, Decimal("1.08"))
+
+    def test_cotizar_memoriza_por_descuento(self):
+        libro = libro_tasas.obtener_libro()
+        self.assertIs(cotizador.cotizar(libro, 10), cotizador.cotizar(libro, Decimal("10")))
+        self.assertIsNot(cotizador.cotizar(libro, 10), cotizador.cotizar(libro, 0))
+
+    def test_calcular_venta(self):
+        """Venta: el cliente entrega PYG y recibe la moneda extranjera"""
+        cotizacion = cotizador.cotizar(libro_tasas.obtener_libro(), 0)["USD"]
+        calculo = cotizador.calcular(cotizacion, "venta", Decimal("750000"))
+        self.assertEqual(calculo.resultado, Decimal("100.00"))
+        self.assertEqual(calculo.ganancia, Decimal("10000.00"))
+        self.assertEqual(calculo.tasa, Decimal("7500.00"))
+
+    def test_calcular_compra(self):
+        """Compra: el cliente entrega la moneda extranjera y recibe PYG"""
+        cotizacion = cotizador.cotizar(libro_tasas.obtener_libro(), 50)["USD"]
+        calculo = cotizador.calcular(cotizacion, "compra", 100)
+        self.assertEqual(calculo.resultado, Decimal("737500.00"))
+        self.assertEqual(calculo.resultado_sin_desc, Decimal("735000.00"))
+        self.assertEqual(calculo.ganancia, Decimal("2500.00"))
+
+    def test_cotizar_lote(self):
+        lote = cotizador.cotizar_lote(
+            libro_tasas.obtener_libro(), 0, ["750000", "1500000"], ["USD", "BRL"],
+        )
+        self.assertEqual(list(lote), ["USD"])
+        self.assertEqual([c.resultado for c in lote["USD"]], [Decimal("100.00"), Decimal("200.00")])
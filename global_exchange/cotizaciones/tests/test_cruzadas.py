@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from cotizaciones import cruzadas, libro_tasas
+from cotizaciones.cotizador import redondear
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+
+
+class CruzadasTest(TestCase):
+    """Tests para la matriz de tasas cruzadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.real = Moneda.objects.create(nombre="Real", abreviacion="BRL", estado=True)
+        cls.usd = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7400.00"), comision_compra=Decimal("50.00"), comision_venta=Decimal("100.00"),
+        )
+        cls.brl = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.real,
+            precio_base=Decimal("1400.00"), comision_compra=Decimal("20.00"), comision_venta=Decimal("40.00"),
+        )
+
+    def test_matriz_incluye_todos_los_pares(self):
+        matriz = cruzadas.matriz(libro_tasas.obtener_libro())
+        self.assertEqual(set(matriz), {
+            ("PYG", "USD"), ("PYG", "BRL"), ("USD", "PYG"), ("USD", "BRL"), ("BRL", "PYG"), ("BRL", "USD"),
+        })
+
+    def test_tasa_cruzada_aplica_comisiones_de_ambos_tramos(self):
+        cruce = cruzadas.cruzar(libro_tasas.obtener_libro(), "USD", "BRL")
+        self.assertEqual(cruce.tasa, Decimal("7350.00") / Decimal("1440.00"))
+        self.assertEqual(cruce.tasa_origen_id, self.usd.id)
+        self.assertEqual(cruce.tasa_destino_id, self.brl.id)
+
+    def test_descuento_reduce_comisiones(self):
+        libro = libro_tasas.obtener_libro()
+        cruce = cruzadas.cruzar(libro, "USD", "BRL", 50)
+        self.assertEqual(cruce.tasa, Decimal("7375.00") / Decimal("1420.00"))
+        self.assertEqual(cruce.tasa_sin_descuento, cruzadas.cruzar(libro, "USD", "BRL").tasa)
+
+    def test_calcular_cruce(self):
+        cruce = cruzadas.cruzar(libro_tasas.obtener_libro(), "USD", "BRL")
+        calculo = cruzadas.calcular_cruce(cruce, "100")
+        self.assertEqual(calculo.resultado, Decimal("510.42"))
+        self.assertEqual(calculo.ganancia, redondear(Decimal("740000") - Decimal("510.42") * Decimal("1400")))
+
+    def test_tramos_con_guarani_coinciden_con_el_cotizador(self):
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(cruzadas.cruzar(libro, "USD", "PYG").tasa, Decimal("7350.00"))
+        self.assertEqual(cruzadas.cruzar(libro, "PYG", "USD").salida, Decimal("7500.00"))
+
+    def test_matriz_se_memoriza_por_version(self):
+        libro = libro_tasas.obtener_libro()
+        self.assertIs(cruzadas.matriz(libro), cruzadas.matriz(libro))
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+
+
+class FeedTasasTest(TestCase):
+    """Tests para el feed público de cotizaciones con GET condicional"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.tasa = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7400.00"), comision_compra=Decimal("50.00"),
+            comision_venta=Decimal("60.00"), vigencia=timezone.now() - timedelta(hours=1),
+        )
+        cls.url = reverse("feed_tasas")
+
+    def test_devuelve_tasas_con_validadores(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        datos = response.json()
+        self.assertEqual(len(datos["tasas"]), 1)
+        tasa = datos["tasas"][0]
+        self.assertEqual(tasa["destino"], "USD")
+        self.assertEqual(Decimal(tasa["venta"]), Decimal("7460.00"))
+        self.assertEqual(Decimal(tasa["compra"]), Decimal("7350.00"))
+
+    def test_sin_cambios_responde_304(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        futuro = http_date((timezone.now() + timedelta(minutes=1)).timestamp())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=futuro).status_code, 304)
+
+    def test_nueva_tasa_cambia_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            TasaDeCambio.objects.create(
+                moneda_origen=self.guarani, moneda_destino=self.dolar,
+                precio_base=Decimal("7500.00"), vigencia=timezone.now(),
+            )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(Decimal(response.json()["tasas"][0]["precio_base"]), Decimal("7500.00"))
+
+    def test_pares_con_el_mismo_destino(self):
+        euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            TasaDeCambio.objects.create(
+                moneda_origen=euro, moneda_destino=self.dolar,
+                precio_base=Decimal("1.08"), vigencia=timezone.now() - timedelta(hours=1),
+            )
+        tasas = {(t["origen"], t["destino"]): t for t in self.client.get(self.url).json()["tasas"]}
+        self.assertEqual(Decimal(tasas[("PYG", "USD")]["precio_base"]), Decimal("7400.00"))
+        self.assertEqual(Decimal(tasas[("EUR", "USD")]["precio_base"]), Decimal("1.08"))
+
+    def test_no_admite_post(self):
+        self.assertEqual(self.client.post(self.url).status_code, 405)
@@ -0,0 +1,105 @@
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cotizaciones import importacion
+from cotizaciones.models import TasaDeCambio, VelaTasa
+from monedas.models import Moneda
+from notificaciones.models import AuditoriaTasaCambio
+from usuarios.models import CustomUser
+
+
+class ImportacionTasasTest(TestCase):
+    """Tests para la importación masiva de tasas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superadmin = CustomUser.objects.get(username='superadmin')
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        cls.usd_anterior = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7000.00"), vigencia=timezone.now() - timedelta(days=1),
+        )
+
+    def test_importa_en_lote_con_auditoria_y_una_notificacion_por_moneda(self):
+        filas = [
+            {"moneda_destino": "USD", "precio_base": "7400", "comision_venta": "50"},
+            {"moneda_destino": "usd", "precio_base": "7450", "vigencia": "2000-01-01 10:00"},
+            {"moneda_destino": "EUR", "precio_base": "8000.005"},
+        ]
+        with mock.patch("cotizaciones.importacion.enviar_cambio_tasa") as enviar:
+            with self.captureOnCommitCallbacks(execute=True):
+                resultado = importacion.importar(filas, usuario=self.superadmin)
+
+        self.assertEqual(resultado.errores, [])
+        self.assertEqual(len(resultado.tasas), 3)
+        self.assertEqual(TasaDeCambio.objects.count(), 4)
+        self.assertEqual(
+            TasaDeCambio.objects.get(moneda_destino=self.euro).precio_base, Decimal("8000.01")
+        )
+        self.assertEqual(AuditoriaTasaCambio.objects.filter(usuario_cambio=self.superadmin).count(), 3)
+        # Sólo USD tenía una tasa vigente previa: una notificación, con la tasa más actual
+        enviar.assert_called_once()
+        (evento,) = enviar.call_args.args
+        self.assertEqual((evento["moneda"], evento["precio_nuevo"]), ("USD", 7400.0))
+        self.assertTrue(VelaTasa.objects.filter(moneda_destino=self.euro).exists())
+
+    def test_una_fila_invalida_no_importa_ninguna(self):
+        filas = [
+            {"moneda_destino": "USD", "precio_base": "7400"},
+            {"moneda_destino": "XXX", "precio_base": "abc"},
+            {"moneda_destino": "PYG", "precio_base": "1"},
+        ]
+        resultado = importacion.importar(filas)
+        self.assertEqual([e["fila"] for e in resultado.errores], [2, 3])
+        self.assertEqual(len(resultado.errores[0]["errores"]), 2)
+        self.assertEqual(TasaDeCambio.objects.count(), 1)
+
+    def test_leer_csv(self):
+        filas = importacion.leer_archivo(b"moneda_destino,precio_base\nUSD,7400\nEUR,8000\n", "csv")
+        self.assertEqual(filas, [
+            {"moneda_destino": "USD", "precio_base": "7400"},
+            {"moneda_destino": "EUR", "precio_base": "8000"},
+        ])
+
+    def test_comando_importar_tasas(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        archivo = Path(directorio.name) / "tasas.json"
+        archivo.write_text(json.dumps([{"moneda_destino": "EUR", "precio_base": "8000"}]))
+        call_command("importar_tasas", str(archivo), "--validar", stdout=StringIO())
+        self.assertEqual(TasaDeCambio.objects.count(), 1)
+        call_command("importar_tasas", str(archivo), stdout=StringIO())
+        self.assertEqual(TasaDeCambio.objects.count(), 2)
+
+        archivo.write_text(json.dumps([{"moneda_destino": "EUR"}]))
+        with self.assertRaises(CommandError):
+            call_command("importar_tasas", str(archivo), stdout=StringIO(), stderr=StringIO())
+
+    def test_vista_importar_csv(self):
+        client = Client()
+        client.login(username='superadmin', password='ContraseñaSegura123')
+        archivo = SimpleUploadedFile("tasas.csv", b"moneda_destino,precio_base\nEUR,8000\n", content_type="text/csv")
+        response = client.post(reverse("cotizacion_importar"), {"archivo": archivo})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["creadas"], 1)
+
+        response = client.post(
+            reverse("cotizacion_importar"),
+            data=json.dumps([{"moneda_destino": "BRL", "precio_base": "1300"}]),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
@@ -0,0 +1,89 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from cotizaciones import libro_tasas
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+
+
+class LibroTasasTest(TestCase):
+    """Tests para el libro de tasas en memoria"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        ahora = timezone.now()
+        cls.usd_vieja = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7300.00"), vigencia=ahora - timedelta(days=2),
+        )
+        cls.usd_nueva = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7400.00"), vigencia=ahora - timedelta(days=1),
+        )
+        cls.usd_inactiva = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("9999.00"), vigencia=ahora, estado=False,
+        )
+        cls.eur = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.euro,
+            precio_base=Decimal("8000.00"), vigencia=ahora,
+        )
+
+    def test_actual_devuelve_la_mas_reciente(self):
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(libro.actual("PYG", "USD").precio_base, Decimal("7400.00"))
+        self.assertEqual(libro.actual("PYG", "EUR").id, self.eur.id)
+        self.assertIsNone(libro.actual("PYG", "BRL"))
+
+    def test_actuales_una_por_par_sin_inactivas(self):
+        """El libro guarda sólo la tasa vigente de cada par y omite tasas inactivas"""
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(
+            {par: tasa.id for par, tasa in libro.actuales().items()},
+            {("PYG", "USD"): self.usd_nueva.id, ("PYG", "EUR"): self.eur.id},
+        )
+
+    def test_ultima_actualizacion_incluye_inactivas(self):
+        """verificar_tasa debe enterarse también de desactivaciones"""
+        libro = libro_tasas.obtener_libro()
+        self.usd_inactiva.refresh_from_db()
+        self.assertEqual(
+            libro.ultima_actualizacion_par("PYG", "USD"),
+            self.usd_inactiva.fecha_actualizacion,
+        )
+
+    def test_guardar_tasa_incrementa_version_al_confirmar(self):
+        """El post_save publica una nueva versión cuando se confirma la transacción"""
+        version = libro_tasas.version_actual()
+        with self.captureOnCommitCallbacks(execute=True):
+            TasaDeCambio.objects.create(
+                moneda_origen=self.guarani, moneda_destino=self.euro,
+                precio_base=Decimal("8100.00"),
+            )
+        self.assertEqual(libro_tasas.version_actual(), version + 1)
+
+    def test_libro_refleja_nueva_tasa(self):
+        TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.euro,
+            precio_base=Decimal("8100.00"),
+        )
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(libro.actual("PYG", "EUR").precio_base, Decimal("8100.00"))
+
+    def test_tasa_programada_no_es_vigente_hasta_su_momento(self):
+        """El puntero a la tasa actual ignora vigencias futuras y vence al llegar la próxima"""
+        programada = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.euro,
+            precio_base=Decimal("8200.00"), vigencia=timezone.now() + timedelta(hours=1),
+        )
+        libro = libro_tasas.obtener_libro()
+        self.assertEqual(libro.actual("PYG", "EUR").id, self.eur.id)
+        self.assertEqual(libro.proxima_activacion, programada.vigencia)
+        self.assertFalse(libro.vencido())
+        self.assertTrue(libro.vencido(programada.vigencia))
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
@@ -53,3 +55,35 @@ class TasaDeCambioListViewTest(TestCase):
         response = self.client.get(url)
         self.assertContains(response, "Activo")
         self.assertContains(response, "Inactivo")
+
+    def test_paginacion_por_cursor(self):
+        url = reverse('cotizacion')
+        primera = self.client.get(url, {'tamano': 10})
+        self.assertEqual(len(primera.context['tasas']), 10)
+        self.assertIsNone(primera.context['anterior'])
+        segunda = self.client.get(url, {'tamano': 10, 'despues': primera.context['siguiente']})
+        self.assertEqual(len(segunda.context['tasas']), 5)
+        self.assertIsNone(segunda.context['siguiente'])
+        ids = [t.id for t in primera.context['tasas']] + [t.id for t in segunda.context['tasas']]
+        self.assertEqual(len(set(ids)), 15)
+        volver = self.client.get(url, {'tamano': 10, 'antes': segunda.context['anterior']})
+        self.assertEqual([t.id for t in volver.context['tasas']], ids[:10])
+
+    def test_tamano_limitado(self):
+        response = self.client.get(reverse('cotizacion'), {'tamano': 100000})
+        self.assertEqual(response.context['tamano'], 100)
+
+    def test_filtro_por_destino_y_fechas(self):
+        url = reverse('cotizacion')
+        response = self.client.get(url, {'destino': self.euro.id})
+        self.assertEqual(len(response.context['tasas']), 7)
+        hoy = timezone.localdate()
+        response = self.client.get(url, {'hasta': (hoy - timedelta(days=1)).isoformat()})
+        self.assertEqual(len(response.context['tasas']), 0)
+
+    def test_variante_json(self):
+        response = self.client.get(reverse('cotizacion'), {'formato': 'json', 'tamano': 5})
+        data = response.json()
+        self.assertEqual(len(data['tasas']), 5)
+        self.assertIsNotNone(data['siguiente'])
+        self.assertEqual(data['tasas'][0]['origen'], 'PYG')
@@ -1,4 +1,5 @@
 from django.test import TestCase
+from datetime import timedelta
 from django.utils import timezone
 from decimal import Decimal
 from monedas.models import Moneda
@@ -121,4 +122,42 @@ class TasaDeCambioModelTest(TestCase):
             estado=True
         )
         # monto_compra no debe ser negativo
-        self.assertEqual(tasa.monto_compra, Decimal("0.00"))
\ No newline at end of file
+        self.assertEqual(tasa.monto_compra, Decimal("0.00"))
+
+    def test_vigentes_una_por_par(self):
+        """vigentes() devuelve sólo la tasa activa de mayor vigencia de cada par"""
+        ahora = timezone.now()
+        TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal("7300.00"), vigencia=ahora - timedelta(days=1)
+        )
+        usd = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal("7400.00"), vigencia=ahora
+        )
+        TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal("9999.00"), vigencia=ahora + timedelta(days=1), estado=False
+        )
+        eur = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.euro,
+            precio_base=Decimal("8000.00"), vigencia=ahora
+        )
+        self.assertEqual(
+            sorted(TasaDeCambio.objects.vigentes().values_list("id", flat=True)),
+            sorted([usd.id, eur.id])
+        )
+
+    def test_del_par_mas_reciente_primero(self):
+        """del_par() ordena de la más reciente a la más antigua"""
+        ahora = timezone.now()
+        vieja = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal("7300.00"), vigencia=ahora - timedelta(days=1)
+        )
+        nueva = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal("7400.00"), vigencia=ahora
+        )
+        ids = [t.id for t in TasaDeCambio.objects.del_par(self.guarani, self.dolar)[:2]]
+        self.assertEqual(ids, [nueva.id, vieja.id])
@@ -0,0 +1,68 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from cotizaciones import libro_tasas, programador
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+
+
+class ProgramadorTasasTest(TestCase):
+    """Tests para la activación de tasas programadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.ahora = timezone.now()
+        cls.actual = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7000.00"), vigencia=cls.ahora - timedelta(hours=1),
+        )
+        cls.programada = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7100.00"), vigencia=cls.ahora + timedelta(minutes=5),
+        )
+        TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7200.00"), vigencia=cls.ahora + timedelta(minutes=10),
+        )
+
+    def setUp(self):
+        cache.delete(programador.CLAVE_ULTIMO_PROCESADO)
+
+    def test_proximas_activaciones_por_par(self):
+        self.assertEqual(
+            programador.proximas_activaciones(self.ahora),
+            {(self.guarani.id, self.dolar.id): self.programada.vigencia},
+        )
+
+    def test_procesar_activa_publica_version_y_avisa_una_vez(self):
+        with mock.patch("cotizaciones.programador.enviar_cambio_tasa") as enviar:
+            activadas, proxima = programador.procesar(self.ahora)
+            self.assertEqual(activadas, [])
+            self.assertEqual(proxima, self.programada.vigencia)
+
+            version = libro_tasas.version_actual()
+            activadas, proxima = programador.procesar(self.ahora + timedelta(minutes=6))
+            self.assertEqual([t.id for t in activadas], [self.programada.id])
+            self.assertEqual(libro_tasas.version_actual(), version + 1)
+            enviar.assert_called_once()
+            (evento,) = enviar.call_args.args
+            self.assertEqual((evento["precio_anterior"], evento["precio_nuevo"]), (7000.0, 7100.0))
+            self.assertEqual(evento["tipo_cambio"], "ACTIVACION_PROGRAMADA")
+
+            # Una segunda pasada sin vencimientos nuevos no vuelve a avisar
+            programador.procesar(self.ahora + timedelta(minutes=7))
+            enviar.assert_called_once()
+
+    def test_comando_una_vez(self):
+        salida = StringIO()
+        call_command("activar_tasas_programadas", "--una-vez", stdout=salida)
+        self.assertIsNotNone(programador.ultimo_procesado())
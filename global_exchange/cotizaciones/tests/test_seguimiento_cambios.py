@@ -0,0 +1,75 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cotizaciones.models import TasaDeCambio
+from limite_moneda.models import LimiteTransaccion
+from monedas.models import Moneda
+from notificaciones.models import EventoTasa
+
+
+class SeguimientoCambiosTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.tasa = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7000.00"), vigencia=timezone.now() - timedelta(hours=1),
+        )
+
+    def test_instantanea_al_leer(self):
+        tasa = TasaDeCambio.objects.get(pk=self.tasa.pk)
+        self.assertEqual(tasa.changed_fields(), set())
+        tasa.precio_base = Decimal("7100.00")
+        tasa.moneda_destino = self.guarani
+        self.assertEqual(tasa.changed_fields(), {"precio_base", "moneda_destino_id"})
+        self.assertTrue(tasa.has_changed("moneda_destino"))
+        self.assertEqual(tasa.previous_value("precio_base"), Decimal("7000.00"))
+        self.assertEqual(tasa.previous_value("moneda_destino"), self.dolar.id)
+
+    def test_guardar_actualiza_la_instantanea(self):
+        tasa = TasaDeCambio.objects.get(pk=self.tasa.pk)
+        tasa.precio_base = Decimal("7100.00")
+        tasa.save()
+        self.assertEqual(tasa.changed_fields(), set())
+        self.assertEqual(tasa.previous_value("precio_base"), Decimal("7100.00"))
+
+    def test_instancia_nueva_sin_valores_previos(self):
+        tasa = TasaDeCambio(moneda_origen=self.guarani, moneda_destino=self.dolar, precio_base=Decimal("1"))
+        self.assertEqual(tasa.changed_fields(), set())
+        self.assertIsNone(tasa.previous_value("precio_base"))
+
+    def test_campos_diferidos_no_se_siguen(self):
+        tasa = TasaDeCambio.objects.only("id", "precio_base").get(pk=self.tasa.pk)
+        self.assertIsNone(tasa.previous_value("vigencia"))
+        self.assertEqual(tasa.previous_value("precio_base"), Decimal("7000.00"))
+
+    def test_editar_no_vuelve_a_leer_la_tasa(self):
+        tasa = TasaDeCambio.objects.get(pk=self.tasa.pk)
+        tasa.precio_base = Decimal("7100.00")
+        with CaptureQueriesContext(connection) as consultas:
+            tasa.save()
+        por_pk = f'"cotizaciones_tasadecambio"."id" = {tasa.pk}'
+        lecturas = [
+            q["sql"] for q in consultas.captured_queries
+            if q["sql"].startswith("SELECT") and por_pk in q["sql"]
+        ]
+        self.assertEqual(lecturas, [])
+        evento = EventoTasa.objects.latest("id")
+        self.assertEqual(evento.precio_anterior, Decimal("7000.00"))
+        self.assertEqual(evento.precio_nuevo, Decimal("7100.00"))
+
+    def test_limite_transaccion(self):
+        limite = LimiteTransaccion.objects.create(
+            moneda=self.guarani, limite_diario=Decimal("100"), limite_mensual=Decimal("1000"),
+        )
+        limite = LimiteTransaccion.objects.get(pk=limite.pk)
+        limite.limite_diario = Decimal("200")
+        self.assertEqual(limite.changed_fields(), {"limite_diario"})
+        self.assertEqual(limite.previous_value("limite_diario"), Decimal("100"))
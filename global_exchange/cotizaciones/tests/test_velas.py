@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from cotizaciones import libro_tasas, velas
+from cotizaciones.models import TasaDeCambio, VelaTasa
+from monedas.models import Moneda
+
+
+class VelasTasaTest(TestCase):
+    """Tests para las velas OHLC de tasas de cambio"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.hora = velas.inicio_intervalo(timezone.now() - timedelta(days=3), VelaTasa.INTERVALO_HORA)
+
+    def crear_tasa(self, precio, minutos, **kwargs):
+        return TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal(precio), vigencia=self.hora + timedelta(minutes=minutos), **kwargs
+        )
+
+    def vela(self, intervalo=VelaTasa.INTERVALO_HORA):
+        return VelaTasa.objects.get(intervalo=intervalo, inicio=velas.inicio_intervalo(self.hora, intervalo))
+
+    def test_creacion_actualiza_ohlc_incrementalmente(self):
+        self.crear_tasa("7400.00", 10)
+        self.crear_tasa("7500.00", 20)
+        self.crear_tasa("7350.00", 5)
+        ultima = self.crear_tasa("7450.00", 30)
+        for intervalo in velas.INTERVALOS:
+            vela = self.vela(intervalo)
+            self.assertEqual(
+                (vela.apertura, vela.maximo, vela.minimo, vela.cierre, vela.cantidad),
+                (Decimal("7350.00"), Decimal("7500.00"), Decimal("7350.00"), Decimal("7450.00"), 4),
+            )
+            self.assertEqual(vela.tasa_cierre_id, ultima.id)
+
+    def test_edicion_y_desactivacion_recalculan(self):
+        self.crear_tasa("7400.00", 10)
+        ultima = self.crear_tasa("7500.00", 20)
+
+        ultima = TasaDeCambio.objects.get(pk=ultima.pk)
+        ultima.vigencia = ultima.vigencia + timedelta(hours=1)
+        ultima.save()
+        self.assertEqual(self.vela().cierre, Decimal("7400.00"))
+        self.assertEqual(self.vela().cantidad, 1)
+        self.assertEqual(self.vela(VelaTasa.INTERVALO_DIA).cantidad, 2)
+
+        ultima.estado = False
+        ultima.save()
+        self.assertFalse(VelaTasa.objects.filter(
+            intervalo=VelaTasa.INTERVALO_HORA, inicio=self.hora + timedelta(hours=1)
+        ).exists())
+
+    def test_reconstruir_coincide_con_incremental(self):
+        for precio, minutos in [("7400.00", 10), ("7500.00", 20), ("7350.00", 70)]:
+            self.crear_tasa(precio, minutos)
+        incrementales = list(VelaTasa.objects.order_by("intervalo", "inicio").values(
+            "intervalo", "inicio", "apertura", "maximo", "minimo", "cierre", "cantidad", "tasa_cierre_id"
+        ))
+        call_command("reconstruir_velas", stdout=StringIO())
+        reconstruidas = list(VelaTasa.objects.order_by("intervalo", "inicio").values(
+            "intervalo", "inicio", "apertura", "maximo", "minimo", "cierre", "cantidad", "tasa_cierre_id"
+        ))
+        self.assertEqual(incrementales, reconstruidas)
+        self.assertEqual(len(reconstruidas), 3)
+
+    def test_serie_grafico_termina_en_cotizacion_vigente(self):
+        self.crear_tasa("7400.00", 10)
+        actual = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar, precio_base=Decimal("7600.00"),
+        )
+        serie = velas.serie_grafico(libro_tasas.obtener_libro())["USD"]
+        self.assertEqual(serie[-1].tasa_id, actual.id)
+        self.assertEqual(serie[0].precio_base, Decimal("7400.00"))
+        self.assertLessEqual(len(serie), velas.VELAS_GRAFICO + 1)
+
+    def test_serie_grafico_no_mezcla_pares_con_el_mismo_destino(self):
+        euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        self.crear_tasa("7400.00", 10)
+        TasaDeCambio.objects.create(
+            moneda_origen=euro, moneda_destino=self.dolar, precio_base=Decimal("1.08"),
+            vigencia=self.hora + timedelta(minutes=20),
+        )
+        recientes = velas.velas_recientes()
+        self.assertEqual([v.cierre for v in recientes[("PYG", "USD")]], [Decimal("7400.00")])
+        self.assertEqual([v.cierre for v in recientes[("EUR", "USD")]], [Decimal("1.08")])
+        serie = velas.serie_grafico(libro_tasas.obtener_libro())["USD"]
+        self.assertEqual([c.precio_base for c in serie], [Decimal("7400.00")])
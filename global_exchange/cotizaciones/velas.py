@@ -0,0 +1,313 @@
+"""
+Velas OHLC de tasas de cambio (cotizaciones).
+
+Resume el historial de ``TasaDeCambio`` en velas por hora y por día
+(``VelaTasa``) para que los gráficos lean un número fijo de puntos en lugar de
+todas las tasas registradas.
+
+Mantenimiento:
+    - ``registrar_tasa``: fusiona una tasa nueva en sus velas (incremental).
+    - ``recalcular_intervalo``: recalcula una vela desde las tasas (ediciones,
+      desactivaciones y borrados).
+    - ``reconstruir``: rearma todas las velas desde el historial
+      (``manage.py reconstruir_velas``).
+
+Lectura:
+    - ``velas_recientes(intervalo, limite)``: últimas velas de cada par.
+    - ``serie_grafico(libro, descuento)``: cierres cotizados de las últimas velas
+      diarias más la cotización vigente como último punto.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .cotizador import MONEDA_BASE, cotizar, cotizar_tasa, memorizar
+from .libro_tasas import TasaRegistrada
+from .models import TasaDeCambio, VelaTasa
+
+INTERVALOS = (VelaTasa.INTERVALO_HORA, VelaTasa.INTERVALO_DIA)
+
+#: Cantidad de velas diarias que se envían a los gráficos.
+VELAS_GRAFICO = 30
+
+
+def _como_fecha_hora(vigencia):
+    """Normaliza la vigencia asignada en memoria (date, str o datetime ingenuo) como la guarda la BD."""
+    vigencia = TasaDeCambio._meta.get_field("vigencia").to_python(vigencia)
+    if settings.USE_TZ and timezone.is_naive(vigencia):
+        vigencia = timezone.make_aware(vigencia)
+    return vigencia
+
+
+def inicio_intervalo(vigencia, intervalo):
+    """Comienzo (hora local) de la hora o del día que contiene ``vigencia``."""
+    vigencia = _como_fecha_hora(vigencia)
+    if timezone.is_aware(vigencia):
+        vigencia = timezone.localtime(vigencia)
+    if intervalo == VelaTasa.INTERVALO_HORA:
+        return vigencia.replace(minute=0, second=0, microsecond=0)
+    return vigencia.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def fin_intervalo(inicio, intervalo):
+    """Comienzo del intervalo siguiente."""
+    if intervalo == VelaTasa.INTERVALO_HORA:
+        return inicio + timedelta(hours=1)
+    return inicio_intervalo(inicio + timedelta(days=1, hours=12), intervalo)
+
+
+def registrar_tasa(tasa):
+    """
+    Fusiona una tasa recién creada en su vela horaria y diaria.
+
+    Bloquea la vela (``select_for_update``) para que dos tasas del mismo par
+    guardadas a la vez no se pisen. Las tasas inactivas no forman parte de
+    las velas.
+    """
+    if not tasa.estado:
+        return
+    vigencia = _como_fecha_hora(tasa.vigencia)
+    precio = Decimal(str(tasa.precio_base))
+    with transaction.atomic():
+        for intervalo in INTERVALOS:
+            vela, creada = VelaTasa.objects.select_for_update().get_or_create(
+                moneda_origen_id=tasa.moneda_origen_id,
+                moneda_destino_id=tasa.moneda_destino_id,
+                intervalo=intervalo,
+                inicio=inicio_intervalo(vigencia, intervalo),
+                defaults={
+                    "apertura": precio,
+                    "maximo": precio,
+                    "minimo": precio,
+                    "cierre": precio,
+                    "comision_compra": tasa.comision_compra,
+                    "comision_venta": tasa.comision_venta,
+                    "vigencia_apertura": vigencia,
+                    "vigencia_cierre": vigencia,
+                    "tasa_cierre_id": tasa.pk,
+                },
+            )
+            if creada:
+                continue
+            vela.maximo = max(vela.maximo, precio)
+            vela.minimo = min(vela.minimo, precio)
+            vela.cantidad += 1
+            if vigencia < vela.vigencia_apertura:
+                vela.apertura = precio
+                vela.vigencia_apertura = vigencia
+            # A igual vigencia gana la tasa más nueva (mayor id), como en vigentes()
+            if vigencia >= vela.vigencia_cierre:
+                vela.cierre = precio
+                vela.comision_compra = tasa.comision_compra
+                vela.comision_venta = tasa.comision_venta
+                vela.vigencia_cierre = vigencia
+                vela.tasa_cierre_id = tasa.pk
+            vela.save()
+
+
+def recalcular_intervalo(moneda_origen_id, moneda_destino_id, intervalo, inicio):
+    """
+    Recalcula una vela desde las tasas activas del intervalo.
+
+    Si ya no quedan tasas activas en el intervalo, la vela se elimina.
+    """
+    tasas = TasaDeCambio.objects.filter(
+        moneda_origen_id=moneda_origen_id,
+        moneda_destino_id=moneda_destino_id,
+        estado=True,
+        vigencia__gte=inicio,
+        vigencia__lt=fin_intervalo(inicio, intervalo),
+    )
+    par = {
+        "moneda_origen_id": moneda_origen_id,
+        "moneda_destino_id": moneda_destino_id,
+        "intervalo": intervalo,
+        "inicio": inicio,
+    }
+    resumen = tasas.aggregate(maximo=Max("precio_base"), minimo=Min("precio_base"), cantidad=Count("id"))
+    if not resumen["cantidad"]:
+        VelaTasa.objects.filter(**par).delete()
+        return None
+
+    primera = tasas.order_by("vigencia", "id").first()
+    ultima = tasas.order_by("-vigencia", "-id").first()
+    vela, _ = VelaTasa.objects.update_or_create(
+        **par,
+        defaults={
+            "apertura": primera.precio_base,
+            "maximo": resumen["maximo"],
+            "minimo": resumen["minimo"],
+            "cierre": ultima.precio_base,
+            "comision_compra": ultima.comision_compra,
+            "comision_venta": ultima.comision_venta,
+            "vigencia_apertura": primera.vigencia,
+            "vigencia_cierre": ultima.vigencia,
+            "tasa_cierre_id": ultima.pk,
+            "cantidad": resumen["cantidad"],
+        },
+    )
+    return vela
+
+
+def recalcular_tasa(tasa, valores_originales=None):
+    """
+    Recalcula las velas afectadas por la edición o el borrado de una tasa.
+
+    :param valores_originales: Par y vigencia con los que se leyó la tasa
+        (``TasaDeCambio.previous_value``), para recalcular también las
+        velas de donde salió si cambió de par o de vigencia.
+    """
+    ubicaciones = {(tasa.moneda_origen_id, tasa.moneda_destino_id, tasa.vigencia)}
+    if valores_originales and valores_originales.get("vigencia") is not None:
+        ubicaciones.add((
+            valores_originales["moneda_origen_id"],
+            valores_originales["moneda_destino_id"],
+            valores_originales["vigencia"],
+        ))
+    velas = {
+        (origen_id, destino_id, intervalo, inicio_intervalo(vigencia, intervalo))
+        for origen_id, destino_id, vigencia in ubicaciones
+        for intervalo in INTERVALOS
+    }
+    with transaction.atomic():
+        for vela in velas:
+            recalcular_intervalo(*vela)
+
+
+def reconstruir(intervalos=INTERVALOS, tamano_lote=1000):
+    """
+    Borra y rearma las velas de los intervalos indicados desde todo el historial.
+
+    Recorre las tasas activas una sola vez, ordenadas por par y vigencia, y
+    crea las velas con ``bulk_create``.
+
+    :return: Cantidad de velas creadas.
+    """
+    tasas = (
+        TasaDeCambio.objects
+        .filter(estado=True)
+        .order_by("moneda_origen_id", "moneda_destino_id", "vigencia", "id")
+        .values_list(
+            "id", "moneda_origen_id", "moneda_destino_id", "precio_base",
+            "comision_compra", "comision_venta", "vigencia",
+        )
+    )
+    creadas = 0
+    with transaction.atomic():
+        VelaTasa.objects.filter(intervalo__in=intervalos).delete()
+        abiertas = {}
+        lote = []
+        for tasa_id, origen_id, destino_id, precio, com_compra, com_venta, vigencia in tasas.iterator(chunk_size=2000):
+            for intervalo in intervalos:
+                inicio = inicio_intervalo(vigencia, intervalo)
+                vela = abiertas.get((origen_id, destino_id, intervalo))
+                if vela is None or vela.inicio != inicio:
+                    if vela is not None:
+                        lote.append(vela)
+                    vela = abiertas[(origen_id, destino_id, intervalo)] = VelaTasa(
+                        moneda_origen_id=origen_id,
+                        moneda_destino_id=destino_id,
+                        intervalo=intervalo,
+                        inicio=inicio,
+                        apertura=precio,
+                        maximo=precio,
+                        minimo=precio,
+                        vigencia_apertura=vigencia,
+                        cantidad=0,
+                    )
+                vela.maximo = max(vela.maximo, precio)
+                vela.minimo = min(vela.minimo, precio)
+                vela.cierre = precio
+                vela.comision_compra = com_compra
+                vela.comision_venta = com_venta
+                vela.vigencia_cierre = vigencia
+                vela.tasa_cierre_id = tasa_id
+                vela.cantidad += 1
+            if len(lote) >= tamano_lote:
+                VelaTasa.objects.bulk_create(lote)
+                creadas += len(lote)
+                lote = []
+        lote.extend(abiertas.values())
+        VelaTasa.objects.bulk_create(lote, batch_size=tamano_lote)
+        creadas += len(lote)
+    return creadas
+
+
+def velas_recientes(intervalo=VelaTasa.INTERVALO_DIA, limite=VELAS_GRAFICO):
+    """
+    Últimas ``limite`` velas de cada par en una sola consulta.
+
+    :return: ``{(abreviacion_origen, abreviacion_destino): [VelaTasa, ...]}``
+        de la más antigua a la más reciente.
+    """
+    velas = (
+        VelaTasa.objects
+        .filter(intervalo=intervalo, inicio__lte=timezone.now())
+        .annotate(fila=Window(
+            expression=RowNumber(),
+            partition_by=[F("moneda_origen_id"), F("moneda_destino_id")],
+            order_by=F("inicio").desc(),
+        ))
+        .filter(fila__lte=limite)
+        .select_related("moneda_origen", "moneda_destino")
+        .order_by("moneda_origen_id", "moneda_destino_id", "inicio")
+    )
+    por_par = {}
+    for vela in velas:
+        par = (vela.moneda_origen.abreviacion, vela.moneda_destino.abreviacion)
+        por_par.setdefault(par, []).append(vela)
+    return por_par
+
+
+def _tasa_de_vela(vela):
+    return TasaRegistrada(
+        id=vela.tasa_cierre_id,
+        origen=vela.moneda_origen.abreviacion,
+        destino=vela.moneda_destino.abreviacion,
+        origen_id=vela.moneda_origen_id,
+        destino_id=vela.moneda_destino_id,
+        precio_base=vela.cierre,
+        comision_compra=vela.comision_compra,
+        comision_venta=vela.comision_venta,
+        vigencia=vela.inicio,
+        fecha_actualizacion=None,
+    )
+
+
+def serie_grafico(libro, descuento=0, intervalo=VelaTasa.INTERVALO_DIA, limite=VELAS_GRAFICO):
+    """
+    Serie de precios para los gráficos: cierre de cada una de las últimas
+    ``limite`` velas, cotizado con el descuento del cliente, y como último
+    punto la cotización vigente (si no es ya el cierre de la última vela).
+
+    Como ``cotizar``, sólo toma los pares cuyo origen es ``MONEDA_BASE``.
+
+    Se memoriza sobre la instantánea del libro, que cambia de versión en la
+    misma transacción en que se actualizan las velas.
+
+    :return: ``{abreviacion_destino: [Cotizacion, ...]}`` en el orden del libro.
+    """
+    def construir():
+        cotizaciones = cotizar(libro, descuento)
+        velas = velas_recientes(intervalo, limite)
+        ahora = timezone.now()
+        serie = {}
+        for moneda, actual in cotizaciones.items():
+            # Una vela cuyo cierre es una tasa programada todavía no se muestra
+            puntos = [
+                cotizar_tasa(_tasa_de_vela(vela), descuento)
+                for vela in velas.get((MONEDA_BASE, moneda), [])
+                if vela.vigencia_cierre <= ahora
+            ]
+            if not puntos or puntos[-1].tasa_id != actual.tasa_id:
+                puntos.append(actual)
+            serie[moneda] = puntos
+        return serie
+
+    clave = ("serie_grafico", intervalo, limite, Decimal(str(descuento or 0)))
+    return memorizar(libro, clave, construir)
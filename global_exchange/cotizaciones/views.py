@@ -1,56 +1,77 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from functools import wraps
 from django.urls import reverse
+from django.utils.http import urlencode
+
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
 
 from operaciones.views import obtener_clientes_usuario
+from . import feed, importacion, listado
+from .libro_tasas import obtener_libro
 from .models import TasaDeCambio, Moneda
 from .forms import TasaDeCambioForm
 from django.db.models import Q
 from datetime import datetime
 
+def _tasa_json(tasa):
+    return {
+        "id": tasa.id,
+        "origen": tasa.moneda_origen.abreviacion,
+        "destino": tasa.moneda_destino.abreviacion,
+        "moneda_destino": tasa.moneda_destino.nombre,
+        "precio_base": str(tasa.precio_base),
+        "comision_compra": str(tasa.comision_compra),
+        "comision_venta": str(tasa.comision_venta),
+        "vigencia": tasa.vigencia.strftime("%d/%m/%Y %H:%M"),
+        "estado": tasa.estado,
+    }
+
+
+def _contexto_lista(request, **extra):
+    """Contexto de ``cotizaciones/lista.html`` con la página pedida en ``request.GET``."""
+    pagina = listado.pagina_tasas(request.GET)
+    contexto = {
+        "tasas": pagina.tasas,
+        "siguiente": pagina.siguiente,
+        "anterior": pagina.anterior,
+        "tamano": pagina.tamano,
+        "monedas": pagina.monedas,
+        "form": TasaDeCambioForm(),  # formulario vacío para crear nueva tasa
+        "modal_type": "create",
+        "obj_id": None,
+        "filtros_url": urlencode({k: v for k, v in pagina.filtros.items() if v}),
+        **pagina.filtros,
+    }
+    contexto.update(extra)
+    return contexto
+
+
 def cotizacion_lista(request):
     """
-    Vista que lista todas las tasas de cambio.
+    Vista que lista las tasas de cambio, paginadas por cursor.
 
     - Solo accesible por superadministradores.
-    - Permite filtrar resultados por nombre de moneda de origen o destino.
-    - Devuelve el template ``cotizaciones/lista.html`` con:
-        - tasas: queryset filtrado y ordenado por vigencia.
+    - Filtros GET (ver ``cotizaciones.listado``): ``q``/``campo`` (nombre de
+      moneda), ``destino``, ``desde``/``hasta`` (vigencia), ``tamano``.
+    - Navegación con ``despues``/``antes`` (cursores de la página actual).
+    - Con ``?formato=json`` devuelve la página en JSON (para los modales):
+        {"tasas": [...], "siguiente": <cursor|null>, "anterior": <cursor|null>}
+    - Si no, devuelve el template ``cotizaciones/lista.html`` con:
+        - tasas: filas de la página, ordenadas por vigencia descendente.
+        - siguiente / anterior: cursores para navegar.
         - form: formulario vacío de TasaDeCambioForm (para crear nuevas tasas).
-        - q: cadena de búsqueda.
-        - campo: campo seleccionado para filtrar.
+        - q, campo, destino, desde, hasta: filtros aplicados.
     """
-    tasas = TasaDeCambio.objects.filter(
-        moneda_origen__estado=True,
-        moneda_destino__estado=True
-    ).order_by('-vigencia')
-    form = TasaDeCambioForm()  # formulario vacío para crear nueva tasa
-    q = request.GET.get("q", "").strip()
-    campo = request.GET.get("campo", "").strip()
-    
-    # 🔍 Filtro de búsqueda
-    if q:
-        if campo == "moneda_destino":
-            tasas = tasas.filter(moneda_destino__nombre__icontains=q)
-        else:
-            # Si no elige campo, buscar en ambos
-            tasas = tasas.filter(
-                Q(moneda_destino__nombre__icontains=q) |
-                Q(moneda_origen__nombre__icontains=q)
-            )
-
-    # 🔹 Mantener orden por vigencia después del filtro
-    tasas = tasas.order_by('-vigencia')
-
-    return render(request, "cotizaciones/lista.html", {
-        "tasas": tasas,
-        "form": form,
-        "modal_type": "create",  
-        "obj_id": None,
-        "q": q,
-        "campo": campo,
-    })
+    if request.GET.get("formato") == "json":
+        pagina = listado.pagina_tasas(request.GET)
+        return JsonResponse({
+            "tasas": [_tasa_json(t) for t in pagina.tasas],
+            "siguiente": pagina.siguiente,
+            "anterior": pagina.anterior,
+        })
+    return render(request, "cotizaciones/lista.html", _contexto_lista(request))
 
 
 
@@ -96,14 +117,10 @@ def cotizacion_nuevo(request):
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
                 return JsonResponse({"success": False, "errors": errors})
             
-            cotizaciones = TasaDeCambio.objects.all().order_by('-id')
             print("cotizaciones:", flush=True)
-            return render(request, "cotizaciones/lista.html", {
-                "tasas": cotizaciones,
-                "form": form,
-                "show_modal": True,
-                "modal_type": "create",
-            })
+            return render(request, "cotizaciones/lista.html", _contexto_lista(
+                request, form=form, show_modal=True, modal_type="create",
+            ))
     return redirect("cotizacion")
 
 def cotizacion_editar(request, pk):
@@ -143,25 +160,15 @@ def cotizacion_editar(request, pk):
             errors = {field: [str(e) for e in errs] for field, errs in form.errors.items()}
             if request.headers.get("x-requested-with") == "XMLHttpRequest":
                 return JsonResponse({"success": False, "errors": errors})
-            cotizaciones = TasaDeCambio.objects.all().order_by('-id')
-            return render(request, "cotizaciones/lista.html", {
-                "tasas": cotizaciones,
-                "form": form,
-                "show_modal": True,
-                "obj_id": cotizacion.id, 
-                "modal_type": "edit",
-            })
+            return render(request, "cotizaciones/lista.html", _contexto_lista(
+                request, form=form, show_modal=True, obj_id=cotizacion.id, modal_type="edit",
+            ))
 
     # GET → mostrar modal
     form = TasaDeCambioForm(instance=cotizacion)
-    cotizaciones = TasaDeCambio.objects.all().order_by('-id')
-    return render(request, "cotizaciones/lista.html", {
-        "tasas": cotizaciones,
-        "form": form,
-        "show_modal": True,
-        "modal_type": "edit",
-        "obj_id": cotizacion.id,
-    })
+    return render(request, "cotizaciones/lista.html", _contexto_lista(
+        request, form=form, show_modal=True, modal_type="edit", obj_id=cotizacion.id,
+    ))
 
 def cotizacion_desactivar(request, pk):
     """
@@ -206,4 +213,66 @@ def cotizacion_detalle(request, pk):
         "monto_compra": float(cotizacion.monto_compra),
         "monto_venta": float(cotizacion.monto_venta),
         "vigencia": cotizacion.vigencia.strftime("%Y-%m-%d %H:%M") if cotizacion.vigencia else None,
-    })
\ No newline at end of file
+    })
+
+@require_POST
+def cotizacion_importar(request):
+    """
+    Importa un lote de tasas de cambio desde un archivo CSV/JSON o un cuerpo JSON.
+
+    - Método: POST
+    - Entrada:
+        - ``archivo`` (multipart): ``.csv`` con encabezado o ``.json``.
+        - o un cuerpo ``application/json`` con la lista de tasas.
+    - Todas las filas se validan antes de guardar; si alguna es inválida no se
+      importa ninguna (ver ``cotizaciones.importacion``).
+    - Devuelve:
+        {"success": true, "creadas": <n>, "notificaciones": <n>}
+        {"success": false, "errores": [{"fila": <n>, "errores": [...]}, ...]}
+    """
+    try:
+        archivo = request.FILES.get("archivo")
+        if archivo:
+            formato = "json" if archivo.name.lower().endswith(".json") else "csv"
+            filas = importacion.leer_archivo(archivo.read(), formato)
+        elif request.content_type == "application/json":
+            filas = importacion.leer_archivo(request.body, "json")
+        else:
+            return JsonResponse({"success": False, "error": "Debe adjuntar un archivo CSV o JSON."}, status=400)
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    resultado = importacion.importar(filas, usuario=request.user)
+    if resultado.errores:
+        return JsonResponse({"success": False, "errores": resultado.errores}, status=400)
+    return JsonResponse({
+        "success": True,
+        "creadas": len(resultado.tasas),
+        "notificaciones": len(resultado.notificaciones),
+    })
+
+
+@require_GET
+@cache_control(public=True, no_cache=True)
+@condition(
+    etag_func=lambda request: feed.etag(obtener_libro()),
+    last_modified_func=lambda request: feed.ultima_modificacion(obtener_libro()),
+)
+def feed_tasas(request):
+    """
+    Feed público (sólo lectura) con las cotizaciones vigentes de todas las monedas.
+
+    Pensado para los sondeos del tauser, la página de aterrizaje y el simulador:
+    responde con ``ETag`` (versión del libro de tasas) y ``Last-Modified``; un
+    sondeo con ``If-None-Match``/``If-Modified-Since`` sin cambios recibe 304
+    sin consultar la base de datos.
+
+    - Devuelve:
+        {
+            "version": <etag>,
+            "actualizado": <ISO 8601>,
+            "tasas": [{"origen", "destino", "tasa_id", "precio_base", "compra",
+                       "venta", "comision_compra", "comision_venta", "vigencia"}, ...]
+        }
+    """
+    return HttpResponse(feed.contenido(obtener_libro()), content_type="application/json")
@@ -0,0 +1,135 @@
+# global_exchange/idempotencia.py
+"""
+Claves de idempotencia para vistas POST (cabecera ``Idempotency-Key``).
+
+Un cliente que reintenta un pedido (p. ej. desde el celular con mala
+conexión) manda la misma clave en cada intento. La primera vez la vista se
+ejecuta y su respuesta se guarda en la caché compartida; los reintentos
+reciben la respuesta guardada (con ``Idempotent-Replayed: true``) sin volver
+a insertar filas ni llamar a servicios externos: cuestan una lectura de caché.
+
+Cada clave guarda también la huella del pedido (método, ruta y cuerpo):
+
+    - Misma clave, mismo pedido, ya respondido   → se repite la respuesta.
+    - Misma clave, mismo pedido, todavía en curso → 409.
+    - Misma clave con otro pedido                 → 422.
+
+Las respuestas 5xx (o una excepción) no se guardan: el cliente puede
+reintentar con la misma clave. Sin cabecera la vista funciona como siempre.
+
+Las claves son por usuario (o por sesión, si el pedido es anónimo) y por
+ruta, y duran ``IDEMPOTENCIA_TTL_SEGUNDOS``. Un pedido anónimo sin sesión no
+tiene a quién atribuirle la clave: la cabecera se ignora, para que dos
+clientes anónimos no reciban la respuesta guardada del otro.
+
+Uso:
+    @idempotente
+    def guardar_transaccion(request):
+        ...
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+#: Segundos que se conserva una respuesta si no se define ``IDEMPOTENCIA_TTL_SEGUNDOS``.
+TTL_POR_DEFECTO = 24 * 60 * 60
+
+#: Segundos que una clave queda "en curso" como máximo (si el proceso muere a mitad).
+EN_CURSO_SEGUNDOS = 60
+
+#: Largo máximo de la clave que manda el cliente.
+LARGO_MAXIMO = 255
+
+CABECERA = "Idempotency-Key"
+
+
+def ttl():
+    """Segundos que se conserva una respuesta (``IDEMPOTENCIA_TTL_SEGUNDOS``)."""
+    return getattr(settings, "IDEMPOTENCIA_TTL_SEGUNDOS", TTL_POR_DEFECTO)
+
+
+def alcance(request):
+    """
+    A quién pertenecen las claves del pedido: el id del usuario autenticado,
+    ``sesion:<clave de sesión>`` para un anónimo con sesión, o ``None`` si
+    no hay cómo distinguir a un anónimo de otro.
+    """
+    usuario = getattr(request, "user", None)
+    if usuario is not None and usuario.is_authenticated:
+        return str(usuario.pk)
+    sesion = getattr(request, "session", None)
+    if sesion is not None and sesion.session_key:
+        return f"sesion:{sesion.session_key}"
+    return None
+
+
+def clave_cache(request, clave):
+    resumen = hashlib.sha256(clave.encode()).hexdigest()
+    return f"idempotencia:{alcance(request)}:{request.path}:{resumen}"
+
+
+def huella(request):
+    """Huella del pedido: método, ruta y cuerpo."""
+    contenido = hashlib.sha256()
+    contenido.update(request.method.encode())
+    contenido.update(request.path.encode())
+    contenido.update(request.body)
+    return contenido.hexdigest()
+
+
+def _repetir(guardada):
+    respuesta = HttpResponse(guardada["contenido"], status=guardada["status"], content_type=guardada["content_type"])
+    respuesta["Idempotent-Replayed"] = "true"
+    return respuesta
+
+
+def idempotente(vista):
+    """Decorador: respeta la cabecera ``Idempotency-Key`` en pedidos POST."""
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = request.headers.get(CABECERA)
+        if request.method != "POST" or not clave or alcance(request) is None:
+            return vista(request, *args, **kwargs)
+        if len(clave) > LARGO_MAXIMO:
+            return JsonResponse({"success": False, "error": f"{CABECERA} demasiado larga"}, status=400)
+
+        cache_clave = clave_cache(request, clave)
+        pedido = huella(request)
+        en_curso = {"estado": "en_curso", "huella": pedido}
+        # Un reintento se resuelve con esta única lectura; add es atómico para
+        # que dos pedidos simultáneos con la misma clave no se ejecuten los dos
+        guardada = cache.get(cache_clave)
+        if guardada is not None or not cache.add(cache_clave, en_curso, timeout=EN_CURSO_SEGUNDOS):
+            guardada = guardada or cache.get(cache_clave) or en_curso
+            if guardada["huella"] != pedido:
+                return JsonResponse(
+                    {"success": False, "error": f"{CABECERA} ya usada con otro pedido"}, status=422,
+                )
+            if guardada["estado"] == "en_curso":
+                return JsonResponse(
+                    {"success": False, "error": "El pedido con esta clave todavía se está procesando"}, status=409,
+                )
+            return _repetir(guardada)
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_clave)
+            raise
+        if respuesta.status_code >= 500 or getattr(respuesta, "streaming", False):
+            cache.delete(cache_clave)
+            return respuesta
+        cache.set(cache_clave, {
+            "estado": "completa",
+            "huella": pedido,
+            "status": respuesta.status_code,
+            "contenido": respuesta.content,
+            "content_type": respuesta.get("Content-Type"),
+        }, timeout=ttl())
+        return respuesta
+
+    return envoltura
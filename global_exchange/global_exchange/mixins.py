@@ -0,0 +1,88 @@
+# global_exchange/mixins.py
+"""
+Mixins reutilizables para los modelos del proyecto.
+
+SeguimientoCambiosMixin
+    Guarda una instantánea de los valores con los que se leyó la fila
+    (``from_db``) para saber qué cambió antes de guardarla, sin volver a
+    consultar la base ni guardar nada fuera de la instancia.
+
+Uso:
+    class TasaDeCambio(SeguimientoCambiosMixin, models.Model):
+        ...
+
+    tasa = TasaDeCambio.objects.get(pk=1)
+    tasa.precio_base = Decimal("7100")
+    tasa.changed_fields()               # {"precio_base"}
+    tasa.previous_value("precio_base")  # Decimal("7000.00")
+"""
+
+
+class SeguimientoCambiosMixin:
+    """
+    Seguimiento de cambios por instantánea (debe ir antes de ``models.Model``).
+
+    - ``from_db``: la instantánea son los valores leídos de la base.
+    - ``save``: después de guardar (y de las señales ``post_save``) la
+      instantánea pasa a ser lo guardado; así los receptores de ``post_save``
+      todavía ven los valores anteriores.
+    - Una instancia nueva no tiene instantánea hasta su primer guardado:
+      ``changed_fields()`` es vacío y ``previous_value()`` devuelve ``None``.
+    - Los campos diferidos (``only()``/``defer()``) no entran en la instantánea.
+
+    Atributos:
+        campos_seguidos (tuple | None): Campos a seguir; ``None`` = todos los
+            campos concretos. Las FK se guardan por ``attname`` (``moneda_id``).
+    """
+    campos_seguidos = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._guardar_instantanea()
+        return instancia
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._guardar_instantanea()
+
+    @classmethod
+    def _attnames_seguidos(cls):
+        campos = cls._meta.concrete_fields
+        if cls.campos_seguidos is not None:
+            campos = [cls._meta.get_field(nombre) for nombre in cls.campos_seguidos]
+        return [campo.attname for campo in campos]
+
+    def _guardar_instantanea(self):
+        self._valores_originales = {
+            attname: self.__dict__[attname]
+            for attname in self._attnames_seguidos()
+            if attname in self.__dict__
+        }
+
+    def _attname(self, campo):
+        return self._meta.get_field(campo).attname
+
+    def changed_fields(self):
+        """
+        Campos cuyo valor actual difiere del leído/guardado.
+
+        :return: Conjunto de nombres (``attname``; p. ej. ``moneda_id``).
+        """
+        originales = getattr(self, "_valores_originales", {})
+        return {
+            attname for attname, valor in originales.items()
+            if self.__dict__.get(attname) != valor
+        }
+
+    def has_changed(self, campo):
+        """Indica si ``campo`` (nombre o ``attname``) cambió."""
+        return self._attname(campo) in self.changed_fields()
+
+    def previous_value(self, campo):
+        """
+        Valor de ``campo`` (nombre o ``attname``) al leerlo/guardarlo por última vez.
+
+        Para FK devuelve el id. ``None`` si la instancia es nueva o el campo era diferido.
+        """
+        return getattr(self, "_valores_originales", {}).get(self._attname(campo))
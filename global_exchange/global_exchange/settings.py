@@ -71,6 +71,30 @@ EMAIL_USE_TLS = True
 #: Tiempo de expiración de links de reseteo de contraseña (en segundos).
 PASSWORD_RESET_TIMEOUT = 14400  # 4 horas
 
+#: Validez (en segundos) de las cotizaciones firmadas que emite el simulador
+#: (``operaciones.cotizacion_firmada``). Vencida, la transacción queda
+#: como ``cancelada_cotizacion``.
+COTIZACION_VALIDEZ_SEGUNDOS = env.int("COTIZACION_VALIDEZ_SEGUNDOS", default=300)
+
+#: Ventana (en milisegundos) en la que se agrupan los cambios de un mismo par
+#: antes de avisar por WebSocket (``notificaciones.eventos``): una ráfaga de
+#: ediciones se avisa como un único cambio neto. 0 la desactiva.
+NOTIFICACIONES_VENTANA_MS = env.int("NOTIFICACIONES_VENTANA_MS", default=1000)
+
+#: Bandeja de avisos por usuario (``notificaciones.bandeja``): máximo de avisos
+#: guardados por usuario y días que se conservan.
+NOTIFICACIONES_BANDEJA_MAXIMO = env.int("NOTIFICACIONES_BANDEJA_MAXIMO", default=200)
+NOTIFICACIONES_RETENCION_DIAS = env.int("NOTIFICACIONES_RETENCION_DIAS", default=30)
+
+#: Minutos que una transacción pendiente mantiene reservado su importe dentro
+#: de los límites del cliente (``operaciones.consumo``); vencida, la reserva se
+#: libera con ``manage.py liberar_reservas``.
+LIMITES_RESERVA_MINUTOS = env.int("LIMITES_RESERVA_MINUTOS", default=30)
+
+#: Segundos que se guarda la respuesta de un pedido con ``Idempotency-Key``
+#: (``global_exchange.idempotencia``) para repetirla en los reintentos.
+IDEMPOTENCIA_TTL_SEGUNDOS = env.int("IDEMPOTENCIA_TTL_SEGUNDOS", default=24 * 60 * 60)
+
 
 # ============================================================================
 # Aplicaciones instaladas
@@ -121,6 +145,15 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+#: Caché compartida entre workers. El libro de tasas (``cotizaciones.libro_tasas``)
+#: publica aquí su número de versión para que cada proceso sepa cuándo reconstruirse.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env("DJANGO_CACHE_URL", default="redis://redis:6379/1"),
+    }
+}
 # ============================================================================
 # Middleware
 # ============================================================================
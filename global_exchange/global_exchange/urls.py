@@ -28,6 +28,7 @@ from configuracion import views as configuracion_views
 from operaciones import urls as operaciones_urls
 from medio_acreditacion import urls as medio_acreditacion
 from configuracion_usuario import views as configuracion_view_usuario
+from cotizaciones import views as cotizaciones_views
 
 
 urlpatterns = [
@@ -51,6 +52,7 @@ urlpatterns = [
     path('notificaciones/', include('notificaciones.urls')),
     path('configuracion/', include("configuracion_usuario.urls")),
     path('tauser/', include('tauser.urls')),
+    path('api/tasas/', cotizaciones_views.feed_tasas, name='feed_tasas'),
 
     
     
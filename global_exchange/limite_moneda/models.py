@@ -2,8 +2,9 @@ from decimal import Decimal
 from django.db import models
 from django.core.exceptions import ValidationError
 from monedas.models import Moneda  
+from global_exchange.mixins import SeguimientoCambiosMixin
 
-class LimiteTransaccion(models.Model):
+class LimiteTransaccion(SeguimientoCambiosMixin, models.Model):
     """
     Representa un límite de transacción para un cliente específico en una moneda concreta.
 
@@ -21,6 +22,9 @@ class LimiteTransaccion(models.Model):
     Restricciones:
         - unique_together: Un cliente no puede tener más de un límite para la misma moneda.
         - Validation: limite_mensual >= limite_diario.
+
+    Con ``SeguimientoCambiosMixin``: ``changed_fields()`` / ``previous_value()``
+    (p. ej. el límite anterior) sin volver a consultar la fila.
     """
     limite_diario = models.DecimalField(
         max_digits=20, decimal_places=8, default=Decimal('0'),
@@ -0,0 +1,204 @@
+"""
+Alertas de precio (Notificaciones).
+
+Cada proceso que evalúa alertas (el worker ``procesar_eventos_tasas``)
+mantiene en memoria un índice ordenado de las ``AlertaPrecio`` activas: por
+``(moneda, tipo, direccion)`` una lista de umbrales ordenada. Cuando el precio
+pasa de ``anterior`` a ``nuevo`` las alertas disparadas son un tramo contiguo
+de esa lista, que se encuentra con dos búsquedas binarias (``bisect``):
+
+    arriba:  anterior < umbral <= nuevo      (el precio subió y cruzó el umbral)
+    abajo:   nuevo <= umbral < anterior      (el precio bajó y cruzó el umbral)
+
+Así evaluar un cambio no recorre todas las alertas: cuesta O(log n) más las
+alertas disparadas, aunque haya cientos de miles.
+
+Como el libro de tasas (``cotizaciones.libro_tasas``), el índice lleva una
+versión publicada en la caché compartida; crear, borrar o disparar alertas la
+incrementa y el proceso reconstruye su índice la próxima vez que lo usa.
+
+Uso:
+    alertas.disparar("USD", alertas.precios_referencia(tasa_anterior, tasa_nueva))
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from notificaciones import bandeja, presencia
+from notificaciones.models import AlertaPrecio
+from notificaciones.servicios import grupo_usuario
+
+#: Clave de la caché compartida donde se publica la versión del índice.
+CLAVE_VERSION = "notificaciones:alertas:version"
+
+#: Máximo de alertas activas por usuario.
+MAXIMO_POR_USUARIO = 50
+
+#: Lo mínimo de una tasa para calcular sus precios de referencia
+#: (también sirve una ``TasaDeCambio``).
+Precio = namedtuple("Precio", ["precio_base", "comision_compra", "comision_venta"])
+
+#: Alerta dentro del índice.
+AlertaRegistrada = namedtuple("AlertaRegistrada", ["id", "user_id", "moneda", "tipo", "direccion", "precio"])
+
+
+class IndiceAlertas:
+    """
+    Índice inmutable de las alertas activas, ordenadas por umbral.
+
+    Atributos:
+        version (int): Versión de la caché con la que se construyó.
+    """
+
+    def __init__(self, version, alertas):
+        self.version = version
+        grupos = defaultdict(list)
+        for alerta in sorted(alertas, key=lambda a: (a.precio, a.id)):
+            grupos[(alerta.moneda, alerta.tipo, alerta.direccion)].append(alerta)
+        # Por clave: (umbrales, alertas) en paralelo, para bisect sobre los umbrales
+        self._grupos = {
+            clave: ([a.precio for a in lista], lista) for clave, lista in grupos.items()
+        }
+
+    def __len__(self):
+        return sum(len(lista) for _, lista in self._grupos.values())
+
+    def cruzadas(self, moneda, tipo, anterior, nuevo):
+        """Alertas de ``moneda``/``tipo`` que dispara un cambio de ``anterior`` a ``nuevo``."""
+        if anterior is None or nuevo is None or anterior == nuevo:
+            return []
+        direccion = "arriba" if nuevo > anterior else "abajo"
+        grupo = self._grupos.get((moneda, tipo, direccion))
+        if not grupo:
+            return []
+        umbrales, lista = grupo
+        if direccion == "arriba":
+            return lista[bisect_right(umbrales, anterior):bisect_right(umbrales, nuevo)]
+        return lista[bisect_left(umbrales, nuevo):bisect_left(umbrales, anterior)]
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def version_actual():
+    """Versión publicada del índice (se siembra con la hora si no existe)."""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, int(time.time() * 1000), timeout=None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def incrementar_version():
+    """Publica una nueva versión para que los procesos reconstruyan su índice."""
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        version_actual()
+        return cache.incr(CLAVE_VERSION)
+
+
+def _construir(version):
+    alertas = (
+        AlertaPrecio.objects
+        .filter(activa=True)
+        .values_list("id", "user_id", "moneda__abreviacion", "tipo", "direccion", "precio")
+        .iterator(chunk_size=5000)
+    )
+    return IndiceAlertas(version, (AlertaRegistrada(*fila) for fila in alertas))
+
+
+def obtener_indice():
+    """
+    Devuelve el índice vigente; sólo consulta la base si cambió la versión.
+
+    A diferencia del libro de tasas, se guarda aunque se construya dentro de
+    un ``atomic``: ``disparar`` vuelve a comprobar en la base que cada alerta
+    siga activa antes de avisar.
+    """
+    global _indice
+    version = version_actual()
+    indice = _indice
+    if indice is not None and indice.version == version:
+        return indice
+    with _lock:
+        if _indice is None or _indice.version != version:
+            _indice = _construir(version)
+        return _indice
+
+
+def precios_referencia(anterior, nuevo):
+    """
+    Precios de venta y compra antes y después de un cambio.
+
+    :param anterior: ``Precio`` o ``TasaDeCambio`` anterior.
+    :param nuevo: ``Precio`` o ``TasaDeCambio`` nueva.
+    :return: ``{"venta": (anterior, nuevo), "compra": (anterior, nuevo)}``
+    """
+    return {
+        "venta": (anterior.precio_base + anterior.comision_venta, nuevo.precio_base + nuevo.comision_venta),
+        "compra": (anterior.precio_base - anterior.comision_compra, nuevo.precio_base - nuevo.comision_compra),
+    }
+
+
+def disparar(moneda, precios):
+    """
+    Dispara las alertas de ``moneda`` que cruza un cambio de precio.
+
+    :param precios: ``{tipo: (anterior, nuevo)}`` para ``venta`` y/o ``compra``
+        (ver ``precios_referencia``).
+    :return: Alertas disparadas (``AlertaRegistrada``).
+    """
+    indice = obtener_indice()
+    candidatas = {}
+    for tipo, (anterior, nuevo) in precios.items():
+        for alerta in indice.cruzadas(moneda, tipo, anterior, nuevo):
+            candidatas[alerta.id] = (alerta, anterior, nuevo)
+    if not candidatas:
+        return []
+
+    with transaction.atomic():
+        # El índice puede estar un poco atrasado: sólo se disparan las que siguen activas
+        activas = list(
+            AlertaPrecio.objects.select_for_update()
+            .filter(id__in=candidatas, activa=True)
+            .values_list("id", flat=True)
+        )
+        AlertaPrecio.objects.filter(id__in=activas).update(activa=False, disparada_en=timezone.now())
+        transaction.on_commit(incrementar_version)
+        disparadas = [candidatas[alerta_id] for alerta_id in activas]
+        transaction.on_commit(lambda: _avisar(disparadas))
+
+    print(f"🔔 {moneda}: {len(disparadas)} alertas de precio disparadas")
+    return [alerta for alerta, _, _ in disparadas]
+
+
+def _avisar(disparadas):
+    """
+    Deja cada alerta disparada en la bandeja de su usuario y, si está
+    conectado (``notificaciones.presencia``), la envía a su grupo personal.
+    """
+    capa = get_channel_layer()
+    for alerta, anterior, nuevo in disparadas:
+        evento = {
+            "type": "alerta_precio",
+            "alerta_id": alerta.id,
+            "moneda": alerta.moneda,
+            "tipo": alerta.tipo,
+            "direccion": alerta.direccion,
+            "precio_objetivo": float(alerta.precio),
+            "precio_anterior": float(anterior),
+            "precio_nuevo": float(nuevo),
+            "porcentaje_cambio": float(abs((nuevo - anterior) / anterior * 100)) if anterior else 0.0,
+        }
+        aviso = bandeja.registrar(evento, usuarios=[alerta.user_id])
+        if presencia.usuario_conectado(alerta.user_id):
+            async_to_sync(capa.group_send)(grupo_usuario(alerta.user_id), {**evento, "id": aviso.id})
@@ -0,0 +1,154 @@
+"""
+Bandeja de avisos por usuario (Notificaciones).
+
+Cada aviso de cambio de tasa que sale por WebSocket se guarda antes de
+enviarlo (``AvisoTasa``) junto con una fila por destinatario
+(``NotificacionUsuario``). Así un usuario que estaba desconectado no lo pierde:
+
+    - Al reconectarse, el cliente manda el id del último aviso que vio
+      (``/ws/notificaciones/?ultimo=<id>``) y el consumer le repite sólo los
+      posteriores.
+    - ``/notificaciones/bandeja/`` devuelve la bandeja paginada (JSON) con el
+      contador de no leídas.
+
+La bandeja está acotada: ``depurar()`` (comando ``depurar_notificaciones``)
+borra los avisos vencidos y lo que supera el máximo por usuario; además las
+lecturas nunca devuelven más de ``maximo()`` avisos.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from notificaciones.models import AvisoTasa, NotificacionMoneda, NotificacionUsuario
+
+#: Valores por defecto si no se definen en settings.
+MAXIMO_POR_DEFECTO = 200
+RETENCION_DIAS_POR_DEFECTO = 30
+
+#: Tamaño de página del endpoint de la bandeja.
+TAMANO_PAGINA = 20
+TAMANO_MAXIMO = 100
+
+
+def maximo():
+    """Cantidad máxima de avisos que se guardan (y se repiten) por usuario."""
+    return max(getattr(settings, "NOTIFICACIONES_BANDEJA_MAXIMO", MAXIMO_POR_DEFECTO), 1)
+
+
+def retencion():
+    """Tiempo que se conserva un aviso."""
+    return timedelta(days=getattr(settings, "NOTIFICACIONES_RETENCION_DIAS", RETENCION_DIAS_POR_DEFECTO))
+
+
+def registrar(evento, usuarios=None):
+    """
+    Guarda un aviso y lo deja en la bandeja de sus destinatarios.
+
+    :param evento: Datos del aviso (``evento["moneda"]`` = abreviación).
+    :param usuarios: Ids de los destinatarios; por defecto, los usuarios con
+        la moneda activa.
+    :return: ``AvisoTasa`` creado (su id viaja en el mensaje del WebSocket).
+    """
+    with transaction.atomic():
+        aviso = AvisoTasa.objects.create(moneda=evento["moneda"], datos=evento)
+        if usuarios is None:
+            usuarios = (
+                NotificacionMoneda.objects
+                .filter(moneda__abreviacion=evento["moneda"], activa=True)
+                .values_list("user_id", flat=True)
+                .distinct()
+            )
+        NotificacionUsuario.objects.bulk_create(
+            [NotificacionUsuario(user_id=user_id, aviso=aviso) for user_id in usuarios],
+            batch_size=1000,
+        )
+    return aviso
+
+
+def serializar(notificacion):
+    """Datos de una ``NotificacionUsuario`` tal como los recibe el cliente."""
+    aviso = notificacion.aviso
+    return {
+        **aviso.datos,
+        "id": aviso.id,
+        "moneda": aviso.moneda,
+        "leida": notificacion.leida,
+        "creado": aviso.creado.isoformat(),
+    }
+
+
+def _bandeja(user_id):
+    return NotificacionUsuario.objects.filter(user_id=user_id).select_related("aviso")
+
+
+def posteriores(user_id, ultimo_id):
+    """
+    Avisos del usuario posteriores a ``ultimo_id``, del más viejo al más nuevo.
+
+    Si hay más de ``maximo()`` se devuelven los más recientes.
+    """
+    recientes = list(
+        _bandeja(user_id).filter(aviso_id__gt=ultimo_id).order_by("-aviso_id")[:maximo()]
+    )
+    return [serializar(n) for n in reversed(recientes)]
+
+
+def pagina(user_id, antes=None, limite=TAMANO_PAGINA):
+    """
+    Una página de la bandeja, de la más nueva a la más vieja.
+
+    :param antes: Id del último aviso de la página anterior (cursor).
+    :return: ``(avisos, siguiente)``; ``siguiente`` es el cursor de la próxima
+        página o ``None`` si no hay más.
+    """
+    limite = max(1, min(limite, TAMANO_MAXIMO))
+    qs = _bandeja(user_id).order_by("-aviso_id")
+    if antes is not None:
+        qs = qs.filter(aviso_id__lt=antes)
+    filas = list(qs[:limite + 1])
+    avisos = [serializar(n) for n in filas[:limite]]
+    siguiente = avisos[-1]["id"] if len(filas) > limite else None
+    return avisos, siguiente
+
+
+def no_leidas(user_id):
+    """Contador de avisos no leídos del usuario."""
+    return NotificacionUsuario.objects.filter(user_id=user_id, leida=False).count()
+
+
+def marcar_leidas(user_id, hasta=None):
+    """
+    Marca como leídos los avisos del usuario (hasta el id ``hasta`` inclusive, o todos).
+
+    :return: Cantidad de avisos marcados.
+    """
+    qs = NotificacionUsuario.objects.filter(user_id=user_id, leida=False)
+    if hasta is not None:
+        qs = qs.filter(aviso_id__lte=hasta)
+    return qs.update(leida=True)
+
+
+def depurar(ahora=None):
+    """
+    Aplica la retención y el máximo por usuario.
+
+    :return: ``(avisos_vencidos, notificaciones_excedentes)`` borrados.
+    """
+    ahora = ahora or timezone.now()
+    _, borrados = AvisoTasa.objects.filter(creado__lt=ahora - retencion()).delete()
+    vencidos = borrados.get(AvisoTasa._meta.label, 0)
+
+    excedentes = list(
+        NotificacionUsuario.objects
+        .annotate(posicion=Window(RowNumber(), partition_by=F("user_id"), order_by=F("aviso_id").desc()))
+        .filter(posicion__gt=maximo())
+        .values_list("id", flat=True)
+    )
+    borradas, _ = NotificacionUsuario.objects.filter(id__in=excedentes).delete()
+    # Avisos que ya no están en ninguna bandeja
+    AvisoTasa.objects.filter(destinatarios__isnull=True).delete()
+    return vencidos, borradas
@@ -1,6 +1,10 @@
+import asyncio
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
-from notificaciones.models import NotificacionMoneda
+from notificaciones import bandeja, formatos, presencia
+from notificaciones.servicios import grupo_moneda, grupo_usuario, monedas_suscritas
 
 
 class NotificacionConsumer(AsyncJsonWebsocketConsumer):
@@ -8,9 +12,20 @@ class NotificacionConsumer(AsyncJsonWebsocketConsumer):
     Consumer WebSocket responsable de gestionar las conexiones en tiempo real
     para enviar notificaciones de cambios en las tasas de cambio a los usuarios.
     
-    Cada usuario autenticado se conecta a un grupo único basado en su ID, 
-    lo que permite enviar notificaciones personalizadas sin interferir 
-    con otros usuarios conectados.
+    Cada conexión se une al grupo ``tasas_<MONEDA>`` de cada moneda que el
+    usuario tiene activa (los avisos de tasas se envían una vez por moneda) y
+    a su grupo personal, por donde llega ``actualizar_suscripciones`` cuando
+    el usuario cambia su configuración.
+
+    Al reconectarse, el cliente manda el id del último aviso que vio
+    (``?ultimo=<id>``) y se le repiten los avisos posteriores de su bandeja.
+
+    Cada conexión se cuenta en el registro de presencia (por usuario y por
+    moneda), para que el envío de avisos saltee a quien no está conectado; la
+    conexión renueva su registro cada ``presencia.LATIDO_SEGUNDOS``.
+
+    El cliente puede pedir el formato compacto (``?formato=compacto``, ver
+    ``notificaciones.formatos``); por defecto los mensajes son JSON.
     """
     async def connect(self):
         """
@@ -19,64 +34,142 @@ class NotificacionConsumer(AsyncJsonWebsocketConsumer):
         """
         # Obtener el usuario autenticado
         self.user = self.scope["user"]
+        self.formato = self.formato_pedido()
         
         if self.user.is_anonymous:
             await self.close()
             return
         
         # Agregar al grupo personal del usuario
-        self.group_name = f"notificaciones_user_{self.user.id}"
+        self.group_name = grupo_usuario(self.user.id)
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await presencia.conectar(self.channel_name, self.user.id)
+
+        # Un grupo por moneda suscrita
+        self.monedas = set()
+        await self.unirse_a_monedas(await database_sync_to_async(monedas_suscritas)(self.user.id))
+        self.latido = asyncio.ensure_future(self.latir())
         
         await self.accept()
-        await self.send_json({
+        await self.enviar({
             "type": "conexion",
-            "mensaje": f"Conectado al sistema de notificaciones para {self.user.username}"
+            "mensaje": f"Conectado al sistema de notificaciones para {self.user.username}",
+            "no_leidas": await database_sync_to_async(bandeja.no_leidas)(self.user.id),
         })
 
+        # Repetir lo que llegó mientras estaba desconectado
+        ultimo = self.ultimo_visto()
+        if ultimo is not None:
+            for aviso in await database_sync_to_async(bandeja.posteriores)(self.user.id, ultimo):
+                await self.enviar({"type": "notificar_cambio_tasa", **aviso, "repeticion": True})
+
+    def parametros(self):
+        return parse_qs(self.scope.get("query_string", b"").decode())
+
+    def ultimo_visto(self):
+        """Id del último aviso que vio el cliente (``?ultimo=``) o ``None``."""
+        try:
+            return int(self.parametros()["ultimo"][0])
+        except (KeyError, ValueError):
+            return None
+
+    def formato_pedido(self):
+        """Formato de los mensajes (``?formato=``); JSON si no se pide o no existe."""
+        formato = self.parametros().get("formato", [formatos.FORMATO_JSON])[0]
+        return formato if formato in formatos.FORMATOS else formatos.FORMATO_JSON
+
+    async def enviar(self, mensaje, compacto=None):
+        """
+        Envía ``mensaje`` en el formato de la conexión.
+
+        :param compacto: Texto compacto ya armado por quien envió el evento
+            (se codifica una vez por aviso y no una vez por conexión).
+        """
+        if self.formato == formatos.FORMATO_COMPACTO:
+            await self.send(text_data=compacto or formatos.compactar(mensaje))
+        else:
+            await self.send_json(mensaje)
+
     async def disconnect(self, close_code):
         """
         Maneja la desconexión del WebSocket eliminando al usuario de su grupo
         para liberar recursos y evitar envíos futuros de notificaciones.
         """
-        # Remover del grupo personal
+        if hasattr(self, 'latido'):
+            self.latido.cancel()
+        # Remover del grupo personal y de los grupos de monedas
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await presencia.desconectar(self.channel_name, self.user.id, getattr(self, 'monedas', ()))
+        for moneda in getattr(self, 'monedas', ()):
+            await self.channel_layer.group_discard(grupo_moneda(moneda), self.channel_name)
+
+    async def latir(self):
+        """Renueva el registro de presencia de la conexión mientras siga abierta."""
+        while True:
+            await asyncio.sleep(presencia.LATIDO_SEGUNDOS)
+            await presencia.latido(self.channel_name, self.user.id, self.monedas)
+
+    async def unirse_a_monedas(self, monedas):
+        """
+        Ajusta la pertenencia a los grupos ``tasas_<MONEDA>`` al conjunto ``monedas``:
+        entra a los de las monedas nuevas y sale de los de las que ya no están.
+        """
+        monedas = set(monedas)
+        entran, salen = monedas - self.monedas, self.monedas - monedas
+        for moneda in entran:
+            await self.channel_layer.group_add(grupo_moneda(moneda), self.channel_name)
+        for moneda in salen:
+            await self.channel_layer.group_discard(grupo_moneda(moneda), self.channel_name)
+        await presencia.cambiar_monedas(self.channel_name, entran, salen)
+        self.monedas = monedas
+
+    async def actualizar_suscripciones(self, event):
+        """
+        El usuario guardó una nueva configuración de alertas
+        (``notificaciones.views.guardar_configuracion``): reemplaza el conjunto de
+        monedas en memoria y actualiza los grupos, sin volver a consultar la base.
+        """
+        await self.unirse_a_monedas(event.get("monedas", []))
 
     async def notificar_cambio_tasa(self, event):
         """
         Envía una notificación JSON al usuario sobre un cambio de tasa de cambio.
         
         Solo se envía si el usuario tiene activada la notificación para la moneda 
-        afectada. Los datos incluyen los precios anterior y nuevo, el porcentaje de 
+        afectada (según el conjunto ``self.monedas`` cargado al conectar). Los datos incluyen los precios anterior y nuevo, el porcentaje de 
         cambio, el tipo de actualización y si se trata de una nueva tasa.
         """
         moneda = event.get("moneda")
-        
-        tiene_activa = await self.usuario_tiene_notificacion_activa(moneda)
-        
-        if tiene_activa:
-            await self.send_json({
+
+        # Suscripciones en memoria: se cargan al conectar y se actualizan con
+        # actualizar_suscripciones, así un aviso no consulta la base de datos
+        if moneda in self.monedas:
+            await self.enviar({
                 "type": "notificar_cambio_tasa",
+                "id": event.get("id"),
                 "moneda": moneda,
                 "precio_anterior": event.get("precio_anterior"),
                 "precio_nuevo": event.get("precio_nuevo"),
                 "porcentaje_cambio": event.get("porcentaje_cambio"),
                 "es_nueva": event.get("es_nueva", False),
                 "tipo_cambio": event.get("tipo_cambio", "EDICION"),
-            })
+            }, compacto=event.get("compacto"))
 
-    @database_sync_to_async
-    def usuario_tiene_notificacion_activa(self, moneda_abreviacion):
+    async def alerta_precio(self, event):
         """
-        Comprueba en la base de datos si el usuario tiene activadas las notificaciones
-        para una moneda específica.
-        
-        Retorna:
-            bool: True si la notificación está activa, False en caso contrario.
+        Envía al usuario una de sus alertas de precio que se disparó
+        (``notificaciones.alertas``); llega por su grupo personal.
         """
-        return NotificacionMoneda.objects.filter(
-            user=self.user,
-            moneda__abreviacion=moneda_abreviacion,
-            activa=True
-        ).exists()
\ No newline at end of file
+        await self.enviar({
+            "type": "alerta_precio",
+            "id": event.get("id"),
+            "alerta_id": event.get("alerta_id"),
+            "moneda": event.get("moneda"),
+            "tipo": event.get("tipo"),
+            "direccion": event.get("direccion"),
+            "precio_objetivo": event.get("precio_objetivo"),
+            "precio_anterior": event.get("precio_anterior"),
+            "precio_nuevo": event.get("precio_nuevo"),
+            "porcentaje_cambio": event.get("porcentaje_cambio"),
+        })
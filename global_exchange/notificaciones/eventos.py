@@ -0,0 +1,429 @@
+"""
+Procesamiento diferido de los cambios de tasas (Notificaciones).
+
+Los signals de ``TasaDeCambio`` sólo registran un ``EventoTasa`` (outbox) en la
+misma transacción del guardado. Este módulo consume esos eventos fuera del
+request del administrador (comando ``procesar_eventos_tasas``):
+
+    - Registra la auditoría (``AuditoriaTasaCambio``).
+    - Determina si la tasa es la más actual y si el cambio supera el umbral.
+    - Envía las notificaciones por WebSocket al confirmar la transacción.
+    - Dispara las alertas de precio de los usuarios (``notificaciones.alertas``).
+
+Los eventos se toman en lotes con ``select_for_update(skip_locked=True)`` (en
+PostgreSQL), así varios workers pueden correr a la vez sin procesar dos veces
+el mismo evento; un evento se borra en la misma transacción en que se procesa.
+
+Agrupación de ráfagas: un par (origen, destino) se procesa recién cuando su
+evento pendiente más antiguo cumple la ventana ``NOTIFICACIONES_VENTANA_MS``, y
+entonces se toman todos sus eventos juntos. La auditoría sigue siendo una fila
+por guardado, pero por WebSocket sale un único aviso por moneda con el cambio
+neto (precio anterior del primero → precio nuevo del último). Si la ráfaga
+vuelve al precio de partida, no se avisa nada.
+
+Cada par se procesa en su propio savepoint: si un evento falla (auditoría,
+alertas) se revierte sólo ese par, se anota el error en sus eventos
+(``intentos``/``error``) y el lote sigue con los demás pares. Después de
+``MAXIMO_INTENTOS`` fallos los eventos del par quedan apartados para
+revisarlos a mano, sin frenar al worker.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from cotizaciones.models import TasaDeCambio
+from notificaciones import alertas
+from notificaciones.models import AuditoriaTasaCambio, EventoTasa
+from notificaciones.servicios import enviar_cambio_tasa, grupo_moneda
+
+UMBRAL_CAMBIO = Decimal('0.01')  # 1% de cambio mínimo
+
+#: Eventos por lote del worker.
+TAMANO_LOTE = 100
+
+#: Ventana por defecto (ms) si no se define ``NOTIFICACIONES_VENTANA_MS``.
+VENTANA_POR_DEFECTO_MS = 1000
+
+#: Fallos tras los cuales un evento deja de reintentarse.
+MAXIMO_INTENTOS = 5
+
+logger = logging.getLogger(__name__)
+
+
+def ventana_agrupacion():
+    """Ventana de agrupación de avisos por par, en segundos."""
+    return max(getattr(settings, "NOTIFICACIONES_VENTANA_MS", VENTANA_POR_DEFECTO_MS), 0) / 1000
+
+
+def enviar_al_confirmar(evento):
+    """Programa el envío del aviso para cuando se confirme el lote."""
+    transaction.on_commit(lambda: enviar_cambio_tasa(evento))
+    return grupo_moneda(evento["moneda"])
+
+
+def porcentaje(precio_anterior, precio_nuevo):
+    """Variación porcentual (absoluta) entre dos precios; 0 sin precio anterior."""
+    if not precio_anterior:
+        return Decimal('0')
+    return abs((precio_nuevo - precio_anterior) / precio_anterior * 100)
+
+
+def acumular_aviso(avisos, moneda_origen, moneda_destino, precio_anterior, precio_nuevo,
+                   vigencia, es_nueva, tipo_cambio, cambio_vigencia=False, tasa=None):
+    """
+    Suma un cambio del par a los avisos pendientes del lote.
+
+    Si el par ya tenía un aviso se conserva su precio anterior y se toma todo
+    lo demás (precio nuevo, vigencia, tipo, comisiones de ``tasa``) del cambio
+    más reciente.
+    """
+    clave = (moneda_origen.abreviacion, moneda_destino.abreviacion)
+    previo = avisos.get(clave)
+    avisos[clave] = {
+        'moneda': moneda_destino.abreviacion,
+        'precio_anterior': previo['precio_anterior'] if previo else precio_anterior,
+        'precio_nuevo': precio_nuevo,
+        'vigencia': vigencia,
+        'es_nueva': es_nueva and (previo['es_nueva'] if previo else True),
+        'tipo_cambio': tipo_cambio,
+        'cambio_vigencia': cambio_vigencia or (previo['cambio_vigencia'] if previo else False),
+        'cambios': (previo['cambios'] if previo else 0) + 1,
+        'comision_compra': tasa.comision_compra if tasa is not None else Decimal('0'),
+        'comision_venta': tasa.comision_venta if tasa is not None else Decimal('0'),
+    }
+
+
+def enviar_avisos(avisos):
+    """
+    Envía (al confirmar) el cambio neto de cada par acumulado.
+
+    Se avisa si el cambio neto supera el umbral o si cambió la vigencia. Las
+    alertas de precio se evalúan siempre, con el cambio neto y las comisiones
+    de la última tasa.
+
+    :return: Grupos a los que se envió.
+    """
+    grupos = []
+    for aviso in avisos.values():
+        comisiones = (aviso['comision_compra'], aviso['comision_venta'])
+        alertas.disparar(aviso['moneda'], alertas.precios_referencia(
+            alertas.Precio(aviso['precio_anterior'], *comisiones),
+            alertas.Precio(aviso['precio_nuevo'], *comisiones),
+        ))
+
+        cambio = porcentaje(aviso['precio_anterior'], aviso['precio_nuevo'])
+        if cambio < UMBRAL_CAMBIO and not aviso['cambio_vigencia']:
+            print(f"ℹ️ {aviso['moneda']}: sin cambio neto significativo ({cambio:.2f}%, {aviso['cambios']} cambios)")
+            continue
+        grupos.append(enviar_al_confirmar({
+            'moneda': aviso['moneda'],
+            'precio_anterior': float(aviso['precio_anterior']),
+            'precio_nuevo': float(aviso['precio_nuevo']),
+            'porcentaje_cambio': float(cambio),
+            'es_nueva': aviso['es_nueva'],
+            'tipo_cambio': aviso['tipo_cambio'],
+            'vigencia': aviso['vigencia'].isoformat(),
+            'timestamp': datetime.now().isoformat()
+        }))
+        print(f"✅ {aviso['moneda']}: aviso enviado a {grupos[-1]} "
+              f"(${aviso['precio_anterior']} → ${aviso['precio_nuevo']}, {aviso['cambios']} cambios)")
+    return grupos
+
+
+def notificar_tasa_mas_actual(avisos, moneda_origen, moneda_destino, tasa_editada_id=None):
+    """
+    Notifica a los usuarios cuando se detecta un cambio en la tasa más actual.
+
+    - Compara la tasa más reciente con la inmediatamente anterior.
+    - Acumula el cambio en ``avisos``; ``enviar_avisos`` decide si supera el
+      umbral y lo envía por WebSocket al grupo de la moneda.
+    """
+    # La tasa más actual y la inmediatamente anterior, en una sola consulta
+    ultimas = list(
+        TasaDeCambio.objects.del_par(moneda_origen, moneda_destino).only("precio_base", "vigencia", "comision_compra", "comision_venta")[:2]
+    )
+    
+    if not ultimas:
+        print("ℹ️ No hay tasas activas")
+        return
+    
+    if len(ultimas) < 2:
+        print("ℹ️ No hay tasa anterior para comparar")
+        return
+    tasa_mas_actual, tasa_anterior = ultimas
+    
+    acumular_aviso(
+        avisos, moneda_origen, moneda_destino,
+        precio_anterior=tasa_anterior.precio_base,
+        precio_nuevo=tasa_mas_actual.precio_base,
+        vigencia=tasa_mas_actual.vigencia,
+        es_nueva=False,
+        tipo_cambio='CAMBIO_TASA_ACTUAL',
+        tasa=tasa_mas_actual,
+    )
+    print(f"📋 Cambio en tasa MÁS ACTUAL")
+    print(f"   Tasa actual: {tasa_mas_actual.vigencia} (${tasa_mas_actual.precio_base})")
+    print(f"   Tasa anterior: {tasa_anterior.vigencia} (${tasa_anterior.precio_base})")
+
+
+def procesar_evento(evento, avisos):
+    """
+    Procesa un ``EventoTasa``: auditoría y aviso (acumulado en ``avisos``) del cambio.
+
+    Se trabaja con los valores guardados en el evento (los que tenía la tasa
+    al momento del guardado), no con los actuales de la fila.
+
+    Casos tratados:
+        1. Creación de una nueva tasa (CREACION)
+        2. Edición de una tasa existente (EDICION)
+        3. Detección de cambios de vigencia o pérdida de actualidad
+        4. Evita notificar cambios menores al umbral
+    """
+    instance = evento.tasa
+    instance.precio_base = evento.precio_nuevo
+    instance.vigencia = evento.vigencia_nueva
+    instance.estado = evento.estado_nuevo
+    created = evento.creada
+
+    precio_anterior = None
+    vigencia_anterior = None
+    estado_anterior = None
+    cambio_vigencia = False
+    
+    # Determinar tipo de cambio y valores anteriores
+    if created:
+        # 🔥 CREACIÓN
+        tipo_cambio = 'CREACION'
+        
+        # Verificar si hay tasas con vigencia posterior
+        existe_tasa_mas_reciente = TasaDeCambio.objects.filter(
+            moneda_origen=instance.moneda_origen,
+            moneda_destino=instance.moneda_destino,
+            estado=True,
+            vigencia__gt=instance.vigencia
+        ).exclude(pk=instance.pk).exists()
+        
+        if existe_tasa_mas_reciente:
+            print(f"⚠️ CREACIÓN de tasa histórica (vigencia: {instance.vigencia}). NO se notifica.")
+            AuditoriaTasaCambio.objects.create(
+                tasa=instance,
+                tipo_cambio=tipo_cambio,
+                precio_anterior=None,
+                vigencia_anterior=None,
+                estado_anterior=None,
+                precio_nuevo=instance.precio_base,
+                vigencia_nueva=instance.vigencia,
+                estado_nuevo=instance.estado,
+            )
+            return
+        
+        # Es la más actual, buscar la anterior
+        tasa_anterior = TasaDeCambio.objects.filter(
+            moneda_origen=instance.moneda_origen,
+            moneda_destino=instance.moneda_destino,
+            estado=True,
+            vigencia__lt=instance.vigencia
+        ).order_by('-vigencia').first()
+        
+        if tasa_anterior:
+            precio_anterior = tasa_anterior.precio_base
+            vigencia_anterior = tasa_anterior.vigencia
+            estado_anterior = tasa_anterior.estado
+            print(f"📋 Nueva tasa MÁS ACTUAL. Comparando con vigencia {vigencia_anterior}: ${precio_anterior}")
+        else:
+            print(f"ℹ️ Primera tasa activa para {instance.moneda_origen.abreviacion}")
+    
+    else:
+        # 🔥 EDICIÓN
+        tipo_cambio = 'EDICION'
+        precio_anterior = evento.precio_anterior
+        vigencia_anterior = evento.vigencia_anterior
+        estado_anterior = evento.estado_anterior
+        
+        # Detectar si cambió la vigencia
+        cambio_vigencia = vigencia_anterior != instance.vigencia
+        
+        # Verificar si ERA la más actual ANTES de editar
+        era_la_mas_actual = False
+        if vigencia_anterior:
+            era_la_mas_actual = not TasaDeCambio.objects.filter(
+                moneda_origen=instance.moneda_origen,
+                moneda_destino=instance.moneda_destino,
+                estado=True,
+                vigencia__gt=vigencia_anterior
+            ).exclude(pk=instance.pk).exists()
+        
+        # Verificar si ES la más actual DESPUÉS de editar
+        es_la_mas_actual = not TasaDeCambio.objects.filter(
+            moneda_origen=instance.moneda_origen,
+            moneda_destino=instance.moneda_destino,
+            estado=True,
+            vigencia__gt=instance.vigencia
+        ).exclude(pk=instance.pk).exists()
+        
+        print(f"📊 Edición: era_actual={era_la_mas_actual}, es_actual={es_la_mas_actual}, cambió_vigencia={cambio_vigencia}")
+        
+        # 🔥 CASO 1: Era la más actual y SIGUE siendo la más actual
+        if era_la_mas_actual and es_la_mas_actual:
+            print(f"✏️ Editando tasa que SIGUE siendo la MÁS ACTUAL")
+            # Compara con su propio valor anterior
+        
+        # 🔥 CASO 2: NO era la más actual, pero AHORA SÍ lo es
+        elif not era_la_mas_actual and es_la_mas_actual:
+            print(f"✏️ Tasa que AHORA es la MÁS ACTUAL (vigencia cambió de {vigencia_anterior} a {instance.vigencia})")
+            # Buscar la tasa que ERA la más actual antes de esta edición
+            tasa_que_era_actual = TasaDeCambio.objects.filter(
+                moneda_origen=instance.moneda_origen,
+                moneda_destino=instance.moneda_destino,
+                estado=True,
+                vigencia__lt=instance.vigencia
+            ).exclude(pk=instance.pk).order_by('-vigencia').first()
+            
+            if tasa_que_era_actual:
+                precio_anterior = tasa_que_era_actual.precio_base
+                vigencia_anterior = tasa_que_era_actual.vigencia
+                print(f"📋 Comparando con la que ERA la más actual: {vigencia_anterior} (${precio_anterior})")
+        
+        # 🔥 CASO 3: Era la más actual pero YA NO lo es
+        elif era_la_mas_actual and not es_la_mas_actual:
+            print(f"⚠️ Tasa que ERA la más actual YA NO lo es (vigencia: {vigencia_anterior} → {instance.vigencia})")
+            
+            # Registrar en auditoría
+            AuditoriaTasaCambio.objects.create(
+                tasa=instance,
+                tipo_cambio=tipo_cambio,
+                precio_anterior=precio_anterior,
+                vigencia_anterior=vigencia_anterior,
+                estado_anterior=estado_anterior,
+                precio_nuevo=instance.precio_base,
+                vigencia_nueva=instance.vigencia,
+                estado_nuevo=instance.estado,
+            )
+            
+            # 🔥 Notificar sobre la que AHORA es la más actual
+            notificar_tasa_mas_actual(avisos, instance.moneda_origen, instance.moneda_destino, instance.pk)
+            return
+        
+        # 🔥 CASO 4: NO era ni ES la más actual
+        else:
+            print(f"⚠️ Tasa que NO es la más actual. NO se notifica.")
+            AuditoriaTasaCambio.objects.create(
+                tasa=instance,
+                tipo_cambio=tipo_cambio,
+                precio_anterior=precio_anterior,
+                vigencia_anterior=vigencia_anterior,
+                estado_anterior=estado_anterior,
+                precio_nuevo=instance.precio_base,
+                vigencia_nueva=instance.vigencia,
+                estado_nuevo=instance.estado,
+            )
+            return
+        
+    
+    # === REGISTRAR EN AUDITORÍA ===
+    auditoria = AuditoriaTasaCambio.objects.create(
+        tasa=instance,
+        tipo_cambio=tipo_cambio,
+        precio_anterior=precio_anterior,
+        vigencia_anterior=vigencia_anterior,
+        estado_anterior=estado_anterior,
+        precio_nuevo=instance.precio_base,
+        vigencia_nueva=instance.vigencia,
+        estado_nuevo=instance.estado,
+    )
+    
+    # Validaciones
+    if not instance.estado:
+        print(f"⚠️ Tasa inactiva, no se notifica")
+        return
+    
+    if precio_anterior is None:
+        print(f"ℹ️ No hay precio anterior para comparar")
+        return
+    
+    acumular_aviso(
+        avisos, instance.moneda_origen, instance.moneda_destino,
+        precio_anterior=precio_anterior,
+        precio_nuevo=instance.precio_base,
+        vigencia=instance.vigencia,
+        es_nueva=created,
+        tipo_cambio=tipo_cambio,
+        cambio_vigencia=cambio_vigencia and not created,
+        tasa=instance,
+    )
+    tipo_msg = "NUEVA tasa MÁS ACTUAL" if created else "EDICIÓN de tasa MÁS ACTUAL"
+    print(f"📋 {tipo_msg} ({auditoria.porcentaje_cambio():.2f}%)")
+    print(f"   Vigencia: {vigencia_anterior} → {instance.vigencia}")
+    print(f"   Precio: ${precio_anterior} → ${instance.precio_base}")
+
+
+def _procesar_par(eventos):
+    """Auditoría y avisos de los eventos de un par; los borra al terminar."""
+    avisos = {}
+    for evento in eventos:
+        procesar_evento(evento, avisos)
+    enviar_avisos(avisos)
+    EventoTasa.objects.filter(id__in=[e.id for e in eventos]).delete()
+
+
+def procesar_pendientes(tamano_lote=TAMANO_LOTE, ventana=None):
+    """
+    Procesa (y borra) los eventos de los pares cuya ventana de agrupación ya
+    cerró, del más antiguo al más nuevo.
+
+    Un par que falla se revierte solo (savepoint) y sus eventos suman un
+    intento con el error; los demás pares del lote se procesan igual.
+
+    :param tamano_lote: Máximo de eventos maduros a tomar; todos los eventos
+        pendientes de esos pares se procesan juntos.
+    :param ventana: Segundos de la ventana (por defecto ``ventana_agrupacion()``).
+    :return: Cantidad de eventos procesados.
+    """
+    ventana = ventana_agrupacion() if ventana is None else ventana
+    limite = timezone.now() - timedelta(seconds=ventana)
+    activos = EventoTasa.objects.filter(intentos__lt=MAXIMO_INTENTOS)
+    with transaction.atomic():
+        pares = set(
+            activos
+            .filter(registrado__lte=limite)
+            .order_by("id")
+            .values_list("tasa__moneda_origen_id", "tasa__moneda_destino_id")[:tamano_lote]
+        )
+        if not pares:
+            return 0
+        filtro = Q()
+        for origen_id, destino_id in pares:
+            filtro |= Q(tasa__moneda_origen_id=origen_id, tasa__moneda_destino_id=destino_id)
+        por_par = defaultdict(list)
+        for evento in (
+            activos
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("tasa__moneda_origen", "tasa__moneda_destino")
+            .filter(filtro)
+            .order_by("id")
+        ):
+            por_par[(evento.tasa.moneda_origen_id, evento.tasa.moneda_destino_id)].append(evento)
+
+        procesados = 0
+        for eventos in por_par.values():
+            try:
+                with transaction.atomic():
+                    _procesar_par(eventos)
+            except Exception as error:
+                tasa = eventos[0].tasa
+                logger.exception(
+                    "Falló el procesamiento de %d eventos de %s/%s",
+                    len(eventos), tasa.moneda_origen.abreviacion, tasa.moneda_destino.abreviacion,
+                )
+                EventoTasa.objects.filter(id__in=[e.id for e in eventos]).update(
+                    intentos=F("intentos") + 1, error=repr(error)[:1000],
+                )
+                continue
+            procesados += len(eventos)
+    return procesados
@@ -0,0 +1,79 @@
+"""
+Formatos de los mensajes WebSocket (Notificaciones).
+
+El cliente elige el formato al conectarse a ``ws/notificaciones/``:
+
+    - ``json`` (por defecto): un objeto con claves descriptivas, como siempre.
+    - ``compacto`` (``?formato=compacto``): un arreglo JSON posicional, con un
+      código de una letra para el tipo y los valores en el orden de ``ESQUEMAS``.
+      Los booleanos viajan como ``1``/``0`` y se omiten los ``null``/``false``
+      del final. Un aviso de tasa pasa de ~200 bytes a ~50.
+
+Ejemplo (aviso de tasa)::
+
+    {"type": "notificar_cambio_tasa", "id": 41, "moneda": "USD", ...}
+    ["t",41,"USD",7000.0,7100.0,1.4286,0,"EDICION"]
+
+El decodificador del cliente es ``notificaciones/js/notificacionesCompactas.js``;
+si se cambia un esquema hay que cambiarlo ahí también (sólo agregar campos al
+final, para no romper clientes con la página abierta).
+"""
+import json
+
+FORMATO_JSON = "json"
+FORMATO_COMPACTO = "compacto"
+FORMATOS = (FORMATO_JSON, FORMATO_COMPACTO)
+
+#: Por tipo de mensaje: (código, campos en orden).
+ESQUEMAS = {
+    "notificar_cambio_tasa": ("t", (
+        "id", "moneda", "precio_anterior", "precio_nuevo", "porcentaje_cambio",
+        "es_nueva", "tipo_cambio", "repeticion",
+    )),
+    "alerta_precio": ("a", (
+        "id", "alerta_id", "moneda", "tipo", "direccion", "precio_objetivo",
+        "precio_anterior", "precio_nuevo", "porcentaje_cambio", "repeticion",
+    )),
+    "conexion": ("c", ("mensaje", "no_leidas")),
+}
+
+#: Campos booleanos (viajan como 1/0).
+BOOLEANOS = {"es_nueva", "repeticion"}
+
+#: Decimales con que viaja ``porcentaje_cambio`` en el formato compacto.
+DECIMALES_PORCENTAJE = 4
+
+
+def _valor(campo, valor):
+    if isinstance(valor, bool):
+        return int(valor)
+    if campo == "porcentaje_cambio" and isinstance(valor, float):
+        return round(valor, DECIMALES_PORCENTAJE)
+    return valor
+
+
+def compactar(mensaje):
+    """
+    Texto del mensaje en el formato compacto.
+
+    :param mensaje: Mensaje tal como se enviaría en JSON (con ``type``).
+    :return: Arreglo JSON sin espacios.
+    :raises KeyError: Si el tipo no tiene esquema.
+    """
+    codigo, campos = ESQUEMAS[mensaje["type"]]
+    valores = [mensaje.get(campo) for campo in campos]
+    while valores and (valores[-1] is None or valores[-1] is False):
+        valores.pop()
+    valores = [_valor(campo, valor) for campo, valor in zip(campos, valores)]
+    return json.dumps([codigo, *valores], separators=(",", ":"), ensure_ascii=False)
+
+
+def expandir(texto):
+    """Inverso de ``compactar`` (lo que hace el cliente; para tests y depuración)."""
+    codigo, *valores = json.loads(texto)
+    tipo, campos = next((t, c) for t, (cod, c) in ESQUEMAS.items() if cod == codigo)
+    valores += [None] * (len(campos) - len(valores))
+    mensaje = {"type": tipo, **dict(zip(campos, valores))}
+    for campo in BOOLEANOS.intersection(mensaje):
+        mensaje[campo] = bool(mensaje[campo])
+    return mensaje
@@ -0,0 +1,199 @@
+"""
+Comando ``benchmark_notificaciones``.
+
+Mide cuánto tarda un cambio de tasa en llegar a N usuarios conectados, con
+todo el circuito real: ``TasaDeCambio.save()`` → ``EventoTasa`` → worker
+(``eventos.procesar_pendientes``) → bandeja + ``group_send`` →
+``NotificacionConsumer`` → WebSocket.
+
+Los N consumers corren en este mismo proceso (``WebsocketCommunicator``, un
+``ApplicationCommunicator`` de channels), sobre la capa en memoria o sobre un
+Redis local (``--redis``).
+
+Crea datos propios (moneda ``BNC``, una tasa y N usuarios ``benchmark_*``) y
+los borra al terminar (salvo ``--conservar``). Procesa todos los
+``EventoTasa`` pendientes, así que conviene correrlo contra una base de
+desarrollo, no en producción.
+
+Uso:
+    python manage.py benchmark_notificaciones --usuarios 500 --cambios 50
+    python manage.py benchmark_notificaciones --redis redis://localhost:6379/1
+
+Reporta la latencia de entrega (p50/p95/p99, desde el ``save()`` hasta que
+el cliente recibe el aviso) y los mensajes entregados por segundo.
+"""
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+from notificaciones import eventos
+from notificaciones.consumers import NotificacionConsumer
+from notificaciones.models import AvisoTasa, EventoTasa, NotificacionMoneda
+
+MONEDA = "BNC"
+PREFIJO_USUARIO = "benchmark_"
+
+#: Precios que se alternan en cada cambio (~2%, siempre supera el umbral).
+PRECIOS = (Decimal("7140.00"), Decimal("7000.00"))
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (1-99) de una lista de valores (interpolación lineal)."""
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = "Mide la latencia de las notificaciones de cambio de tasa hasta N WebSockets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=100, help="Conexiones simultáneas (por defecto 100).")
+        parser.add_argument("--cambios", type=int, default=20, help="Cambios de tasa a medir (por defecto 20).")
+        parser.add_argument(
+            "--redis",
+            default=None,
+            help="URL de un Redis local para usar RedisChannelLayer (por defecto, capa en memoria).",
+        )
+        parser.add_argument(
+            "--espera",
+            type=float,
+            default=5,
+            help="Segundos máximos para recibir cada aviso antes de contarlo como perdido (por defecto 5).",
+        )
+        parser.add_argument("--conservar", action="store_true", help="No borra los datos del benchmark.")
+
+    def handle(self, *args, **options):
+        if options["usuarios"] < 1 or options["cambios"] < 1:
+            raise CommandError("--usuarios y --cambios deben ser mayores a 0.")
+
+        if options["redis"]:
+            capa = {"BACKEND": "channels_redis.core.RedisChannelLayer", "CONFIG": {"hosts": [options["redis"]]}}
+        else:
+            capa = {"BACKEND": "channels.layers.InMemoryChannelLayer", "CONFIG": {"capacity": 1000}}
+
+        tasa, usuarios, datos = self.preparar(options["usuarios"])
+        try:
+            with override_settings(CHANNEL_LAYERS={"default": capa}):
+                latencias, perdidos, duracion = asyncio.run(
+                    self.medir(tasa, usuarios, options["cambios"], options["espera"])
+                )
+        finally:
+            if not options["conservar"]:
+                self.limpiar(datos)
+
+        self.reportar(capa["BACKEND"], len(usuarios), options["cambios"], latencias, perdidos, duracion)
+
+    # --- Datos ---------------------------------------------------------------
+
+    def preparar(self, cantidad):
+        """Crea la moneda, la tasa y los usuarios suscritos del benchmark."""
+        if Moneda.objects.filter(abreviacion=MONEDA).exists():
+            raise CommandError(f"Ya existe la moneda {MONEDA}; borrala o corré con otra base.")
+
+        guarani, guarani_creada = Moneda.objects.get_or_create(
+            abreviacion="PYG", defaults={"nombre": "Guaraní", "estado": True}
+        )
+        moneda = Moneda.objects.create(nombre="Benchmark", abreviacion=MONEDA, estado=True)
+
+        User = get_user_model()
+        usuarios = []
+        for i in range(cantidad):
+            usuario = User(
+                username=f"{PREFIJO_USUARIO}{i}",
+                email=f"{PREFIJO_USUARIO}{i}@example.com",
+                cedula=f"BENCH{i}",
+            )
+            usuario.set_unusable_password()
+            usuarios.append(usuario)
+        User.objects.bulk_create(usuarios, batch_size=1000)
+        usuarios = list(User.objects.filter(username__startswith=PREFIJO_USUARIO).order_by("id"))
+        NotificacionMoneda.objects.bulk_create(
+            [NotificacionMoneda(user=u, moneda=moneda, activa=True) for u in usuarios], batch_size=1000,
+        )
+
+        tasa = TasaDeCambio.objects.create(moneda_origen=guarani, moneda_destino=moneda, precio_base=PRECIOS[1])
+        # La creación no tiene precio anterior (no avisa); se procesa antes de medir
+        eventos.procesar_pendientes(ventana=0)
+        return tasa, usuarios, {"guarani": guarani if guarani_creada else None, "moneda": moneda}
+
+    def limpiar(self, datos):
+        """Borra lo que creó ``preparar`` (las tasas, velas y suscripciones caen en cascada)."""
+        get_user_model().objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+        AvisoTasa.objects.filter(moneda=MONEDA).delete()
+        # Los eventos pendientes protegen a sus tasas del borrado en cascada
+        EventoTasa.objects.filter(tasa__moneda_destino=datos["moneda"]).delete()
+        datos["moneda"].delete()
+        if datos["guarani"] is not None:
+            datos["guarani"].delete()
+
+    # --- Medición ------------------------------------------------------------
+
+    async def conectar(self, usuario):
+        comunicador = WebsocketCommunicator(NotificacionConsumer.as_asgi(), "/ws/notificaciones/")
+        comunicador.scope["user"] = usuario
+        conectado, _ = await comunicador.connect()
+        if not conectado:
+            raise CommandError(f"No se pudo conectar {usuario.username}")
+        await comunicador.receive_json_from()  # mensaje "conexion"
+        return comunicador
+
+    async def recibir(self, comunicador, espera):
+        """Momento en que llega el próximo aviso, o ``None`` si no llegó."""
+        try:
+            await comunicador.receive_json_from(timeout=espera)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            return None
+        return time.perf_counter()
+
+    @database_sync_to_async
+    def cambiar_tasa(self, tasa, precio):
+        """Lo que hacen el admin (``save``) y el worker, sin ventana de agrupación."""
+        tasa.precio_base = precio
+        tasa.save()
+        eventos.procesar_pendientes(ventana=0)
+
+    async def medir(self, tasa, usuarios, cambios, espera):
+        comunicadores = await asyncio.gather(*(self.conectar(u) for u in usuarios))
+        self.stdout.write(f"{len(comunicadores)} conexiones abiertas, midiendo {cambios} cambios...")
+
+        latencias, perdidos = [], 0
+        inicio = time.perf_counter()
+        for i in range(cambios):
+            recepciones = [asyncio.ensure_future(self.recibir(c, espera)) for c in comunicadores]
+            enviado = time.perf_counter()
+            await self.cambiar_tasa(tasa, PRECIOS[i % 2])
+            for recibido in await asyncio.gather(*recepciones):
+                if recibido is None:
+                    perdidos += 1
+                else:
+                    latencias.append(recibido - enviado)
+        duracion = time.perf_counter() - inicio
+
+        for comunicador in comunicadores:
+            await comunicador.disconnect()
+        return latencias, perdidos, duracion
+
+    def reportar(self, backend, usuarios, cambios, latencias, perdidos, duracion):
+        self.stdout.write(f"Capa: {backend}")
+        self.stdout.write(f"Usuarios: {usuarios}  Cambios: {cambios}  Duración: {duracion:.3f} s")
+        self.stdout.write(f"Entregados: {len(latencias)}  Perdidos: {perdidos}")
+        if not latencias:
+            self.stdout.write(self.style.ERROR("No se entregó ningún aviso."))
+            return
+        ms = sorted(l * 1000 for l in latencias)
+        self.stdout.write(
+            f"Latencia (ms): p50={percentil(ms, 50):.2f}  p95={percentil(ms, 95):.2f}  "
+            f"p99={percentil(ms, 99):.2f}  max={ms[-1]:.2f}"
+        )
+        estilo = self.style.SUCCESS if not perdidos else self.style.WARNING
+        self.stdout.write(estilo(f"Mensajes/s: {len(latencias) / duracion:.1f}"))
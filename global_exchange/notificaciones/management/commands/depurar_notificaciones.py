@@ -0,0 +1,23 @@
+"""
+Comando ``depurar_notificaciones``.
+
+Aplica la política de la bandeja de avisos (ver ``notificaciones.bandeja``):
+borra los avisos más viejos que ``NOTIFICACIONES_RETENCION_DIAS`` y lo que
+supera ``NOTIFICACIONES_BANDEJA_MAXIMO`` por usuario.
+
+Uso (p. ej. una vez por hora desde cron):
+    python manage.py depurar_notificaciones
+"""
+from django.core.management.base import BaseCommand
+
+from notificaciones import bandeja
+
+
+class Command(BaseCommand):
+    help = "Borra los avisos vencidos y los que superan el máximo por usuario."
+
+    def handle(self, *args, **options):
+        vencidos, excedentes = bandeja.depurar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Avisos vencidos: {vencidos}. Notificaciones sobre el máximo: {excedentes}."
+        ))
@@ -0,0 +1,64 @@
+"""
+Comando ``procesar_eventos_tasas``.
+
+Worker que consume los ``EventoTasa`` registrados por los signals de
+``TasaDeCambio``: guarda la auditoría y avisa por WebSocket a los suscritos
+(ver ``notificaciones.eventos``). Se pueden correr varios a la vez.
+
+Uso:
+    python manage.py procesar_eventos_tasas
+    python manage.py procesar_eventos_tasas --lote 500 --espera 0.5
+    python manage.py procesar_eventos_tasas --ventana 3000   # agrupa ráfagas de 3 s
+    python manage.py procesar_eventos_tasas --una-vez     # p. ej. desde cron
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notificaciones import eventos
+
+
+class Command(BaseCommand):
+    help = "Procesa los eventos de cambio de tasas pendientes (auditoría y notificaciones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=eventos.TAMANO_LOTE,
+            help=f"Eventos por transacción (por defecto {eventos.TAMANO_LOTE}).",
+        )
+        parser.add_argument(
+            "--espera",
+            type=float,
+            default=0.5,
+            help="Segundos de espera cuando no hay eventos listos (por defecto 0.5).",
+        )
+        parser.add_argument(
+            "--ventana",
+            type=int,
+            default=None,
+            help="Milisegundos en los que se agrupan los cambios de un par "
+                 "(por defecto NOTIFICACIONES_VENTANA_MS).",
+        )
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Procesa lo pendiente (con la ventana cumplida) y termina.",
+        )
+
+    def handle(self, *args, **options):
+        lote = max(options["lote"], 1)
+        espera = max(options["espera"], 0.1)
+        ventana = None if options["ventana"] is None else max(options["ventana"], 0) / 1000
+        while True:
+            close_old_connections()
+            procesados = eventos.procesar_pendientes(lote, ventana)
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(f"Eventos procesados: {procesados}"))
+            if procesados >= lote:
+                continue  # puede haber más pendientes
+            if options["una_vez"]:
+                return
+            time.sleep(espera)
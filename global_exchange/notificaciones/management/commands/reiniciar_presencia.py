@@ -0,0 +1,22 @@
+"""
+Comando ``reiniciar_presencia``.
+
+Borra el registro de presencia (``notificaciones.presencia``). No hace falta
+para descartar conexiones de procesos que murieron (vencen solas) y se puede
+correr con daphne en marcha: las conexiones vivas se vuelven a registrar en
+su próximo latido.
+
+Uso:
+    python manage.py reiniciar_presencia
+"""
+from django.core.management.base import BaseCommand
+
+from notificaciones import presencia
+
+
+class Command(BaseCommand):
+    help = "Borra el registro de conexiones WebSocket por usuario y por moneda."
+
+    def handle(self, *args, **options):
+        presencia.reiniciar()
+        self.stdout.write(self.style.SUCCESS("Registro de presencia reiniciado."))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 08:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0007_tasadecambio_cotizacione_vigenci_9ebf43_idx'),
+        ('notificaciones', '0003_remove_auditoriatasacambio_observaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoTasa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creada', models.BooleanField(default=False)),
+                ('precio_anterior', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('vigencia_anterior', models.DateTimeField(blank=True, null=True)),
+                ('estado_anterior', models.BooleanField(blank=True, null=True)),
+                ('precio_nuevo', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('vigencia_nueva', models.DateTimeField()),
+                ('estado_nuevo', models.BooleanField()),
+                ('registrado', models.DateTimeField(auto_now_add=True)),
+                ('tasa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cotizaciones.tasadecambio')),
+            ],
+            options={
+                'verbose_name': 'Evento de Tasa',
+                'verbose_name_plural': 'Eventos de Tasas',
+                'ordering': ['id'],
+            },
+        ),
+    ]
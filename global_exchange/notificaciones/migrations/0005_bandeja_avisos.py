@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0004_eventotasa'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoTasa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('moneda', models.CharField(max_length=10)),
+                ('datos', models.JSONField(default=dict)),
+                ('creado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Aviso de Tasa',
+                'verbose_name_plural': 'Avisos de Tasas',
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificacionUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leida', models.BooleanField(default=False)),
+                ('aviso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='destinatarios', to='notificaciones.avisotasa')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bandeja_notificaciones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación de Usuario',
+                'verbose_name_plural': 'Notificaciones de Usuarios',
+                'ordering': ['-aviso'],
+                'indexes': [models.Index(fields=['user', 'leida'], name='notificacio_user_id_83f232_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'aviso'), name='notificacion_usuario_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monedas', '0001_initial'),
+        ('notificaciones', '0005_bandeja_avisos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('venta', 'Venta'), ('compra', 'Compra')], default='venta', max_length=10)),
+                ('direccion', models.CharField(choices=[('arriba', 'Por encima de'), ('abajo', 'Por debajo de')], max_length=10)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('activa', models.BooleanField(default=True)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('disparada_en', models.DateTimeField(blank=True, null=True)),
+                ('moneda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_precio', to='monedas.moneda')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_precio', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Alerta de Precio',
+                'verbose_name_plural': 'Alertas de Precio',
+                'ordering': ['-creada'],
+                'indexes': [models.Index(fields=['user', 'activa'], name='notificacio_user_id_1b63ef_idx'), models.Index(fields=['activa', 'moneda'], name='notificacio_activa_3b9f3e_idx')],
+            },
+        ),
+    ]
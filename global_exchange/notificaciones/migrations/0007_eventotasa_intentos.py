@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0006_alertaprecio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventotasa',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='eventotasa',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
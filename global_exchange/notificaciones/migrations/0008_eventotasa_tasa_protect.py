@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cotizaciones', '0007_tasadecambio_cotizacione_vigenci_9ebf43_idx'),
+        ('notificaciones', '0007_eventotasa_intentos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventotasa',
+            name='tasa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cotizaciones.tasadecambio'),
+        ),
+    ]
@@ -118,4 +118,180 @@ class AuditoriaTasaCambio(models.Model):
         """
         if self.precio_anterior and self.precio_anterior > 0:
             return abs((self.precio_nuevo - self.precio_anterior) / self.precio_anterior * 100)
-        return 0
\ No newline at end of file
+        return 0
+
+class EventoTasa(models.Model):
+    """
+    Bandeja de salida (outbox) de los cambios de ``TasaDeCambio``.
+
+    El signal ``post_save`` sólo inserta una fila por guardado, dentro de la
+    misma transacción que la tasa (si la transacción se revierte, el evento
+    también). El comando ``procesar_eventos_tasas`` consume los eventos en
+    lotes: registra la ``AuditoriaTasaCambio`` y envía las notificaciones.
+    En producción lo corre el servicio ``eventos_tasas`` de
+    ``docker-compose.prod.yml``.
+
+    Atributos:
+        tasa (ForeignKey): Tasa guardada.
+        creada (bool): True si el guardado fue una creación.
+        precio_anterior / vigencia_anterior / estado_anterior: Valores leídos
+            antes de una edición (vacíos en las creaciones).
+        precio_nuevo / vigencia_nueva / estado_nuevo: Valores guardados.
+        registrado (datetime): Momento en que se registró el evento.
+        intentos (int): Veces que falló su procesamiento; con
+            ``eventos.MAXIMO_INTENTOS`` el worker deja de tomarlo.
+        error (str): Último error al procesarlo.
+    """
+    # PROTECT: una tasa con eventos pendientes no se borra hasta que el worker los procese
+    tasa = models.ForeignKey(
+        TasaDeCambio,
+        on_delete=models.PROTECT,
+        related_name='+'
+    )
+    creada = models.BooleanField(default=False)
+
+    precio_anterior = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    vigencia_anterior = models.DateTimeField(null=True, blank=True)
+    estado_anterior = models.BooleanField(null=True, blank=True)
+
+    precio_nuevo = models.DecimalField(max_digits=12, decimal_places=2)
+    vigencia_nueva = models.DateTimeField()
+    estado_nuevo = models.BooleanField()
+
+    registrado = models.DateTimeField(auto_now_add=True)
+
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Evento de Tasa"
+        verbose_name_plural = "Eventos de Tasas"
+
+    def __str__(self):
+        return f"{'CREACION' if self.creada else 'EDICION'} - tasa {self.tasa_id} ({self.registrado})"
+
+
+class AvisoTasa(models.Model):
+    """
+    Aviso de cambio de tasa enviado por WebSocket (uno por envío a una moneda).
+
+    Su ``id`` es el que recibe el cliente en cada aviso y manda al reconectarse
+    (último visto), para que se le repitan sólo los avisos posteriores.
+
+    Atributos:
+        moneda (CharField): Abreviación de la moneda del aviso.
+        datos (JSONField): Contenido del aviso (precios, porcentaje, tipo, ...).
+        creado (DateTimeField): Fecha del envío.
+    """
+    moneda = models.CharField(max_length=10)
+    datos = models.JSONField(default=dict)
+    creado = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = "Aviso de Tasa"
+        verbose_name_plural = "Avisos de Tasas"
+
+    def __str__(self):
+        return f"{self.moneda} - aviso {self.id} ({self.creado})"
+
+
+class NotificacionUsuario(models.Model):
+    """
+    Bandeja de entrada de un usuario: una fila por aviso que le correspondía
+    (tenía la moneda activa al momento del envío).
+
+    La bandeja está acotada: ``bandeja.depurar`` borra lo que supera
+    ``NOTIFICACIONES_BANDEJA_MAXIMO`` por usuario y los avisos más viejos que
+    ``NOTIFICACIONES_RETENCION_DIAS``.
+
+    Atributos:
+        user (ForeignKey): Usuario destinatario.
+        aviso (ForeignKey): Aviso recibido.
+        leida (BooleanField): Si el usuario ya la vio.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='bandeja_notificaciones'
+    )
+    aviso = models.ForeignKey(
+        AvisoTasa,
+        on_delete=models.CASCADE,
+        related_name='destinatarios'
+    )
+    leida = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-aviso']
+        verbose_name = "Notificación de Usuario"
+        verbose_name_plural = "Notificaciones de Usuarios"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'aviso'], name='notificacion_usuario_unica'),
+        ]
+        indexes = [
+            # Contador de no leídas
+            models.Index(fields=['user', 'leida']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - aviso {self.aviso_id} ({'leída' if self.leida else 'no leída'})"
+
+
+class AlertaPrecio(models.Model):
+    """
+    Alerta de precio de un usuario: "avisame cuando el USD se venda por encima de X".
+
+    Se dispara una sola vez, cuando el precio cruza el umbral (de abajo hacia
+    arriba o de arriba hacia abajo, según ``direccion``); al dispararse queda
+    inactiva. Se evalúan con el índice ordenado de ``notificaciones.alertas``.
+
+    Atributos:
+        user (ForeignKey): Usuario dueño de la alerta.
+        moneda (ForeignKey): Moneda a seguir.
+        tipo (CharField): Precio de referencia: ``venta`` (precio base + comisión
+            de venta) o ``compra`` (precio base - comisión de compra).
+        direccion (CharField): ``arriba`` (precio >= umbral) o ``abajo`` (precio <= umbral).
+        precio (DecimalField): Umbral.
+        activa (BooleanField): False una vez disparada (o desactivada).
+        disparada_en (DateTimeField): Cuándo se disparó.
+    """
+    TIPOS = [
+        ('venta', 'Venta'),
+        ('compra', 'Compra'),
+    ]
+    DIRECCIONES = [
+        ('arriba', 'Por encima de'),
+        ('abajo', 'Por debajo de'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='alertas_precio'
+    )
+    moneda = models.ForeignKey(
+        Moneda,
+        on_delete=models.CASCADE,
+        related_name='alertas_precio'
+    )
+    tipo = models.CharField(max_length=10, choices=TIPOS, default='venta')
+    direccion = models.CharField(max_length=10, choices=DIRECCIONES)
+    precio = models.DecimalField(max_digits=12, decimal_places=2)
+    activa = models.BooleanField(default=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    disparada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creada']
+        verbose_name = "Alerta de Precio"
+        verbose_name_plural = "Alertas de Precio"
+        indexes = [
+            models.Index(fields=['user', 'activa']),
+            # Construcción del índice en memoria (sólo las activas)
+            models.Index(fields=['activa', 'moneda']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.moneda.abreviacion} {self.tipo} {self.direccion} {self.precio}"
@@ -0,0 +1,167 @@
+"""
+Registro de presencia (Notificaciones).
+
+Registra las conexiones WebSocket abiertas por usuario y por moneda suscrita.
+``NotificacionConsumer`` lo mantiene al conectar, desconectar y cambiar de
+suscripciones; el envío de avisos lo consulta para no hacer ``group_send`` a
+grupos vacíos ni a usuarios desconectados (lo suyo queda en la bandeja,
+``notificaciones.bandeja``, y se repite al reconectarse).
+
+Cada conexión (su ``channel_name``) es una entrada con vencimiento, no un
+contador: conectar la agrega, desconectar la quita (quitarla dos veces no
+hace nada) y cuántas hay es cuántas siguen vigentes. Así los totales nunca
+quedan negativos. El consumer renueva sus entradas cada ``LATIDO_SEGUNDOS``;
+las de un daphne que murió sin desconectarse vencen solas a los
+``TTL_SEGUNDOS``, y si se borra el registro (``manage.py reiniciar_presencia``
+o Redis se reinicia) las conexiones vivas vuelven a aparecer en el próximo
+latido.
+
+Dónde se guarda:
+    - Con ``RedisChannelLayer`` (producción): en el mismo Redis de la capa de
+      Channels, un sorted set por usuario y por moneda (miembro: la conexión;
+      puntaje: su vencimiento), compartidos por todos los daphne.
+    - Con cualquier otra capa (``InMemoryChannelLayer``, tests): en memoria del
+      proceso, que es también donde viven esas conexiones.
+"""
+import time
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+#: Prefijo de las claves de Redis del registro.
+PREFIJO = "notificaciones:presencia"
+
+#: Cada cuántos segundos una conexión renueva sus entradas.
+LATIDO_SEGUNDOS = 30
+
+#: Segundos que una entrada sigue vigente sin renovarse (tres latidos).
+TTL_SEGUNDOS = 3 * LATIDO_SEGUNDOS
+
+# Respaldo en memoria: {clave: {conexion: vencimiento}}
+_memoria = defaultdict(dict)
+
+
+def clave_usuario(user_id):
+    return f"{PREFIJO}:usuario:{user_id}"
+
+
+def clave_moneda(moneda):
+    return f"{PREFIJO}:moneda:{moneda}"
+
+
+def _claves(user_id, monedas):
+    claves = [clave_usuario(user_id)] if user_id is not None else []
+    return claves + [clave_moneda(m) for m in monedas]
+
+
+def _redis(capa):
+    """Cliente de Redis de la capa de Channels o ``None`` si la capa no usa Redis."""
+    if not (hasattr(capa, "connection") and hasattr(capa, "consistent_hash")):
+        return None
+    return capa.connection(capa.consistent_hash(PREFIJO))
+
+
+async def _registrar(conexion, claves):
+    if not claves:
+        return
+    vence = time.time() + TTL_SEGUNDOS
+    redis = _redis(get_channel_layer())
+    if redis is None:
+        for clave in claves:
+            _memoria[clave][conexion] = vence
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for clave in claves:
+            pipe.zadd(clave, {conexion: vence})
+            # La clave entera desaparece si nadie la renueva
+            pipe.expire(clave, TTL_SEGUNDOS)
+        await pipe.execute()
+
+
+async def _quitar(conexion, claves):
+    if not claves:
+        return
+    redis = _redis(get_channel_layer())
+    if redis is None:
+        for clave in claves:
+            _memoria[clave].pop(conexion, None)
+            if not _memoria[clave]:
+                del _memoria[clave]
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for clave in claves:
+            pipe.zrem(clave, conexion)
+        await pipe.execute()
+
+
+async def _contar(clave):
+    ahora = time.time()
+    redis = _redis(get_channel_layer())
+    if redis is None:
+        return sum(1 for vence in _memoria.get(clave, {}).values() if vence > ahora)
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zremrangebyscore(clave, "-inf", ahora)
+        pipe.zcard(clave)
+        _, vigentes = await pipe.execute()
+    return vigentes
+
+
+async def conectar(conexion, user_id, monedas=()):
+    """Registra la conexión ``conexion`` del usuario (y de sus monedas suscritas)."""
+    await _registrar(conexion, _claves(user_id, monedas))
+
+
+async def latido(conexion, user_id, monedas=()):
+    """Renueva las entradas de una conexión abierta (las vuelve a crear si se borraron)."""
+    await _registrar(conexion, _claves(user_id, monedas))
+
+
+async def desconectar(conexion, user_id, monedas=()):
+    """Quita la conexión del usuario y de sus monedas suscritas."""
+    await _quitar(conexion, _claves(user_id, monedas))
+
+
+async def cambiar_monedas(conexion, entran=(), salen=()):
+    """La conexión se suscribió a ``entran`` y dejó ``salen``."""
+    await _registrar(conexion, _claves(None, entran))
+    await _quitar(conexion, _claves(None, salen))
+
+
+async def conexiones_usuario(user_id):
+    """Conexiones abiertas del usuario."""
+    return await _contar(clave_usuario(user_id))
+
+
+async def conexiones_moneda(moneda):
+    """Conexiones abiertas suscritas a ``moneda`` (abreviación)."""
+    return await _contar(clave_moneda(moneda))
+
+
+def usuario_conectado(user_id):
+    """Versión síncrona para el envío de avisos: ¿el usuario tiene alguna conexión?"""
+    return async_to_sync(conexiones_usuario)(user_id) > 0
+
+
+def hay_conectados(moneda):
+    """Versión síncrona para el envío de avisos: ¿alguien conectado sigue ``moneda``?"""
+    return async_to_sync(conexiones_moneda)(moneda) > 0
+
+
+async def _reiniciar():
+    redis = _redis(get_channel_layer())
+    if redis is None:
+        _memoria.clear()
+        return
+    claves = [clave async for clave in redis.scan_iter(match=f"{PREFIJO}:*")]
+    if claves:
+        await redis.delete(*claves)
+
+
+def reiniciar():
+    """
+    Borra todo el registro (comando ``reiniciar_presencia``). Se puede correr
+    con daphne en marcha: las conexiones vivas se vuelven a registrar en su
+    próximo latido.
+    """
+    async_to_sync(_reiniciar)()
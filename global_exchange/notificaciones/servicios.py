@@ -0,0 +1,85 @@
+"""
+Servicios de la aplicación Notificaciones.
+
+Punto único para enviar por WebSocket (Channels) los avisos de cambio de tasa
+a los usuarios suscritos a una moneda. Lo usan los signals de TasaDeCambio,
+la importación masiva y el programador de tasas (``cotizaciones``).
+
+Grupos de Channels:
+    - ``tasas_<MONEDA>``: un grupo por moneda. Cada ``NotificacionConsumer`` se
+      une al grupo de cada moneda que el usuario tiene activa; un cambio de
+      tasa es un único ``group_send`` por moneda, sin recorrer suscriptores.
+    - ``notificaciones_user_<id>``: grupo personal, usado para avisarle a las
+      conexiones abiertas del usuario que cambió su configuración.
+
+Cada aviso se guarda antes en la bandeja de los suscritos (``bandeja.registrar``)
+y viaja con su ``id``, para repetirlo a quien estaba desconectado. Si nadie
+conectado sigue la moneda (``notificaciones.presencia``) no se hace el
+``group_send``: el aviso sólo queda en la bandeja.
+
+El evento lleva también el aviso ya codificado en el formato compacto
+(``notificaciones.formatos``), para que cada conexión que lo pidió lo reenvíe
+tal cual en vez de serializarlo de nuevo.
+"""
+import re
+
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+from notificaciones import bandeja, formatos, presencia
+from notificaciones.models import NotificacionMoneda
+
+
+def grupo_usuario(user_id):
+    """Nombre del grupo personal de Channels de un usuario."""
+    return f"notificaciones_user_{user_id}"
+
+
+def grupo_moneda(abreviacion):
+    """Nombre del grupo de Channels de los suscritos a una moneda."""
+    return "tasas_" + re.sub(r"[^A-Z0-9_.-]", "_", str(abreviacion).upper())
+
+
+def monedas_suscritas(user_id):
+    """Abreviaciones de las monedas con notificación activa de un usuario."""
+    return set(
+        NotificacionMoneda.objects
+        .filter(user_id=user_id, activa=True)
+        .values_list("moneda__abreviacion", flat=True)
+    )
+
+
+def enviar_cambio_tasa(evento):
+    """
+    Guarda el aviso en las bandejas de los suscritos y envía un evento
+    ``notificar_cambio_tasa`` (con el ``id`` del aviso) al grupo de la moneda,
+    si hay alguien conectado que la siga.
+
+    :param evento: Datos del aviso (moneda, precio_anterior, precio_nuevo, ...);
+        ``evento["moneda"]`` es la abreviación de la moneda destino.
+    :return: Nombre del grupo al que se envió.
+    """
+    aviso = bandeja.registrar(evento)
+    grupo = grupo_moneda(evento["moneda"])
+    if not presencia.hay_conectados(evento["moneda"]):
+        print(f"💤 Nadie conectado sigue {evento['moneda']}: aviso {aviso.id} sólo en bandeja")
+        return grupo
+    mensaje = {"type": "notificar_cambio_tasa", **evento, "id": aviso.id}
+    mensaje["compacto"] = formatos.compactar(mensaje)
+    async_to_sync(get_channel_layer().group_send)(grupo, mensaje)
+    return grupo
+
+
+def actualizar_suscripciones(user_id):
+    """
+    Avisa a las conexiones abiertas del usuario que cambió su configuración,
+    para que entren o salgan de los grupos ``tasas_<MONEDA>`` correspondientes.
+
+    :return: Monedas activas enviadas.
+    """
+    monedas = sorted(monedas_suscritas(user_id))
+    async_to_sync(get_channel_layer().group_send)(grupo_usuario(user_id), {
+        "type": "actualizar_suscripciones",
+        "monedas": monedas,
+    })
+    return monedas
@@ -0,0 +1,40 @@
+// Decodificador del formato compacto de ws/notificaciones/?formato=compacto
+// (ver notificaciones/formatos.py). Cada mensaje es un arreglo JSON:
+// un código de tipo y los valores en el orden de ESQUEMAS_NOTIFICACION.
+// Si se cambia un esquema en el servidor hay que cambiarlo también acá.
+
+const ESQUEMAS_NOTIFICACION = {
+  t: ["notificar_cambio_tasa", ["id", "moneda", "precio_anterior", "precio_nuevo", "porcentaje_cambio",
+      "es_nueva", "tipo_cambio", "repeticion"]],
+  a: ["alerta_precio", ["id", "alerta_id", "moneda", "tipo", "direccion", "precio_objetivo",
+      "precio_anterior", "precio_nuevo", "porcentaje_cambio", "repeticion"]],
+  c: ["conexion", ["mensaje", "no_leidas"]],
+};
+
+// Campos que viajan como 1/0
+const BOOLEANOS_NOTIFICACION = ["es_nueva", "repeticion"];
+
+// Devuelve el mensaje como objeto, igual que en el formato JSON.
+// También acepta mensajes JSON normales (objetos).
+function decodificarNotificacion(texto) {
+  const datos = JSON.parse(texto);
+  if (!Array.isArray(datos)) {
+    return datos;
+  }
+  const esquema = ESQUEMAS_NOTIFICACION[datos[0]];
+  if (!esquema) {
+    return { type: null };
+  }
+  const [tipo, campos] = esquema;
+  const mensaje = { type: tipo };
+  campos.forEach((campo, i) => {
+    const valor = datos[i + 1];
+    mensaje[campo] = valor === undefined ? null : valor;
+  });
+  BOOLEANOS_NOTIFICACION.forEach((campo) => {
+    if (campo in mensaje) {
+      mensaje[campo] = Boolean(mensaje[campo]);
+    }
+  });
+  return mensaje;
+}
@@ -0,0 +1,151 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+from notificaciones import alertas, eventos
+from notificaciones.models import AlertaPrecio
+
+User = get_user_model()
+
+
+def registrada(id, precio, direccion="arriba", tipo="venta", moneda="USD"):
+    return alertas.AlertaRegistrada(id, 1, moneda, tipo, direccion, Decimal(precio))
+
+
+class IndiceAlertasTest(SimpleTestCase):
+
+    def setUp(self):
+        self.indice = alertas.IndiceAlertas(1, [
+            registrada(1, "7100"), registrada(2, "7200"), registrada(3, "7300"),
+            registrada(4, "6900", "abajo"), registrada(5, "6800", "abajo"),
+            registrada(6, "7150", tipo="compra"), registrada(7, "7150", moneda="EUR"),
+        ])
+
+    def ids(self, *args):
+        return [a.id for a in self.indice.cruzadas(*args)]
+
+    def test_sube_dispara_los_umbrales_cruzados(self):
+        self.assertEqual(self.ids("USD", "venta", Decimal("7100"), Decimal("7200")), [2])
+        self.assertEqual(self.ids("USD", "venta", Decimal("7000"), Decimal("7250")), [1, 2])
+
+    def test_baja_dispara_los_umbrales_cruzados(self):
+        self.assertEqual(self.ids("USD", "venta", Decimal("7000"), Decimal("6800")), [5, 4])
+        self.assertEqual(self.ids("USD", "venta", Decimal("6900"), Decimal("6850")), [])
+
+    def test_sin_cambio_o_sin_cruce(self):
+        self.assertEqual(self.ids("USD", "venta", Decimal("7000"), Decimal("7000")), [])
+        self.assertEqual(self.ids("USD", "venta", Decimal("7210"), Decimal("7290")), [])
+        self.assertEqual(self.ids("BRL", "venta", Decimal("7000"), Decimal("8000")), [])
+
+
+class AlertasPrecioTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="alertas", email="alertas@example.com", cedula="55667788", password="testpass123",
+        )
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.tasa = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar, precio_base=Decimal("7000.00"),
+            comision_venta=Decimal("50.00"), vigencia=timezone.now() - timedelta(hours=1),
+        )
+
+    def setUp(self):
+        cache.delete(alertas.CLAVE_VERSION)
+
+    def crear_alerta(self, precio, direccion="arriba", tipo="venta"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AlertaPrecio.objects.create(
+                user=self.user, moneda=self.dolar, tipo=tipo, direccion=direccion, precio=Decimal(precio),
+            )
+
+    def test_crear_alerta_invalida_el_indice(self):
+        self.assertEqual(len(alertas.obtener_indice()), 0)
+        self.crear_alerta("7200")
+        self.assertEqual(len(alertas.obtener_indice()), 1)
+
+    def test_evaluar_sin_cruces_no_consulta_la_base(self):
+        self.crear_alerta("7200")
+        alertas.obtener_indice()
+        with self.assertNumQueries(0):
+            self.assertEqual(alertas.disparar("USD", {"venta": (Decimal("7000"), Decimal("7100"))}), [])
+
+    def test_disparar_una_sola_vez(self):
+        alerta = self.crear_alerta("7200")
+        with mock.patch("notificaciones.alertas._avisar") as avisar, \
+                self.captureOnCommitCallbacks(execute=True):
+            disparadas = alertas.disparar("USD", {"venta": (Decimal("7100"), Decimal("7300"))})
+        self.assertEqual([a.id for a in disparadas], [alerta.id])
+        ((avisada, anterior, nuevo),), = avisar.call_args.args
+        self.assertEqual((avisada.id, anterior, nuevo), (alerta.id, Decimal("7100"), Decimal("7300")))
+        alerta.refresh_from_db()
+        self.assertFalse(alerta.activa)
+        self.assertIsNotNone(alerta.disparada_en)
+
+        self.assertEqual(alertas.disparar("USD", {"venta": (Decimal("7100"), Decimal("7300"))}), [])
+
+    def test_el_worker_dispara_con_el_precio_de_venta(self):
+        sube = self.crear_alerta("7100")        # venta: 7050 -> 7250
+        no_llega = self.crear_alerta("7300")
+        baja_compra = self.crear_alerta("6950", direccion="abajo", tipo="compra")  # compra: 7000 -> 7200
+        self.tasa.precio_base = Decimal("7200.00")
+        self.tasa.save()
+        with mock.patch("notificaciones.alertas._avisar"), \
+                mock.patch("notificaciones.eventos.enviar_cambio_tasa"), \
+                self.captureOnCommitCallbacks(execute=True):
+            eventos.procesar_pendientes(ventana=0)
+        activas = set(AlertaPrecio.objects.filter(activa=True).values_list("id", flat=True))
+        self.assertEqual(activas, {no_llega.id, baja_compra.id})
+        self.assertNotIn(sube.id, activas)
+
+
+class AlertasPrecioViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="alertas", email="alertas@example.com", cedula="55667788", password="testpass123",
+        )
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, datos):
+        return self.client.post(reverse("alertas_precio"), data=json.dumps(datos), content_type="application/json")
+
+    def test_crear_listar_y_eliminar(self):
+        respuesta = self.post({"moneda": "USD", "tipo": "venta", "direccion": "arriba", "precio": 7500})
+        self.assertEqual(respuesta.status_code, 201)
+        alerta_id = respuesta.json()["alerta"]["id"]
+
+        lista = self.client.get(reverse("alertas_precio")).json()["alertas"]
+        self.assertEqual([(a["id"], a["precio"]) for a in lista], [(alerta_id, 7500.0)])
+
+        respuesta = self.client.post(reverse("eliminar_alerta_precio", args=[alerta_id]))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(AlertaPrecio.objects.exists())
+
+    def test_datos_invalidos(self):
+        for datos in (
+            {"moneda": "XXX", "direccion": "arriba", "precio": 1},
+            {"moneda": "USD", "direccion": "costado", "precio": 1},
+            {"moneda": "USD", "direccion": "arriba", "precio": "abc"},
+            {"moneda": "USD", "direccion": "arriba", "precio": -5},
+            {"moneda": "USD", "direccion": "arriba", "precio": "NaN"},
+            {"moneda": "USD", "direccion": "arriba", "precio": "Infinity"},
+            {"moneda": "USD", "direccion": "arriba", "precio": "1e20"},
+            {"moneda": "USD", "direccion": "arriba", "precio": "7500.123"},
+        ):
+            self.assertEqual(self.post(datos).status_code, 400, datos)
@@ -0,0 +1,135 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from monedas.models import Moneda
+from notificaciones import bandeja
+from notificaciones.models import AvisoTasa, NotificacionMoneda, NotificacionUsuario
+from notificaciones.servicios import enviar_cambio_tasa
+
+User = get_user_model()
+
+
+def aviso(moneda="USD", precio_nuevo=7100.0):
+    return {"moneda": moneda, "precio_anterior": 7000.0, "precio_nuevo": precio_nuevo, "porcentaje_cambio": 1.43}
+
+
+class BandejaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="bandeja", email="bandeja@example.com", cedula="11223344", password="testpass123",
+        )
+        cls.otro = User.objects.create_user(
+            username="otro", email="otro@example.com", cedula="44332211", password="testpass123",
+        )
+        cls.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.eur = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        NotificacionMoneda.objects.create(user=cls.user, moneda=cls.usd, activa=True)
+        NotificacionMoneda.objects.create(user=cls.otro, moneda=cls.usd, activa=False)
+        NotificacionMoneda.objects.create(user=cls.otro, moneda=cls.eur, activa=True)
+
+    def test_registrar_llena_la_bandeja_de_los_suscritos(self):
+        registrado = bandeja.registrar(aviso())
+        self.assertEqual(
+            list(NotificacionUsuario.objects.values_list("user_id", "aviso_id")),
+            [(self.user.id, registrado.id)],
+        )
+        self.assertEqual(bandeja.no_leidas(self.user.id), 1)
+        self.assertEqual(bandeja.no_leidas(self.otro.id), 0)
+
+    def test_enviar_cambio_tasa_incluye_el_id_del_aviso(self):
+        capa = mock.MagicMock()
+        with mock.patch("notificaciones.servicios.get_channel_layer", return_value=capa), \
+                mock.patch("notificaciones.servicios.async_to_sync", side_effect=lambda f: f), \
+                mock.patch("notificaciones.presencia.hay_conectados", return_value=True):
+            enviar_cambio_tasa(aviso())
+        grupo, mensaje = capa.group_send.call_args.args
+        self.assertEqual(grupo, "tasas_USD")
+        self.assertEqual(mensaje["id"], AvisoTasa.objects.get().id)
+
+    def test_sin_conectados_solo_queda_en_bandeja(self):
+        capa = mock.MagicMock()
+        with mock.patch("notificaciones.servicios.get_channel_layer", return_value=capa), \
+                mock.patch("notificaciones.presencia.hay_conectados", return_value=False):
+            enviar_cambio_tasa(aviso())
+        capa.group_send.assert_not_called()
+        self.assertEqual(bandeja.no_leidas(self.user.id), 1)
+
+    def test_posteriores_al_ultimo_visto(self):
+        primero = bandeja.registrar(aviso(precio_nuevo=7100.0))
+        bandeja.registrar(aviso(precio_nuevo=7200.0))
+        bandeja.registrar(aviso(precio_nuevo=7300.0))
+        repetidos = bandeja.posteriores(self.user.id, primero.id)
+        self.assertEqual([a["precio_nuevo"] for a in repetidos], [7200.0, 7300.0])
+
+    @override_settings(NOTIFICACIONES_BANDEJA_MAXIMO=2)
+    def test_posteriores_acotado_al_maximo(self):
+        for precio in (7100.0, 7200.0, 7300.0):
+            bandeja.registrar(aviso(precio_nuevo=precio))
+        self.assertEqual([a["precio_nuevo"] for a in bandeja.posteriores(self.user.id, 0)], [7200.0, 7300.0])
+
+    def test_marcar_leidas_hasta(self):
+        primero = bandeja.registrar(aviso())
+        bandeja.registrar(aviso())
+        self.assertEqual(bandeja.marcar_leidas(self.user.id, hasta=primero.id), 1)
+        self.assertEqual(bandeja.no_leidas(self.user.id), 1)
+
+    @override_settings(NOTIFICACIONES_BANDEJA_MAXIMO=2, NOTIFICACIONES_RETENCION_DIAS=7)
+    def test_depurar_aplica_maximo_y_retencion(self):
+        viejo = bandeja.registrar(aviso())
+        AvisoTasa.objects.filter(pk=viejo.pk).update(creado=timezone.now() - timedelta(days=8))
+        for precio in (7100.0, 7200.0, 7300.0):
+            bandeja.registrar(aviso(precio_nuevo=precio))
+        bandeja.registrar(aviso("EUR"))
+
+        self.assertEqual(bandeja.depurar(), (1, 1))
+        self.assertEqual(
+            [a["precio_nuevo"] for a in bandeja.posteriores(self.user.id, 0)], [7200.0, 7300.0],
+        )
+        self.assertEqual(len(bandeja.posteriores(self.otro.id, 0)), 1)
+        self.assertEqual(AvisoTasa.objects.count(), 3)
+
+
+class BandejaViewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="bandeja", email="bandeja@example.com", cedula="11223344", password="testpass123",
+        )
+        cls.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        NotificacionMoneda.objects.create(user=cls.user, moneda=cls.usd, activa=True)
+        cls.avisos = [bandeja.registrar(aviso(precio_nuevo=7000.0 + i)) for i in range(5)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_requiere_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("bandeja_notificaciones")).status_code, 302)
+
+    def test_paginada_por_cursor(self):
+        datos = self.client.get(reverse("bandeja_notificaciones"), {"limite": 3}).json()
+        self.assertEqual([a["id"] for a in datos["notificaciones"]], [a.id for a in self.avisos[:1:-1]])
+        self.assertEqual(datos["no_leidas"], 5)
+
+        datos = self.client.get(reverse("bandeja_notificaciones"), {"limite": 3, "antes": datos["siguiente"]}).json()
+        self.assertEqual([a["id"] for a in datos["notificaciones"]], [self.avisos[1].id, self.avisos[0].id])
+        self.assertIsNone(datos["siguiente"])
+
+    def test_marcar_leidas(self):
+        respuesta = self.client.post(
+            reverse("marcar_notificaciones_leidas"),
+            data=json.dumps({"hasta": self.avisos[2].id}),
+            content_type="application/json",
+        )
+        self.assertEqual(respuesta.json()["no_leidas"], 2)
+        respuesta = self.client.post(reverse("marcar_notificaciones_leidas"))
+        self.assertEqual(respuesta.json()["no_leidas"], 0)
@@ -0,0 +1,23 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from monedas.models import Moneda
+from notificaciones.models import AvisoTasa
+
+
+class BenchmarkNotificacionesTest(TransactionTestCase):
+    """El benchmark recorre el circuito completo y limpia sus datos."""
+
+    def test_mide_y_limpia(self):
+        salida = StringIO()
+        call_command("benchmark_notificaciones", "--usuarios", "3", "--cambios", "2", stdout=salida)
+
+        reporte = salida.getvalue()
+        self.assertIn("Entregados: 6  Perdidos: 0", reporte)
+        self.assertIn("p95=", reporte)
+        self.assertFalse(Moneda.objects.filter(abreviacion="BNC").exists())
+        self.assertFalse(get_user_model().objects.filter(username__startswith="benchmark_").exists())
+        self.assertFalse(AvisoTasa.objects.exists())
@@ -0,0 +1,123 @@
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from monedas.models import Moneda
+from notificaciones import bandeja, formatos
+from notificaciones.consumers import NotificacionConsumer
+from notificaciones.models import NotificacionMoneda
+from notificaciones.servicios import grupo_moneda, grupo_usuario
+
+User = get_user_model()
+
+
+class NotificacionConsumerTest(TransactionTestCase):
+    """Tests para los grupos por moneda del consumer de notificaciones"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="socket", email="socket@example.com", cedula="87654321", password="testpass123",
+        )
+        self.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        self.eur = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        NotificacionMoneda.objects.create(user=self.user, moneda=self.usd, activa=True)
+        NotificacionMoneda.objects.create(user=self.user, moneda=self.eur, activa=False)
+
+    async def conectar(self, ruta="/ws/notificaciones/"):
+        communicator = WebsocketCommunicator(NotificacionConsumer.as_asgi(), ruta)
+        communicator.scope["user"] = self.user
+        conectado, _ = await communicator.connect()
+        self.assertTrue(conectado)
+        self.assertEqual((await communicator.receive_json_from())["type"], "conexion")
+        return communicator
+
+    async def test_recibe_avisos_del_grupo_de_sus_monedas(self):
+        communicator = await self.conectar()
+        capa = get_channel_layer()
+        await capa.group_send(grupo_moneda("EUR"), {"type": "notificar_cambio_tasa", "moneda": "EUR"})
+        await capa.group_send(grupo_moneda("USD"), {
+            "type": "notificar_cambio_tasa", "moneda": "USD", "precio_anterior": 7000.0, "precio_nuevo": 7100.0,
+        })
+        mensaje = await communicator.receive_json_from()
+        self.assertEqual((mensaje["moneda"], mensaje["precio_nuevo"]), ("USD", 7100.0))
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_actualizar_suscripciones_cambia_los_grupos(self):
+        communicator = await self.conectar()
+        capa = get_channel_layer()
+        await capa.group_send(grupo_usuario(self.user.id), {"type": "actualizar_suscripciones", "monedas": ["EUR"]})
+        await communicator.receive_nothing()
+        await capa.group_send(grupo_moneda("USD"), {"type": "notificar_cambio_tasa", "moneda": "USD"})
+        await capa.group_send(grupo_moneda("EUR"), {"type": "notificar_cambio_tasa", "moneda": "EUR"})
+        self.assertEqual((await communicator.receive_json_from())["moneda"], "EUR")
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_los_avisos_usan_las_suscripciones_en_memoria(self):
+        communicator = await self.conectar()
+        # Sin mensaje de invalidación el consumer no vuelve a leer la base
+        await database_sync_to_async(NotificacionMoneda.objects.filter(moneda=self.usd).update)(activa=False)
+        capa = get_channel_layer()
+        await capa.group_send(grupo_moneda("USD"), {"type": "notificar_cambio_tasa", "moneda": "USD"})
+        self.assertEqual((await communicator.receive_json_from())["moneda"], "USD")
+        await communicator.disconnect()
+
+    async def test_reconexion_repite_los_avisos_posteriores(self):
+        registrar = database_sync_to_async(bandeja.registrar)
+        primero = await registrar({"moneda": "USD", "precio_nuevo": 7100.0})
+        segundo = await registrar({"moneda": "USD", "precio_nuevo": 7200.0})
+
+        communicator = await self.conectar(f"/ws/notificaciones/?ultimo={primero.id}")
+        mensaje = await communicator.receive_json_from()
+        self.assertEqual((mensaje["id"], mensaje["precio_nuevo"]), (segundo.id, 7200.0))
+        self.assertTrue(mensaje["repeticion"])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_sin_ultimo_no_repite(self):
+        await database_sync_to_async(bandeja.registrar)({"moneda": "USD", "precio_nuevo": 7100.0})
+        communicator = await self.conectar()
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_alerta_precio_llega_por_el_grupo_personal(self):
+        communicator = await self.conectar()
+        await get_channel_layer().group_send(grupo_usuario(self.user.id), {
+            "type": "alerta_precio", "alerta_id": 7, "moneda": "EUR", "precio_objetivo": 8000.0,
+        })
+        mensaje = await communicator.receive_json_from()
+        self.assertEqual((mensaje["type"], mensaje["alerta_id"], mensaje["moneda"]), ("alerta_precio", 7, "EUR"))
+        await communicator.disconnect()
+
+    async def test_formato_compacto(self):
+        communicator = WebsocketCommunicator(NotificacionConsumer.as_asgi(), "/ws/notificaciones/?formato=compacto")
+        communicator.scope["user"] = self.user
+        await communicator.connect()
+        self.assertEqual(formatos.expandir(await communicator.receive_from())["type"], "conexion")
+
+        await get_channel_layer().group_send(grupo_moneda("USD"), {
+            "type": "notificar_cambio_tasa", "id": 3, "moneda": "USD", "precio_anterior": 7000.0,
+            "precio_nuevo": 7100.0, "porcentaje_cambio": 1.43, "es_nueva": False, "tipo_cambio": "EDICION",
+        })
+        self.assertEqual(await communicator.receive_from(), '["t",3,"USD",7000.0,7100.0,1.43,0,"EDICION"]')
+        await communicator.disconnect()
+
+    async def test_formato_compacto_reenvia_el_texto_del_evento(self):
+        communicator = WebsocketCommunicator(NotificacionConsumer.as_asgi(), "/ws/notificaciones/?formato=compacto")
+        communicator.scope["user"] = self.user
+        await communicator.connect()
+        await communicator.receive_from()
+        await get_channel_layer().group_send(grupo_moneda("USD"), {
+            "type": "notificar_cambio_tasa", "moneda": "USD", "compacto": '["t",9,"USD"]',
+        })
+        self.assertEqual(await communicator.receive_from(), '["t",9,"USD"]')
+        await communicator.disconnect()
+
+    async def test_formato_desconocido_usa_json(self):
+        communicator = await self.conectar("/ws/notificaciones/?formato=xml")
+        await get_channel_layer().group_send(grupo_moneda("USD"), {"type": "notificar_cambio_tasa", "moneda": "USD"})
+        self.assertEqual((await communicator.receive_json_from())["moneda"], "USD")
+        await communicator.disconnect()
@@ -0,0 +1,182 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.test import TestCase
+from django.utils import timezone
+
+from cotizaciones.models import TasaDeCambio
+from monedas.models import Moneda
+from notificaciones import eventos
+from notificaciones.models import AuditoriaTasaCambio, EventoTasa
+
+
+class EventoTasaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guarani = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        cls.dolar = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        cls.ahora = timezone.now()
+        cls.anterior = TasaDeCambio.objects.create(
+            moneda_origen=cls.guarani, moneda_destino=cls.dolar,
+            precio_base=Decimal("7000.00"), vigencia=cls.ahora - timedelta(hours=2),
+        )
+        EventoTasa.objects.all().delete()
+
+    def crear_tasa(self, precio="7100.00"):
+        return TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=self.dolar,
+            precio_base=Decimal(precio), vigencia=self.ahora - timedelta(hours=1),
+        )
+
+    def test_guardar_solo_registra_el_evento(self):
+        tasa = self.crear_tasa()
+        evento = EventoTasa.objects.get()
+        self.assertEqual(evento.tasa, tasa)
+        self.assertTrue(evento.creada)
+        self.assertEqual(evento.precio_nuevo, Decimal("7100.00"))
+        self.assertFalse(AuditoriaTasaCambio.objects.exists())
+
+    def test_edicion_guarda_valores_anteriores(self):
+        self.anterior.precio_base = Decimal("6900.00")
+        self.anterior.save()
+        evento = EventoTasa.objects.get()
+        self.assertFalse(evento.creada)
+        self.assertEqual(evento.precio_anterior, Decimal("7000.00"))
+        self.assertEqual(evento.precio_nuevo, Decimal("6900.00"))
+
+    def test_rollback_no_deja_evento(self):
+        try:
+            with transaction.atomic():
+                self.crear_tasa()
+                raise RuntimeError("rollback")
+        except RuntimeError:
+            pass
+        self.assertFalse(EventoTasa.objects.exists())
+
+    def test_procesar_pendientes_audita_y_notifica(self):
+        tasa = self.crear_tasa()
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(eventos.procesar_pendientes(ventana=0), 1)
+
+        self.assertFalse(EventoTasa.objects.exists())
+        auditoria = AuditoriaTasaCambio.objects.get()
+        self.assertEqual(auditoria.tasa, tasa)
+        self.assertEqual(auditoria.tipo_cambio, "CREACION")
+        (evento,) = enviar.call_args.args
+        self.assertEqual(evento["moneda"], "USD")
+        self.assertEqual(evento["precio_nuevo"], 7100.0)
+
+    def test_procesar_usa_los_valores_del_evento(self):
+        tasa = self.crear_tasa()
+        TasaDeCambio.objects.filter(pk=tasa.pk).update(precio_base=Decimal("9999.00"))
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa"):
+            eventos.procesar_pendientes(ventana=0)
+        self.assertEqual(AuditoriaTasaCambio.objects.get().precio_nuevo, Decimal("7100.00"))
+
+    def test_comando_procesa_por_lotes(self):
+        self.crear_tasa("7100.00")
+        self.crear_tasa("7200.00")
+        self.crear_tasa("7300.00")
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa"):
+            call_command("procesar_eventos_tasas", "--una-vez", "--lote", "2", "--ventana", "0", stdout=mock.MagicMock())
+        self.assertFalse(EventoTasa.objects.exists())
+        self.assertEqual(AuditoriaTasaCambio.objects.count(), 3)
+
+    def editar(self, *precios):
+        for precio in precios:
+            self.anterior.precio_base = Decimal(precio)
+            self.anterior.save()
+
+    def test_rafaga_se_avisa_como_cambio_neto(self):
+        self.editar("7100.00", "7150.00", "7200.00")
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(eventos.procesar_pendientes(ventana=0), 3)
+
+        self.assertEqual(AuditoriaTasaCambio.objects.count(), 3)
+        enviar.assert_called_once()
+        (evento,) = enviar.call_args.args
+        self.assertEqual(evento["precio_anterior"], 7000.0)
+        self.assertEqual(evento["precio_nuevo"], 7200.0)
+
+    def test_rafaga_que_vuelve_al_precio_inicial_no_avisa(self):
+        self.editar("7100.00", "7000.00")
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar, \
+                self.captureOnCommitCallbacks(execute=True):
+            eventos.procesar_pendientes(ventana=0)
+        enviar.assert_not_called()
+        self.assertEqual(AuditoriaTasaCambio.objects.count(), 2)
+
+    def test_espera_que_cierre_la_ventana(self):
+        self.editar("7100.00")
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar:
+            self.assertEqual(eventos.procesar_pendientes(ventana=60), 0)
+        enviar.assert_not_called()
+        self.assertEqual(EventoTasa.objects.count(), 1)
+
+    def test_pares_distintos_se_avisan_por_separado(self):
+        euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        tasa_euro = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=euro,
+            precio_base=Decimal("8000.00"), vigencia=self.ahora - timedelta(hours=2),
+        )
+        EventoTasa.objects.all().delete()
+        self.editar("7100.00")
+        tasa_euro.precio_base = Decimal("8100.00")
+        tasa_euro.save()
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar, \
+                self.captureOnCommitCallbacks(execute=True):
+            eventos.procesar_pendientes(ventana=0)
+        self.assertEqual(sorted(c.args[0]["moneda"] for c in enviar.call_args_list), ["EUR", "USD"])
+
+    def test_un_par_que_falla_no_frena_a_los_demas(self):
+        euro = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        tasa_euro = TasaDeCambio.objects.create(
+            moneda_origen=self.guarani, moneda_destino=euro,
+            precio_base=Decimal("8000.00"), vigencia=self.ahora - timedelta(hours=2),
+        )
+        EventoTasa.objects.all().delete()
+        self.editar("7100.00")
+        tasa_euro.precio_base = Decimal("8100.00")
+        tasa_euro.save()
+
+        disparar = eventos.alertas.disparar
+
+        def falla_con_euro(moneda, precios):
+            if moneda == "EUR":
+                raise RuntimeError("alerta rota")
+            return disparar(moneda, precios)
+
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa") as enviar, \
+                mock.patch("notificaciones.eventos.alertas.disparar", side_effect=falla_con_euro), \
+                self.assertLogs("notificaciones.eventos", level="ERROR"), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(eventos.procesar_pendientes(ventana=0), 1)
+
+        self.assertEqual([c.args[0]["moneda"] for c in enviar.call_args_list], ["USD"])
+        self.assertEqual(AuditoriaTasaCambio.objects.get().tasa, self.anterior)
+        fallido = EventoTasa.objects.get()
+        self.assertEqual((fallido.tasa, fallido.intentos), (tasa_euro, 1))
+        self.assertIn("alerta rota", fallido.error)
+
+        # Después de MAXIMO_INTENTOS queda apartado y el worker no lo toma más
+        EventoTasa.objects.update(intentos=eventos.MAXIMO_INTENTOS)
+        self.assertEqual(eventos.procesar_pendientes(ventana=0), 0)
+        self.assertEqual(EventoTasa.objects.get().intentos, eventos.MAXIMO_INTENTOS)
+
+    def test_una_tasa_con_eventos_pendientes_no_se_borra(self):
+        tasa = self.crear_tasa()
+        with self.assertRaises(ProtectedError):
+            tasa.delete()
+        self.assertTrue(EventoTasa.objects.filter(tasa=tasa).exists())
+
+        with mock.patch("notificaciones.eventos.enviar_cambio_tasa"):
+            eventos.procesar_pendientes(ventana=0)
+        tasa.delete()
+        self.assertFalse(TasaDeCambio.objects.filter(pk=tasa.pk).exists())
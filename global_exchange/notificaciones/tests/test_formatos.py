@@ -0,0 +1,43 @@
+import json
+
+from django.test import SimpleTestCase
+
+from notificaciones import formatos
+
+AVISO = {
+    "type": "notificar_cambio_tasa", "id": 41, "moneda": "USD", "precio_anterior": 7000.0,
+    "precio_nuevo": 7100.0, "porcentaje_cambio": 1.4285714285, "es_nueva": False,
+    "tipo_cambio": "EDICION", "repeticion": False,
+}
+
+
+class FormatoCompactoTest(SimpleTestCase):
+    """Tests del formato compacto de los mensajes WebSocket"""
+
+    def test_aviso_de_tasa(self):
+        texto = formatos.compactar(AVISO)
+        self.assertEqual(texto, '["t",41,"USD",7000.0,7100.0,1.4286,0,"EDICION"]')
+        self.assertLess(len(texto), len(json.dumps(AVISO)) / 2)
+
+    def test_ida_y_vuelta(self):
+        mensaje = formatos.expandir(formatos.compactar({**AVISO, "repeticion": True}))
+        self.assertEqual(mensaje, {**AVISO, "porcentaje_cambio": 1.4286, "repeticion": True})
+
+    def test_campos_faltantes_son_none(self):
+        mensaje = formatos.expandir(formatos.compactar({"type": "alerta_precio", "alerta_id": 7, "moneda": "EUR"}))
+        self.assertEqual((mensaje["type"], mensaje["alerta_id"], mensaje["moneda"]), ("alerta_precio", 7, "EUR"))
+        self.assertIsNone(mensaje["precio_nuevo"])
+        self.assertFalse(mensaje["repeticion"])
+
+    def test_conserva_ceros(self):
+        self.assertEqual(formatos.compactar({"type": "conexion", "mensaje": "hola", "no_leidas": 0}), '["c","hola",0]')
+
+    def test_esquemas_del_cliente(self):
+        """El decodificador del cliente usa los mismos códigos y campos."""
+        from django.contrib.staticfiles import finders
+
+        with open(finders.find("notificaciones/js/notificacionesCompactas.js"), encoding="utf-8") as archivo:
+            js = " ".join(archivo.read().split())
+        for tipo, (codigo, campos) in formatos.ESQUEMAS.items():
+            lista = ", ".join(f'"{campo}"' for campo in campos)
+            self.assertIn(f'{codigo}: ["{tipo}", [{lista}]]', js.replace("[ ", "[").replace(", ]", "]"))
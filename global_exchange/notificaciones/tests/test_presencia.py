@@ -0,0 +1,92 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TransactionTestCase
+
+from monedas.models import Moneda
+from notificaciones import presencia
+from notificaciones.consumers import NotificacionConsumer
+from notificaciones.models import NotificacionMoneda
+
+User = get_user_model()
+
+
+class PresenciaMemoriaTest(SimpleTestCase):
+    """Registro con la capa en memoria (la de los tests)."""
+
+    def setUp(self):
+        presencia.reiniciar()
+        self.addCleanup(presencia.reiniciar)
+
+    def test_cuenta_conexiones_por_usuario_y_moneda(self):
+        async_to_sync(presencia.conectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.conectar)("c2", 1, ["USD", "EUR"])
+        self.assertEqual(async_to_sync(presencia.conexiones_usuario)(1), 2)
+        self.assertEqual(async_to_sync(presencia.conexiones_moneda)("USD"), 2)
+
+        async_to_sync(presencia.desconectar)("c2", 1, ["USD", "EUR"])
+        self.assertTrue(presencia.usuario_conectado(1))
+        self.assertFalse(presencia.hay_conectados("EUR"))
+
+        async_to_sync(presencia.desconectar)("c1", 1, ["USD"])
+        self.assertFalse(presencia.usuario_conectado(1))
+        self.assertFalse(presencia.hay_conectados("USD"))
+
+    def test_cambiar_monedas(self):
+        async_to_sync(presencia.conectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.cambiar_monedas)("c1", ["EUR"], ["USD"])
+        self.assertFalse(presencia.hay_conectados("USD"))
+        self.assertTrue(presencia.hay_conectados("EUR"))
+
+    def test_desconectar_de_mas_no_deja_negativos(self):
+        async_to_sync(presencia.conectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.desconectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.desconectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.conectar)("c2", 1, ["USD"])
+        self.assertEqual(async_to_sync(presencia.conexiones_usuario)(1), 1)
+        self.assertTrue(presencia.hay_conectados("USD"))
+
+    def test_reiniciar_con_conexiones_abiertas(self):
+        """Las conexiones vivas reaparecen con su latido; desconectarlas no resta de más."""
+        async_to_sync(presencia.conectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.conectar)("c2", 2, ["USD"])
+        presencia.reiniciar()
+        async_to_sync(presencia.desconectar)("c1", 1, ["USD"])
+        async_to_sync(presencia.latido)("c2", 2, ["USD"])
+        self.assertTrue(presencia.usuario_conectado(2))
+        self.assertTrue(presencia.hay_conectados("USD"))
+
+    def test_las_entradas_vencen_sin_latido(self):
+        with mock.patch("notificaciones.presencia.time.time", return_value=1000):
+            async_to_sync(presencia.conectar)("c1", 1, ["USD"])
+        with mock.patch("notificaciones.presencia.time.time", return_value=1000 + presencia.TTL_SEGUNDOS + 1):
+            self.assertFalse(presencia.usuario_conectado(1))
+            self.assertFalse(presencia.hay_conectados("USD"))
+
+
+class PresenciaConsumerTest(TransactionTestCase):
+    """El consumer mantiene el registro al conectar, cambiar suscripciones y desconectar."""
+
+    def setUp(self):
+        presencia.reiniciar()
+        self.user = User.objects.create_user(
+            username="presente", email="presente@example.com", cedula="99887766", password="testpass123",
+        )
+        usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        NotificacionMoneda.objects.create(user=self.user, moneda=usd, activa=True)
+
+    async def test_conectar_y_desconectar(self):
+        communicator = WebsocketCommunicator(NotificacionConsumer.as_asgi(), "/ws/notificaciones/")
+        communicator.scope["user"] = self.user
+        await communicator.connect()
+        await communicator.receive_json_from()
+        self.assertEqual(await presencia.conexiones_usuario(self.user.id), 1)
+        self.assertEqual(await presencia.conexiones_moneda("USD"), 1)
+
+        await communicator.disconnect()
+        self.assertEqual(await presencia.conexiones_usuario(self.user.id), 0)
+        self.assertEqual(await presencia.conexiones_moneda("USD"), 0)
+        self.assertFalse(await database_sync_to_async(presencia.hay_conectados)("USD"))
@@ -9,6 +9,7 @@ from notificaciones.models import NotificacionMoneda
 from clientes.models import Cliente
 from cliente_segmentacion.models import Segmentacion
 from cliente_usuario.models import Usuario_Cliente
+from unittest.mock import patch
 
 User = get_user_model()
 
@@ -138,6 +139,14 @@ class NotificacionesViewsTest(TestCase):
         notif_eur = NotificacionMoneda.objects.get(user=self.user, moneda=self.moneda_eur)
         self.assertFalse(notif_eur.activa)
 
+    def test_guardar_configuracion_actualiza_grupos_del_websocket(self):
+        """Verifica que se avisa a los WebSockets abiertos del usuario"""
+        url = reverse("guardar_configuracion")
+        data = {"monedas": [{"moneda": "USD", "activa": True}]}
+        with patch("notificaciones.views.actualizar_suscripciones") as actualizar:
+            self.client.post(url, data=json.dumps(data), content_type="application/json")
+        actualizar.assert_called_once_with(self.user.id)
+
     def test_guardar_configuracion_asegura_pyg_activa(self):
         """Verifica que PYG siempre queda activa"""
         url = reverse("guardar_configuracion")
@@ -5,4 +5,8 @@ from . import views
 urlpatterns = [
     path("", views.panel_alertas, name="notificaciones"),
     path("guardar-configuracion/", views.guardar_configuracion, name="guardar_configuracion"),
+    path("bandeja/", views.bandeja_notificaciones, name="bandeja_notificaciones"),
+    path("bandeja/leidas/", views.marcar_notificaciones_leidas, name="marcar_notificaciones_leidas"),
+    path("alertas/", views.alertas_precio, name="alertas_precio"),
+    path("alertas/<int:alerta_id>/eliminar/", views.eliminar_alerta_precio, name="eliminar_alerta_precio"),
 ]
\ No newline at end of file
@@ -1,14 +1,18 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from decimal import Decimal
+from django.core.exceptions import ValidationError
 import json
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from monedas.models import Moneda
-from notificaciones.models import NotificacionMoneda
+from notificaciones import alertas, bandeja
+from notificaciones.models import AlertaPrecio, NotificacionMoneda
+from notificaciones.servicios import actualizar_suscripciones
 from cliente_usuario.models import Usuario_Cliente
 from clientes.models import Cliente
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 
 def panel_alertas(request):
     """
@@ -48,6 +52,7 @@ def guardar_configuracion(request):
     - Lee los datos enviados por POST en formato JSON.
     - Actualiza o crea los registros de notificación por moneda.
     - Asegura que la moneda base 'PYG' (Guaraní) siempre permanezca activa.
+    - Avisa a los WebSockets abiertos del usuario para que actualicen sus grupos.
     - Devuelve una respuesta JSON con el estado de la operación.
     """
     if request.method == "POST":
@@ -81,7 +86,10 @@ def guardar_configuracion(request):
                 )
             except Moneda.DoesNotExist:
                 pass
-                
+
+            # Las conexiones abiertas del usuario entran/salen de los grupos por moneda
+            actualizar_suscripciones(request.user.id)
+
             return JsonResponse({"status": "ok", "message": "Configuración guardada"})
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)}, status=400)
@@ -89,6 +97,129 @@ def guardar_configuracion(request):
     return JsonResponse({"status": "error", "message": "Método no permitido"}, status=405)
 
 
+def _entero(valor, defecto=None):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return defecto
+
+
+@login_required
+@require_GET
+def bandeja_notificaciones(request):
+    """
+    Bandeja de avisos del usuario, paginada por cursor (JSON).
+
+    Parámetros GET:
+        antes (int): Cursor (``siguiente`` de la página anterior).
+        limite (int): Avisos por página (máximo ``bandeja.TAMANO_MAXIMO``).
+
+    Retorna:
+        JsonResponse: ``notificaciones`` (de la más nueva a la más vieja),
+        ``siguiente`` (cursor o null) y ``no_leidas``.
+    """
+    avisos, siguiente = bandeja.pagina(
+        request.user.id,
+        antes=_entero(request.GET.get("antes")),
+        limite=_entero(request.GET.get("limite"), bandeja.TAMANO_PAGINA),
+    )
+    return JsonResponse({
+        "notificaciones": avisos,
+        "siguiente": siguiente,
+        "no_leidas": bandeja.no_leidas(request.user.id),
+    })
+
+
+@login_required
+@require_POST
+def marcar_notificaciones_leidas(request):
+    """
+    Marca como leídos los avisos del usuario.
+
+    Cuerpo (JSON o formulario) opcional: ``{"hasta": <id>}`` marca hasta ese
+    aviso inclusive; sin ``hasta`` se marcan todos.
+    """
+    data = request.POST
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or "{}")
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        return JsonResponse({"status": "error", "message": "JSON inválido"}, status=400)
+    marcadas = bandeja.marcar_leidas(request.user.id, hasta=_entero(data.get("hasta")))
+    return JsonResponse({
+        "status": "ok",
+        "marcadas": marcadas,
+        "no_leidas": bandeja.no_leidas(request.user.id),
+    })
+
+
+def _alerta_json(alerta):
+    return {
+        "id": alerta.id,
+        "moneda": alerta.moneda.abreviacion,
+        "tipo": alerta.tipo,
+        "direccion": alerta.direccion,
+        "precio": float(alerta.precio),
+        "activa": alerta.activa,
+        "creada": alerta.creada.isoformat(),
+        "disparada_en": alerta.disparada_en.isoformat() if alerta.disparada_en else None,
+    }
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def alertas_precio(request):
+    """
+    Alertas de precio del usuario (JSON).
+
+    GET: lista las alertas (activas y disparadas).
+    POST: crea una alerta. Cuerpo JSON:
+        ``{"moneda": "USD", "tipo": "venta", "direccion": "arriba", "precio": 7500}``
+    """
+    if request.method == "GET":
+        lista = AlertaPrecio.objects.filter(user=request.user).select_related("moneda")
+        return JsonResponse({"alertas": [_alerta_json(a) for a in lista]})
+
+    try:
+        data = json.loads(request.body)
+        moneda = Moneda.objects.get(abreviacion=data.get("moneda"), estado=True)
+        precio = Decimal(str(data.get("precio")))
+        if not precio.is_finite():
+            raise ValueError("precio no finito")
+        # Dígitos y decimales del campo (falla en la base si no entra)
+        precio = AlertaPrecio._meta.get_field("precio").clean(precio, None)
+    except (ValueError, TypeError, ArithmeticError, AttributeError, ValidationError, Moneda.DoesNotExist):
+        return JsonResponse({"status": "error", "message": "Datos de la alerta inválidos"}, status=400)
+
+    tipo = data.get("tipo", "venta")
+    direccion = data.get("direccion")
+    if tipo not in dict(AlertaPrecio.TIPOS) or direccion not in dict(AlertaPrecio.DIRECCIONES) or precio <= 0:
+        return JsonResponse({"status": "error", "message": "Datos de la alerta inválidos"}, status=400)
+
+    if AlertaPrecio.objects.filter(user=request.user, activa=True).count() >= alertas.MAXIMO_POR_USUARIO:
+        return JsonResponse({
+            "status": "error",
+            "message": f"Máximo de {alertas.MAXIMO_POR_USUARIO} alertas activas",
+        }, status=400)
+
+    alerta = AlertaPrecio.objects.create(
+        user=request.user, moneda=moneda, tipo=tipo, direccion=direccion, precio=precio,
+    )
+    return JsonResponse({"status": "ok", "alerta": _alerta_json(alerta)}, status=201)
+
+
+@login_required
+@require_POST
+def eliminar_alerta_precio(request, alerta_id):
+    """Elimina una alerta de precio del usuario."""
+    eliminadas, _ = AlertaPrecio.objects.filter(id=alerta_id, user=request.user).delete()
+    if not eliminadas:
+        return JsonResponse({"status": "error", "message": "Alerta no encontrada"}, status=404)
+    return JsonResponse({"status": "ok"})
+
+
 def obtener_clientes_usuario(user,request):
     """
     Obtiene los clientes asociados al usuario autenticado.
@@ -0,0 +1,407 @@
+"""
+Consumo por cliente (Operaciones).
+
+Libro incremental del gasto confirmado de cada cliente, por día y por mes
+(``ClienteConsumo``), para los controles de límites de ``LimiteTransaccion``.
+Antes cada control sumaba todas las transacciones confirmadas del cliente con
+``fecha__date=``; ahora es una lectura por clave.
+
+Importe de una transacción (como lo sumaban las vistas):
+    - venta: ``monto * tasa_usada``
+    - compra / cambio: ``monto``
+
+``Transaccion.save()``/``delete()`` llaman a ``registrar`` en la misma
+transacción de base de datos: si la transacción entra en ``confirmada`` se
+suma su importe, si sale (o se borra) se resta, y si cambian monto, tasa,
+tipo, fecha o cliente estando confirmada se mueve la diferencia.
+
+Los ``update()`` masivos no pasan por ``save()``: después de uno que toque
+transacciones confirmadas hay que correr ``manage.py recalcular_consumo``.
+
+Reservas (``ReservaLimite``):
+    Una transacción nueva ``pendiente`` reserva su importe con un UPDATE
+    condicional sobre las filas del día y del mes del cliente:
+
+        UPDATE ... SET reservado = reservado + importe
+        WHERE total + reservado + importe <= limite
+
+    El UPDATE bloquea sólo esas filas hasta el fin de la transacción, así que
+    dos pedidos simultáneos del mismo cliente se ordenan y el segundo vuelve a
+    evaluar la condición con la reserva del primero; los de otros clientes no
+    se esperan. Si no hay margen se lanza ``LimiteExcedido`` y el guardado se
+    revierte. Al confirmarse, la reserva pasa a ``total``; al cancelarse,
+    borrarse o vencer (``manage.py liberar_reservas``) se devuelve.
+
+    Una transacción que entra en ``confirmada`` sin reserva vigente (creada
+    ya confirmada, o confirmada después de que venció su reserva) pasa por el
+    mismo UPDATE condicional, sobre ``total``: si no entra, ``LimiteExcedido``.
+
+Lotes (``guardar_lote``):
+    ``bulk_create`` no pasa por ``save()``; ``guardar_lote`` hace a mano lo
+    mismo para todo el lote con un número fijo de consultas: bloquea de una
+    vez las filas de consumo de los clientes del lote, reparte el margen en
+    memoria en el orden del lote e inserta transacciones y reservas juntas.
+
+Uso:
+    gasto_diario, gasto_mensual = consumo.gastado(cliente_id)
+    ocupado_diario, ocupado_mensual = consumo.comprometido(cliente_id)  # con reservas
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import localtime, now
+
+from limite_moneda.models import LimiteTransaccion
+from operaciones.models import ClienteConsumo, ReservaLimite, Transaccion
+
+#: Minutos de reserva por defecto si no se define ``LIMITES_RESERVA_MINUTOS``.
+RESERVA_MINUTOS_POR_DEFECTO = 30
+
+#: Lo que una transacción suma al consumo: cliente, día local e importe.
+Aporte = namedtuple("Aporte", ["cliente_id", "dia", "importe"])
+
+
+class LimiteExcedido(Exception):
+    """
+    No hay margen en el límite ``periodo`` ("dia" o "mes") para la transacción;
+    ``disponible`` es lo que quedaba (contando las reservas).
+    """
+
+    def __init__(self, periodo, disponible):
+        nombre = "diario" if periodo == "dia" else "mensual"
+        super().__init__(f"La operación supera el límite {nombre} disponible ({disponible:.2f}).")
+        self.periodo = periodo
+        self.disponible = disponible
+
+
+def importe(tipo, monto, tasa_usada):
+    """Importe en guaraníes que cuenta para los límites."""
+    if (tipo or "").lower() == "venta":
+        return monto * tasa_usada
+    return monto
+
+
+def inicio_mes(dia):
+    return dia.replace(day=1)
+
+
+def _aporte(estado, cliente_id, fecha, tipo, monto, tasa_usada):
+    if estado != "confirmada" or None in (cliente_id, fecha, monto, tasa_usada):
+        return None
+    return Aporte(cliente_id, localtime(fecha).date(), importe(tipo, monto, tasa_usada))
+
+
+def aporte_anterior(transaccion):
+    """
+    Aporte de la transacción según los valores con que se leyó
+    (``SeguimientoCambiosMixin``); ``None`` si es nueva o no estaba confirmada.
+    """
+    anterior = transaccion.previous_value
+    return _aporte(
+        anterior("estado"), anterior("cliente"), anterior("fecha"),
+        anterior("tipo"), anterior("monto"), anterior("tasa_usada"),
+    )
+
+
+def aporte_actual(transaccion):
+    """Aporte de la transacción con sus valores actuales."""
+    return _aporte(
+        transaccion.estado, transaccion.cliente_id, transaccion.fecha,
+        transaccion.tipo, transaccion.monto, transaccion.tasa_usada,
+    )
+
+
+def _fila(cliente_id, periodo, fecha):
+    fila, _ = ClienteConsumo.objects.get_or_create(cliente_id=cliente_id, periodo=periodo, fecha=fecha)
+    return ClienteConsumo.objects.filter(pk=fila.pk)
+
+
+def _sumar(cliente_id, periodo, fecha, cantidad, campo="total"):
+    _fila(cliente_id, periodo, fecha).update(**{campo: F(campo) + cantidad})
+
+
+def _aplicar(aporte, signo, campo="total"):
+    cantidad = aporte.importe * signo
+    _sumar(aporte.cliente_id, "dia", aporte.dia, cantidad, campo)
+    _sumar(aporte.cliente_id, "mes", inicio_mes(aporte.dia), cantidad, campo)
+
+
+def registrar(transaccion, anterior, borrada=False):
+    """
+    Mueve el consumo de ``anterior`` (ver ``aporte_anterior``) al aporte actual
+    de la transacción. Se llama dentro del ``atomic`` del guardado.
+
+    :raises LimiteExcedido: Si entra en ``confirmada`` sin reserva vigente y
+        su importe no entra en el margen del día o del mes.
+    """
+    nuevo = None if borrada else aporte_actual(transaccion)
+    if anterior == nuevo:
+        return
+    with transaction.atomic():
+        if anterior is not None:
+            _aplicar(anterior, -1)
+        if nuevo is None:
+            return
+        # Entra en confirmada: si tenía reserva el margen ya estaba apartado
+        sin_reserva = anterior is None and not ReservaLimite.objects.filter(transaccion_id=transaccion.pk).exists()
+        if not (sin_reserva and _ocupar(nuevo, "total")):
+            _aplicar(nuevo, 1)
+
+
+def _ocupar(aporte, campo):
+    """
+    Suma el aporte a ``campo`` ("reservado" o "total") del día y del mes sólo
+    si entra en el margen: ``total + reservado + importe <= limite``.
+
+    :return: False si no hay límites configurados (no se sumó nada).
+    :raises LimiteExcedido: Si no entra en el día o en el mes.
+    """
+    # El mismo límite general que usa verificar_limites
+    limite = LimiteTransaccion.objects.first()
+    if limite is None:
+        return False
+    with transaction.atomic():
+        for periodo, fecha, maximo in (
+            ("dia", aporte.dia, limite.limite_diario),
+            ("mes", inicio_mes(aporte.dia), limite.limite_mensual),
+        ):
+            fila = _fila(aporte.cliente_id, periodo, fecha)
+            if maximo > 0:  # 0 = sin límite (como lo muestra el simulador)
+                fila = fila.filter(total__lte=maximo - aporte.importe - F("reservado"))
+            if not fila.update(**{campo: F(campo) + aporte.importe}):
+                total, reservado = _fila(aporte.cliente_id, periodo, fecha).values_list("total", "reservado").get()
+                raise LimiteExcedido(periodo, max(maximo - total - reservado, 0))
+    return True
+
+
+def reserva_minutos():
+    """Minutos que dura una reserva (``LIMITES_RESERVA_MINUTOS``)."""
+    return getattr(settings, "LIMITES_RESERVA_MINUTOS", RESERVA_MINUTOS_POR_DEFECTO)
+
+
+def reservar(transaccion):
+    """
+    Reserva el importe de la transacción en los límites diario y mensual.
+
+    :return: La ``ReservaLimite`` creada, o ``None`` si no hay límites configurados.
+    :raises LimiteExcedido: Si el importe no entra en el margen del día o del mes.
+    """
+    aporte = _aporte("confirmada", transaccion.cliente_id, transaccion.fecha,
+                     transaccion.tipo, transaccion.monto, transaccion.tasa_usada)
+    if aporte is None:
+        return None
+
+    with transaction.atomic():
+        if not _ocupar(aporte, "reservado"):
+            return None
+        return ReservaLimite.objects.create(
+            transaccion=transaccion,
+            cliente_id=aporte.cliente_id,
+            dia=aporte.dia,
+            importe=aporte.importe,
+            vence=now() + timedelta(minutes=reserva_minutos()),
+        )
+
+
+def _verificar_margen(fila, maximo, cantidad):
+    if maximo > 0 and fila.total + fila.reservado + cantidad > maximo:
+        raise LimiteExcedido(fila.periodo, max(maximo - fila.total - fila.reservado, 0))
+
+
+def guardar_lote(transacciones):
+    """
+    Inserta transacciones nuevas con ``bulk_create`` y actualiza el consumo y
+    las reservas como lo haría ``Transaccion.save()`` con cada una.
+
+    Las pendientes se reservan y las confirmadas se suman en el orden del
+    lote; las que no entran en el margen del cliente no se insertan. Todas cuentan para el día en que
+    empieza el lote.
+
+    :param transacciones: ``Transaccion`` sin guardar.
+    :return: Tupla (guardadas, rechazadas): la lista de insertadas y
+        ``{posición: LimiteExcedido}`` de las que no entraron.
+    """
+    if not transacciones:
+        return [], {}
+    dia = localtime(now()).date()
+    mes = inicio_mes(dia)
+    limite = LimiteTransaccion.objects.first()
+    clientes = {t.cliente_id for t in transacciones}
+
+    guardadas, rechazadas, reservas, tocadas = [], {}, [], {}
+    with transaction.atomic():
+        ClienteConsumo.objects.bulk_create(
+            [
+                ClienteConsumo(cliente_id=cliente_id, periodo=periodo, fecha=fecha)
+                for cliente_id in clientes
+                for periodo, fecha in (("dia", dia), ("mes", mes))
+            ],
+            ignore_conflicts=True,
+        )
+        # Mismo bloqueo que toma reservar(), pero de todas las filas del lote a la vez
+        filas = {
+            (fila.cliente_id, fila.periodo, fila.fecha): fila
+            for fila in ClienteConsumo.objects.select_for_update()
+            .filter(cliente_id__in=clientes, fecha__in={dia, mes})
+        }
+
+        for posicion, t in enumerate(transacciones):
+            cantidad = importe(t.tipo, t.monto, t.tasa_usada)
+            periodos = (
+                (filas[(t.cliente_id, "dia", dia)], limite and limite.limite_diario),
+                (filas[(t.cliente_id, "mes", mes)], limite and limite.limite_mensual),
+            )
+            if t.estado in ("pendiente", "confirmada") and limite is not None:
+                try:
+                    for fila, maximo in periodos:
+                        _verificar_margen(fila, maximo, cantidad)
+                except LimiteExcedido as e:
+                    rechazadas[posicion] = e
+                    continue
+            if t.estado == "pendiente" and limite is not None:
+                campo = "reservado"
+                reservas.append((t, cantidad))
+            elif t.estado == "confirmada":
+                campo = "total"
+            else:
+                campo = None
+            if campo:
+                for fila, _ in periodos:
+                    setattr(fila, campo, getattr(fila, campo) + cantidad)
+                    tocadas[fila.pk] = fila
+            guardadas.append(t)
+
+        Transaccion.objects.bulk_create(guardadas, batch_size=500)
+        vence = now() + timedelta(minutes=reserva_minutos())
+        ReservaLimite.objects.bulk_create(
+            [
+                ReservaLimite(transaccion=t, cliente_id=t.cliente_id, dia=dia, importe=cantidad, vence=vence)
+                for t, cantidad in reservas
+            ],
+            batch_size=500,
+        )
+        ClienteConsumo.objects.bulk_update(tocadas.values(), ["total", "reservado"], batch_size=500)
+
+    for t in guardadas:
+        # Como después de save(): la próxima edición mueve el consumo desde aquí
+        t._guardar_instantanea()
+    return guardadas, rechazadas
+
+
+def liberar(transaccion_o_reserva):
+    """
+    Devuelve al margen del cliente la reserva de una transacción (si la tiene).
+
+    :param transaccion_o_reserva: ``Transaccion`` o ``ReservaLimite``.
+    :return: True si había una reserva y se liberó.
+    """
+    if isinstance(transaccion_o_reserva, ReservaLimite):
+        filtro = {"pk": transaccion_o_reserva.pk}
+    else:
+        filtro = {"transaccion_id": transaccion_o_reserva.pk}
+    with transaction.atomic():
+        # El bloqueo evita liberar dos veces (confirmación y vencimiento a la vez)
+        reserva = ReservaLimite.objects.select_for_update().filter(**filtro).first()
+        if reserva is None:
+            return False
+        _aplicar(Aporte(reserva.cliente_id, reserva.dia, reserva.importe), -1, campo="reservado")
+        reserva.delete()
+    return True
+
+
+def actualizar_reserva(transaccion, estado_anterior, nueva):
+    """
+    Reserva al crear una transacción pendiente y libera la reserva cuando deja
+    de estar pendiente. Se llama dentro del ``atomic`` del guardado.
+    """
+    if nueva and transaccion.estado == "pendiente":
+        reservar(transaccion)
+    elif estado_anterior == "pendiente" and transaccion.estado != "pendiente":
+        liberar(transaccion)
+
+
+def liberar_vencidas(momento=None):
+    """
+    Libera las reservas vencidas (la transacción sigue pendiente, sin reserva).
+
+    :return: Cantidad de reservas liberadas.
+    """
+    vencidas = ReservaLimite.objects.filter(vence__lte=momento or now()).order_by("vence")
+    return sum(liberar(reserva) for reserva in vencidas.iterator())
+
+
+def _del_dia_y_mes(cliente_id, dia, campo):
+    dia = dia or localtime(now()).date()
+    valores = dict(
+        ClienteConsumo.objects
+        .filter(cliente_id=cliente_id)
+        .filter(Q(periodo="dia", fecha=dia) | Q(periodo="mes", fecha=inicio_mes(dia)))
+        .values_list("periodo", campo)
+    )
+    return valores.get("dia", Decimal("0")), valores.get("mes", Decimal("0"))
+
+
+def gastado(cliente_id, dia=None):
+    """
+    Gasto confirmado del cliente en el día y en su mes (una consulta por clave).
+
+    :param cliente_id: Id del cliente.
+    :param dia: Día local (por defecto, hoy).
+    :return: Tupla (gasto_diario, gasto_mensual) en guaraníes.
+    :rtype: tuple[Decimal, Decimal]
+    """
+    return _del_dia_y_mes(cliente_id, dia, "total")
+
+
+def comprometido(cliente_id, dia=None):
+    """
+    Gasto confirmado más las reservas vigentes del cliente en el día y en su
+    mes: lo que ``reservar`` descuenta del límite. El margen que se muestra
+    al cliente es ``limite - comprometido``.
+
+    :return: Tupla (diario, mensual) en guaraníes.
+    :rtype: tuple[Decimal, Decimal]
+    """
+    return _del_dia_y_mes(cliente_id, dia, F("total") + F("reservado"))
+
+
+def recalcular(clientes=None):
+    """
+    Reconstruye ``ClienteConsumo`` desde las transacciones confirmadas (``total``)
+    y las reservas vigentes (``reservado``).
+
+    :param clientes: Ids de clientes a recalcular (por defecto, todos).
+    :return: Cantidad de filas de consumo creadas.
+    """
+    totales = defaultdict(lambda: {"total": Decimal("0"), "reservado": Decimal("0")})
+    confirmadas = Transaccion.objects.filter(estado="confirmada")
+    reservas = ReservaLimite.objects.all()
+    if clientes is not None:
+        confirmadas = confirmadas.filter(cliente_id__in=clientes)
+        reservas = reservas.filter(cliente_id__in=clientes)
+    filas = confirmadas.order_by().values_list("cliente_id", "fecha", "tipo", "monto", "tasa_usada")
+    for cliente_id, fecha, tipo, monto, tasa_usada in filas.iterator(chunk_size=5000):
+        aporte = _aporte("confirmada", cliente_id, fecha, tipo, monto, tasa_usada)
+        totales[(cliente_id, "dia", aporte.dia)]["total"] += aporte.importe
+        totales[(cliente_id, "mes", inicio_mes(aporte.dia))]["total"] += aporte.importe
+    for cliente_id, dia, monto in reservas.values_list("cliente_id", "dia", "importe").iterator():
+        totales[(cliente_id, "dia", dia)]["reservado"] += monto
+        totales[(cliente_id, "mes", inicio_mes(dia))]["reservado"] += monto
+
+    with transaction.atomic():
+        existentes = ClienteConsumo.objects.all()
+        if clientes is not None:
+            existentes = existentes.filter(cliente_id__in=clientes)
+        existentes.delete()
+        ClienteConsumo.objects.bulk_create(
+            [
+                ClienteConsumo(cliente_id=cliente_id, periodo=periodo, fecha=fecha, **valores)
+                for (cliente_id, periodo, fecha), valores in totales.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totales)
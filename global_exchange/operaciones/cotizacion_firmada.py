@@ -0,0 +1,110 @@
+"""
+Cotizaciones firmadas (operaciones).
+
+El simulador entrega, junto con cada cálculo, un token firmado (HMAC con la
+``SECRET_KEY``, vía ``django.core.signing``) con todo lo que después necesita
+``guardar_transaccion``: par de monedas, tasa usada y su referencia,
+descuento, monto, ganancia, cliente, usuario y vencimiento.
+
+Así el guardado no confía en lo que manda el navegador ni vuelve a buscar
+``Moneda``, ``TasaDeCambio`` y ``Cliente``: basta con verificar la firma, y
+cualquier worker puede hacerlo (no hay estado en sesión ni en caché).
+
+El vencimiento viaja dentro del contenido firmado (y no como el timestamp de
+``signing``) para poder leer un token vencido pero auténtico y registrar la
+transacción como ``cancelada_cotizacion``.
+
+Cada token lleva un identificador aleatorio (``jti``) que se guarda en
+``Transaccion.cotizacion_jti`` (único): una cotización fija su precio para
+una sola operación, no para todas las que se guarden antes de que venza.
+
+Uso:
+    token = firmar(...)
+    datos = verificar(token)          # CotizacionInvalida / CotizacionVencida
+"""
+import secrets
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+
+#: Sal de la firma, separa estos tokens de otros firmados con la misma SECRET_KEY.
+SAL = "operaciones.cotizacion_firmada"
+
+#: Validez por defecto (segundos) si no se define ``COTIZACION_VALIDEZ_SEGUNDOS``.
+VALIDEZ_POR_DEFECTO = 300
+
+#: Campos del contenido que son montos (viajan como texto para no perder precisión).
+CAMPOS_DECIMALES = ("tasa_usada", "monto", "ganancia", "descuento")
+
+
+class CotizacionInvalida(Exception):
+    """El token no existe, está adulterado o no se puede leer."""
+
+
+class CotizacionVencida(Exception):
+    """El token es auténtico pero venció; ``datos`` tiene su contenido."""
+
+    def __init__(self, datos):
+        super().__init__("La cotización venció")
+        self.datos = datos
+
+
+def validez():
+    """Segundos durante los que un token emitido es aceptado."""
+    return getattr(settings, "COTIZACION_VALIDEZ_SEGUNDOS", VALIDEZ_POR_DEFECTO)
+
+
+def firmar(*, moneda_origen_id, moneda_destino_id, tasa_ref_id, tasa_usada, tipo,
+           monto, ganancia, descuento, cliente_id, cliente_nombre, usuario_id, ahora=None):
+    """
+    Emite el token firmado de una cotización.
+
+    :param tipo: Tipo con el que se guarda la ``Transaccion`` (``compra``/``venta``).
+    :return: Token (str, apto para URL).
+    """
+    ahora = time.time() if ahora is None else ahora
+    contenido = {
+        "moneda_origen_id": moneda_origen_id,
+        "moneda_destino_id": moneda_destino_id,
+        "tasa_ref_id": tasa_ref_id,
+        "tasa_usada": str(tasa_usada),
+        "tipo": tipo,
+        "monto": str(monto),
+        "ganancia": str(ganancia),
+        "descuento": str(descuento),
+        "cliente_id": cliente_id,
+        "cliente_nombre": cliente_nombre,
+        "usuario_id": usuario_id,
+        "expira": int(ahora + validez()),
+        "jti": secrets.token_hex(16),
+    }
+    return signing.dumps(contenido, salt=SAL, compress=True)
+
+
+def verificar(token, ahora=None):
+    """
+    Verifica la firma y el vencimiento de un token.
+
+    :return: Contenido del token, con los montos como ``Decimal``.
+    :raises CotizacionInvalida: Si la firma no es válida.
+    :raises CotizacionVencida: Si la firma es válida pero el token venció.
+    """
+    try:
+        datos = signing.loads(token, salt=SAL)
+    except (signing.BadSignature, TypeError, ValueError) as exc:
+        raise CotizacionInvalida(str(exc))
+    try:
+        for campo in CAMPOS_DECIMALES:
+            datos[campo] = Decimal(datos[campo])
+        expira = int(datos["expira"])
+        if not isinstance(datos["jti"], str):
+            raise TypeError("jti")
+    except (KeyError, TypeError, ArithmeticError, ValueError) as exc:
+        raise CotizacionInvalida(f"Contenido incompleto: {exc}")
+
+    ahora = time.time() if ahora is None else ahora
+    if ahora > expira:
+        raise CotizacionVencida(datos)
+    return datos
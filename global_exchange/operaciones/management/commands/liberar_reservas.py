@@ -0,0 +1,22 @@
+"""
+Comando ``liberar_reservas``.
+
+Devuelve al margen de los clientes las reservas de límite vencidas
+(``LIMITES_RESERVA_MINUTOS``) de transacciones que siguen pendientes (ver
+``operaciones.consumo``).
+
+Uso (p. ej. cada minuto desde cron; en producción lo corre el servicio
+``liberar_reservas`` de ``docker-compose.prod.yml``):
+    python manage.py liberar_reservas
+"""
+from django.core.management.base import BaseCommand
+
+from operaciones import consumo
+
+
+class Command(BaseCommand):
+    help = "Libera las reservas de límite vencidas de transacciones pendientes."
+
+    def handle(self, *args, **options):
+        liberadas = consumo.liberar_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Reservas liberadas: {liberadas}."))
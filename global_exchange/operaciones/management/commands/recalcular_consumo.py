@@ -0,0 +1,32 @@
+"""
+Comando ``recalcular_consumo``.
+
+Reconstruye ``ClienteConsumo`` (gasto confirmado por cliente y día/mes) desde
+el historial de transacciones confirmadas y las reservas vigentes (ver
+``operaciones.consumo``).
+Hace falta al instalarlo por primera vez y después de cualquier ``update()``
+masivo sobre transacciones confirmadas.
+
+Uso:
+    python manage.py recalcular_consumo
+    python manage.py recalcular_consumo --cliente 3 --cliente 8
+"""
+from django.core.management.base import BaseCommand
+
+from operaciones import consumo
+
+
+class Command(BaseCommand):
+    help = "Recalcula el consumo diario y mensual de los clientes desde sus transacciones confirmadas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cliente",
+            type=int,
+            action="append",
+            help="Id de un cliente a recalcular (se puede repetir; por defecto, todos).",
+        )
+
+    def handle(self, *args, **options):
+        filas = consumo.recalcular(options["cliente"])
+        self.stdout.write(self.style.SUCCESS(f"Consumo recalculado: {filas} filas."))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:41
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils.timezone import localtime
+
+
+def cargar_consumo(apps, schema_editor):
+    """Carga el consumo desde las transacciones confirmadas (como ``recalcular_consumo``)."""
+    Transaccion = apps.get_model('operaciones', 'Transaccion')
+    ClienteConsumo = apps.get_model('operaciones', 'ClienteConsumo')
+    totales = defaultdict(Decimal)
+    filas = Transaccion.objects.filter(estado='confirmada').values_list('cliente_id', 'fecha', 'tipo', 'monto', 'tasa_usada')
+    for cliente_id, fecha, tipo, monto, tasa_usada in filas.iterator(chunk_size=5000):
+        importe = monto * tasa_usada if (tipo or '').lower() == 'venta' else monto
+        dia = localtime(fecha).date()
+        totales[(cliente_id, 'dia', dia)] += importe
+        totales[(cliente_id, 'mes', dia.replace(day=1))] += importe
+    ClienteConsumo.objects.bulk_create(
+        [ClienteConsumo(cliente_id=c, periodo=p, fecha=f, total=t) for (c, p, f), t in totales.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_initial'),
+        ('operaciones', '0007_transaccion_fecha_procesado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClienteConsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(choices=[('dia', 'Día'), ('mes', 'Mes')], max_length=3)),
+                ('fecha', models.DateField()),
+                ('total', models.DecimalField(decimal_places=8, default=0, max_digits=30)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos', to='clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Consumo de cliente',
+                'verbose_name_plural': 'Consumos de clientes',
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'periodo', 'fecha'), name='consumo_unico_por_periodo')],
+            },
+        ),
+        migrations.RunPython(cargar_consumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_initial'),
+        ('operaciones', '0008_clienteconsumo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clienteconsumo',
+            name='reservado',
+            field=models.DecimalField(decimal_places=8, default=0, max_digits=30),
+        ),
+        migrations.CreateModel(
+            name='ReservaLimite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('importe', models.DecimalField(decimal_places=8, max_digits=30)),
+                ('vence', models.DateTimeField(db_index=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='clientes.cliente')),
+                ('transaccion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserva', to='operaciones.transaccion')),
+            ],
+            options={
+                'verbose_name': 'Reserva de límite',
+                'verbose_name_plural': 'Reservas de límite',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operaciones', '0009_reservalimite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaccion',
+            name='cotizacion_jti',
+            field=models.CharField(blank=True, help_text='Identificador de la cotización firmada con que se creó (cada una se usa una sola vez).', max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -6,6 +6,8 @@ Estructura:
   TransaccionQuerySet.recientes(limite, usuario)
   TransaccionManager.recientes(...)
   Transaccion.ultimas(...)
+  ClienteConsumo: gasto confirmado por cliente y día/mes (ver operaciones.consumo)
+  ReservaLimite: margen de límite reservado por una transacción pendiente
 Campos clave:
   tipo: 'compra' (cliente trae moneda extranjera y recibe PYG) / 'venta' (cliente entrega PYG y recibe extranjera)
   estado: flujo de vida de la operación (pendiente, confirmada, cancelada_*).
@@ -13,7 +15,7 @@ Campos clave:
   tasa_ref: FK a la tabla de cotizaciones para trazabilidad.
 """
 
-from django.db import models
+from django.db import models, transaction
 from usuarios.models import CustomUser
 from monedas.models import Moneda
 from cotizaciones.models import TasaDeCambio
@@ -21,6 +23,7 @@ from clientes.models import Cliente
 from metodos_pagos.models import MetodoPago
 from django.conf import settings
 from django.utils import timezone
+from global_exchange.mixins import SeguimientoCambiosMixin
 
 class TransaccionQuerySet(models.QuerySet):
     """
@@ -72,7 +75,7 @@ class TransaccionManager(models.Manager):
         return self.get_queryset().recientes(limite=limite, usuario=usuario)
 
 
-class Transaccion(models.Model):
+class Transaccion(SeguimientoCambiosMixin, models.Model):
     """
     Representa una operación de cambio de moneda realizada por un usuario.
 
@@ -95,6 +98,16 @@ class Transaccion(models.Model):
         moneda_destino (Moneda): Moneda a la cual se convierte el monto.
         tasa_usada (Decimal): Tasa de cambio congelada al iniciar la operación.
         tasa_ref (TasaDeCambio): Referencia a la tasa vigente utilizada.
+        cotizacion_jti (str): ``jti`` de la cotización firmada usada (ver
+            ``operaciones.cotizacion_firmada``); único, así un token no crea
+            dos transacciones.
+
+    Con ``SeguimientoCambiosMixin``: ``changed_fields()`` / ``previous_value()``
+    (p. ej. el estado anterior) sin volver a consultar la fila.
+
+    Al entrar o salir de ``confirmada`` (o al borrarse confirmada) se actualiza
+    ``ClienteConsumo`` en la misma transacción; mientras está ``pendiente``
+    tiene su importe reservado (``ReservaLimite``). Ver ``operaciones.consumo``.
     """
 
     ESTADOS = [
@@ -179,6 +192,13 @@ class Transaccion(models.Model):
         on_delete=models.PROTECT,
         help_text="Referencia a la cotización base vigente al iniciar."
     )
+    cotizacion_jti = models.CharField(
+        max_length=32,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Identificador de la cotización firmada con que se creó (cada una se usa una sola vez)."
+    )
 
     cliente = models.ForeignKey(   # 👈 nuevo campo
         Cliente,
@@ -210,6 +230,34 @@ class Transaccion(models.Model):
 
 
     objects = TransaccionManager()
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda y actualiza el consumo del cliente en la misma transacción.
+
+        Una transacción nueva ``pendiente`` reserva su importe dentro de los
+        límites; si no hay margen lanza ``consumo.LimiteExcedido`` y no se guarda.
+        """
+        from operaciones import consumo
+
+        anterior = consumo.aporte_anterior(self)
+        nueva = self._state.adding
+        estado_anterior = None if nueva else self.previous_value("estado")
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            consumo.registrar(self, anterior)
+            consumo.actualizar_reserva(self, estado_anterior, nueva)
+
+    def delete(self, *args, **kwargs):
+        from operaciones import consumo
+
+        anterior = consumo.aporte_anterior(self)
+        with transaction.atomic():
+            consumo.liberar(self)
+            resultado = super().delete(*args, **kwargs)
+            consumo.registrar(self, anterior, borrada=True)
+        return resultado
+
     def puede_procesarse(self):
         """Verifica si la transacción puede ser procesada"""
         return self.estado.lower() == 'pendiente' and self.metodo_pago.nombre.lower()  == 'efectivo'
@@ -256,4 +304,71 @@ class Transaccion(models.Model):
         return (
             f"Transacción {self.id} - {self.tipo.upper()} "
             f"{self.monto} {self.moneda_origen} -> {self.moneda_destino} [{self.estado}]"
-        )
\ No newline at end of file
+        )
+
+class ClienteConsumo(models.Model):
+    """
+    Gasto confirmado de un cliente en un día o en un mes (en guaraníes).
+
+    Se mantiene de forma incremental al confirmar o dejar de confirmar una
+    ``Transaccion`` (ver ``operaciones.consumo``); los controles de límites lo
+    leen por clave en lugar de sumar el historial. ``manage.py recalcular_consumo``
+    lo reconstruye desde las transacciones.
+
+    Atributos:
+        cliente (Cliente): Cliente dueño del gasto.
+        periodo (str): "dia" o "mes".
+        fecha (date): El día, o el primer día del mes.
+        total (Decimal): Suma de los importes confirmados del período.
+        reservado (Decimal): Suma de las reservas de transacciones pendientes.
+    """
+    PERIODOS = [
+        ("dia", "Día"),
+        ("mes", "Mes"),
+    ]
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="consumos")
+    periodo = models.CharField(max_length=3, choices=PERIODOS)
+    fecha = models.DateField()
+    total = models.DecimalField(max_digits=30, decimal_places=8, default=0)
+    reservado = models.DecimalField(max_digits=30, decimal_places=8, default=0)
+
+    def __str__(self):
+        return f"{self.cliente} {self.periodo} {self.fecha}: {self.total} (+{self.reservado} reservado)"
+
+    class Meta:
+        verbose_name = "Consumo de cliente"
+        verbose_name_plural = "Consumos de clientes"
+        constraints = [
+            models.UniqueConstraint(fields=["cliente", "periodo", "fecha"], name="consumo_unico_por_periodo"),
+        ]
+
+
+class ReservaLimite(models.Model):
+    """
+    Margen de los límites diario y mensual reservado por una transacción pendiente.
+
+    Se crea junto con la transacción, sumando ``importe`` a ``reservado`` en
+    el ``ClienteConsumo`` del día y del mes. Al confirmarse la transacción la
+    reserva pasa a ``total``; al cancelarse, borrarse o vencer (``manage.py
+    liberar_reservas``) se devuelve el margen.
+
+    Atributos:
+        transaccion (Transaccion): Transacción pendiente que reservó.
+        cliente (Cliente): Cliente de la transacción.
+        dia (date): Día local de la transacción (el mes sale de acá).
+        importe (Decimal): Importe reservado, en guaraníes.
+        vence (datetime): Desde cuándo se puede liberar por vencida.
+    """
+    transaccion = models.OneToOneField(Transaccion, on_delete=models.CASCADE, related_name="reserva")
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="reservas")
+    dia = models.DateField()
+    importe = models.DecimalField(max_digits=30, decimal_places=8)
+    vence = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Reserva de {self.importe} para la transacción {self.transaccion_id}"
+
+    class Meta:
+        verbose_name = "Reserva de límite"
+        verbose_name_plural = "Reservas de límite"
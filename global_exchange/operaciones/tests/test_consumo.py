@@ -0,0 +1,263 @@
+import json
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from cliente_segmentacion.models import Segmentacion
+from clientes.models import Cliente
+from cliente_usuario.models import Usuario_Cliente
+from cotizaciones.models import TasaDeCambio
+from limite_moneda.models import LimiteTransaccion
+from metodos_pagos.models import MetodoPago
+from monedas.models import Moneda
+from operaciones import consumo, cotizacion_firmada
+from operaciones.models import ClienteConsumo, ReservaLimite, Transaccion
+from usuarios.models import CustomUser
+
+
+class ConsumoTestBase(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="consumo", password="12345", cedula="11223344")
+        self.user.groups.add(Group.objects.get_or_create(name="Usuario Asociado")[0])
+        segmentacion = Segmentacion.objects.create(nombre="Minorista", estado="activo", descuento=0)
+        self.cliente = Cliente.objects.create(
+            nombre="Cliente Consumo", segmentacion=segmentacion, email="consumo@test.com", estado="activo",
+        )
+        self.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        self.pyg = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        self.tasa = TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=self.usd, precio_base=Decimal("7400.00"),
+        )
+        self.efectivo, _ = MetodoPago.objects.get_or_create(nombre="Efectivo", defaults={"activo": True})
+
+    def crear(self, estado="pendiente", tipo="compra", monto="1000", tasa_usada="7400"):
+        return Transaccion.objects.create(
+            usuario=self.user, cliente=self.cliente, monto=Decimal(monto), tipo=tipo, estado=estado,
+            moneda_origen=self.usd, moneda_destino=self.pyg, tasa_usada=Decimal(tasa_usada),
+            tasa_ref=self.tasa, metodo_pago=self.efectivo,
+        )
+
+    def gastado(self):
+        return consumo.gastado(self.cliente.id)
+
+
+class ClienteConsumoTest(ConsumoTestBase):
+    """Tests del libro de consumo por cliente (operaciones.consumo)"""
+
+    def test_pendiente_no_suma(self):
+        self.crear()
+        self.assertEqual(self.gastado(), (0, 0))
+
+    def test_procesar_suma_al_dia_y_al_mes(self):
+        transaccion = self.crear()
+        transaccion.procesar(self.user)
+        self.assertEqual(self.gastado(), (Decimal("1000"), Decimal("1000")))
+
+    def test_venta_suma_monto_por_tasa(self):
+        self.crear(estado="confirmada", tipo="venta", monto="2", tasa_usada="7400")
+        self.crear(estado="confirmada", tipo="compra", monto="500")
+        self.assertEqual(self.gastado(), (Decimal("15300"), Decimal("15300")))
+
+    def test_salir_de_confirmada_resta(self):
+        transaccion = self.crear(estado="confirmada")
+        transaccion = Transaccion.objects.get(pk=transaccion.pk)
+        transaccion.estado = "cancelada_usuario"
+        transaccion.save()
+        self.assertEqual(self.gastado(), (0, 0))
+
+    def test_guardar_sin_cambios_no_suma_dos_veces(self):
+        transaccion = self.crear(estado="confirmada")
+        transaccion.save()
+        Transaccion.objects.get(pk=transaccion.pk).save()
+        self.assertEqual(self.gastado(), (Decimal("1000"), Decimal("1000")))
+
+    def test_cambio_de_monto_confirmada_mueve_la_diferencia(self):
+        transaccion = self.crear(estado="confirmada")
+        transaccion.monto = Decimal("1500")
+        transaccion.save()
+        self.assertEqual(self.gastado(), (Decimal("1500"), Decimal("1500")))
+
+    def test_borrar_confirmada_resta(self):
+        self.crear(estado="confirmada", monto="300")
+        self.crear(estado="confirmada").delete()
+        self.assertEqual(self.gastado(), (Decimal("300"), Decimal("300")))
+
+    def test_actualizar_estado_transaccion(self):
+        transaccion = self.crear()
+        self.client.force_login(self.user)
+        url = reverse("actualizar_estado_transaccion")
+        for estado, esperado in (("confirmada", Decimal("1000")), ("cancelada_usuario", 0)):
+            response = self.client.post(
+                url, json.dumps({"transaccion_id": transaccion.id, "nuevo_estado": estado}),
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.gastado()[0], esperado)
+
+    def test_dia_anterior_cuenta_solo_en_el_mes(self):
+        ayer = timezone.localtime() - timedelta(days=1)
+        transaccion = self.crear(estado="confirmada")
+        Transaccion.objects.filter(pk=transaccion.pk).update(fecha=ayer)
+        call_command("recalcular_consumo", stdout=StringIO())
+        gasto_diario, gasto_mensual = self.gastado()
+        self.assertEqual(gasto_diario, 0)
+        self.assertEqual(gasto_mensual, Decimal("1000") if ayer.month == timezone.localtime().month else 0)
+        self.assertEqual(consumo.gastado(self.cliente.id, ayer.date())[0], Decimal("1000"))
+
+    def test_recalcular_reconstruye_desde_el_historial(self):
+        self.crear(estado="confirmada", tipo="venta", monto="2")
+        self.crear(estado="confirmada", monto="100")
+        self.crear(estado="pendiente", monto="999")
+        esperado = self.gastado()
+        ClienteConsumo.objects.all().delete()
+        ClienteConsumo.objects.create(cliente=self.cliente, periodo="dia", fecha=timezone.localdate(), total=1)
+
+        self.assertEqual(consumo.recalcular(), 2)
+        self.assertEqual(self.gastado(), esperado)
+
+    def test_verificar_limites_lee_el_consumo(self):
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        LimiteTransaccion.objects.create(
+            limite_diario=Decimal("5000"), limite_mensual=Decimal("20000"), moneda=self.pyg,
+        )
+        self.crear(estado="confirmada", monto="4500")
+        self.client.force_login(self.user)
+        data = self.client.post(reverse("verificar_limites"), {"monto": "600", "moneda": "PYG"}).json()
+        self.assertTrue(data["success"])
+        self.assertTrue(data["excede_diario"])
+        self.assertFalse(data["excede_mensual"])
+        self.assertEqual(data["gastado_diario"], "4.500,00")
+
+
+class ReservaLimiteTest(ConsumoTestBase):
+    """Tests de las reservas de límite de las transacciones pendientes"""
+
+    def setUp(self):
+        super().setUp()
+        LimiteTransaccion.objects.create(
+            limite_diario=Decimal("5000"), limite_mensual=Decimal("20000"), moneda=self.pyg,
+        )
+
+    def reservado(self, periodo="dia"):
+        fila = ClienteConsumo.objects.filter(cliente=self.cliente, periodo=periodo).first()
+        return fila.reservado if fila else 0
+
+    def test_pendiente_reserva_su_importe(self):
+        transaccion = self.crear(monto="3000")
+        self.assertEqual(transaccion.reserva.importe, Decimal("3000"))
+        self.assertEqual((self.reservado("dia"), self.reservado("mes")), (Decimal("3000"), Decimal("3000")))
+        self.assertEqual(self.gastado(), (0, 0))
+
+    def test_sin_margen_no_se_guarda(self):
+        self.crear(monto="3000")
+        with self.assertRaises(consumo.LimiteExcedido) as error:
+            self.crear(monto="2500")
+        self.assertEqual((error.exception.periodo, error.exception.disponible), ("dia", Decimal("2000")))
+        self.assertEqual(Transaccion.objects.count(), 1)
+        self.assertEqual(self.reservado(), Decimal("3000"))
+
+    def test_las_confirmadas_cuentan_para_el_margen(self):
+        self.crear(estado="confirmada", monto="4500")
+        with self.assertRaises(consumo.LimiteExcedido):
+            self.crear(monto="600")
+        self.crear(monto="500")
+
+    def test_limite_mensual(self):
+        ClienteConsumo.objects.create(
+            cliente=self.cliente, periodo="mes", fecha=timezone.localdate().replace(day=1), total=Decimal("19000"),
+        )
+        with self.assertRaises(consumo.LimiteExcedido) as error:
+            self.crear(monto="1500")
+        self.assertEqual(error.exception.periodo, "mes")
+        self.assertEqual(self.reservado("dia"), 0)
+
+    def test_confirmar_pasa_la_reserva_al_total(self):
+        transaccion = self.crear(monto="3000")
+        transaccion.procesar(self.user)
+        self.assertFalse(ReservaLimite.objects.exists())
+        self.assertEqual(self.reservado(), 0)
+        self.assertEqual(self.gastado(), (Decimal("3000"), Decimal("3000")))
+
+    def test_cancelar_libera_la_reserva(self):
+        transaccion = self.crear(monto="3000")
+        transaccion.cancelar(self.user)
+        self.assertEqual(self.reservado(), 0)
+        self.crear(monto="5000")
+
+    def test_borrar_libera_la_reserva(self):
+        self.crear(monto="3000").delete()
+        self.assertEqual(self.reservado(), 0)
+
+    def test_liberar_vencidas(self):
+        vieja = self.crear(monto="1000")
+        nueva = self.crear(monto="2000")
+        ReservaLimite.objects.filter(transaccion=vieja).update(vence=timezone.now() - timedelta(minutes=1))
+        call_command("liberar_reservas", stdout=StringIO())
+        self.assertEqual(list(ReservaLimite.objects.values_list("transaccion_id", flat=True)), [nueva.id])
+        self.assertEqual(self.reservado(), Decimal("2000"))
+        # La transacción sigue pendiente; confirmarla ya no toca lo reservado
+        vieja.procesar(self.user)
+        self.assertEqual(self.reservado(), Decimal("2000"))
+
+    def test_confirmar_con_la_reserva_vencida_controla_el_limite(self):
+        vieja = self.crear(monto="3000")
+        ReservaLimite.objects.filter(transaccion=vieja).update(vence=timezone.now() - timedelta(minutes=1))
+        call_command("liberar_reservas", stdout=StringIO())
+        self.crear(monto="4000")
+        with self.assertRaises(consumo.LimiteExcedido):
+            vieja.procesar(self.user)
+        vieja.refresh_from_db()
+        self.assertEqual(vieja.estado, "pendiente")
+        self.assertEqual((self.gastado(), self.reservado()), ((0, 0), Decimal("4000")))
+
+    def test_crear_confirmada_sin_margen(self):
+        self.crear(monto="3000")
+        with self.assertRaises(consumo.LimiteExcedido) as error:
+            self.crear(estado="confirmada", monto="2500")
+        self.assertEqual(error.exception.disponible, Decimal("2000"))
+        self.assertEqual(Transaccion.objects.count(), 1)
+        self.crear(estado="confirmada", monto="2000")
+        self.assertEqual(self.gastado(), (Decimal("2000"), Decimal("2000")))
+
+    def test_el_disponible_descuenta_las_reservas(self):
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        self.client.force_login(self.user)
+        self.crear(estado="confirmada", monto="1000")
+        self.crear(monto="3500")
+        self.assertEqual(consumo.comprometido(self.cliente.id), (Decimal("4500"), Decimal("4500")))
+
+        data = self.client.post(reverse("verificar_limites"), {"monto": "600", "moneda": "PYG"}).json()
+        self.assertTrue(data["excede_diario"])
+        self.assertEqual(data["disponible_diario"], "500,00")
+        with self.assertRaises(consumo.LimiteExcedido):
+            self.crear(monto="600")
+
+        limites = self.client.get(reverse("operaciones")).context["limites_cliente"]
+        self.assertEqual(limites[0]["disponible_diario"], Decimal("500"))
+
+    def test_recalcular_conserva_las_reservas(self):
+        self.crear(monto="1200")
+        consumo.recalcular()
+        self.assertEqual(self.reservado(), Decimal("1200"))
+
+    def test_guardar_transaccion_responde_409(self):
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        self.client.force_login(self.user)
+        token = cotizacion_firmada.firmar(
+            moneda_origen_id=self.usd.id, moneda_destino_id=self.pyg.id, tasa_ref_id=self.tasa.id,
+            tasa_usada=Decimal("7400"), tipo="compra", monto=Decimal("6000"), ganancia=Decimal("0"),
+            descuento=Decimal("0"), cliente_id=self.cliente.id, cliente_nombre=self.cliente.nombre,
+            usuario_id=self.user.id,
+        )
+        datos = {"cotizacion_token": token, "metodo_pago_id": self.efectivo.id}
+        response = self.client.post(reverse("guardar_transaccion"), json.dumps(datos), content_type="application/json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["limite"], "dia")
+        self.assertFalse(Transaccion.objects.exists())
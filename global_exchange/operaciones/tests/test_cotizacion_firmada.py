@@ -0,0 +1,141 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from cliente_segmentacion.models import Segmentacion
+from cliente_usuario.models import Usuario_Cliente
+from clientes.models import Cliente
+from cotizaciones.models import TasaDeCambio
+from metodos_pagos.models import MetodoPago
+from monedas.models import Moneda
+from operaciones import cotizacion_firmada
+from operaciones.models import Transaccion
+from usuarios.models import CustomUser
+
+
+class CotizacionFirmadaTest(TestCase):
+    """Tests para las cotizaciones firmadas del simulador y su uso en guardar_transaccion"""
+
+    def setUp(self):
+        grupo, _ = Group.objects.get_or_create(name="Usuario Asociado")
+        self.user = CustomUser.objects.create_user(username="cotizador", password="12345")
+        self.user.groups.add(grupo)
+        segmentacion = Segmentacion.objects.create(nombre="VIP", estado="activo", descuento=10)
+        self.cliente = Cliente.objects.create(
+            nombre="Cliente Firmado", segmentacion=segmentacion, email="firmado@test.com", estado="activo",
+        )
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        self.client.login(username="cotizador", password="12345")
+        session = self.client.session
+        session["cliente_operativo_id"] = self.cliente.id
+        session.save()
+
+        self.pyg = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        self.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        self.tasa = TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=self.usd, precio_base=Decimal("7400.00"),
+            comision_compra=Decimal("50.00"), comision_venta=Decimal("100.00"),
+        )
+        self.metodo = MetodoPago.objects.create(nombre="Tarjeta", comision=Decimal("2.00"), activo=True)
+
+    def firmar(self, **cambios):
+        datos = {
+            "moneda_origen_id": self.pyg.id,
+            "moneda_destino_id": self.usd.id,
+            "tasa_ref_id": self.tasa.id,
+            "tasa_usada": Decimal("7490.00"),
+            "tipo": "compra",
+            "monto": Decimal("749000"),
+            "ganancia": Decimal("9000.00"),
+            "descuento": Decimal("10"),
+            "cliente_id": self.cliente.id,
+            "cliente_nombre": self.cliente.nombre,
+            "usuario_id": self.user.id,
+        }
+        datos.update(cambios)
+        return cotizacion_firmada.firmar(**datos)
+
+    def guardar(self, **payload):
+        return self.client.post(reverse("guardar_transaccion"), data=payload, content_type="application/json")
+
+    def test_simulador_emite_token_verificable(self):
+        response = self.client.post(
+            reverse("operaciones"),
+            {"operacion": "venta", "valor": "749000", "origen": "PYG", "destino": "USD"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        token = response.json()["cotizacion_token"]
+        datos = cotizacion_firmada.verificar(token)
+        self.assertEqual(datos["tasa_ref_id"], self.tasa.id)
+        self.assertEqual(datos["tipo"], "compra")
+        self.assertEqual(datos["monto"], Decimal("749000"))
+        self.assertEqual(datos["tasa_usada"], Decimal("7490.00"))
+        self.assertEqual(datos["cliente_id"], self.cliente.id)
+
+    def test_simulador_cambio_directo_usa_tasa_cruzada(self):
+        real = Moneda.objects.create(nombre="Real", abreviacion="BRL", estado=True)
+        TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=real, precio_base=Decimal("1400.00"),
+            comision_compra=Decimal("20.00"), comision_venta=Decimal("40.00"),
+        )
+        response = self.client.post(
+            reverse("operaciones"),
+            {"operacion": "venta", "valor": "100", "origen": "USD", "destino": "BRL"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        data = response.json()
+        # USD comprado a 7355 (descuento 10%) y BRL vendido a 1436
+        self.assertEqual(data["resultado"], 512.19)
+        datos = cotizacion_firmada.verificar(data["cotizacion_token"])
+        self.assertEqual(datos["tipo"], "cambio")
+        self.assertEqual(datos["moneda_destino_id"], real.id)
+
+    def test_guardar_usa_datos_del_token(self):
+        response = self.guardar(
+            cotizacion_token=self.firmar(), metodo_pago_id=self.metodo.id,
+            tasa_usada="1", ganancia="999999", monto="1",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["success"])
+        transaccion = Transaccion.objects.get()
+        self.assertEqual(transaccion.tasa_usada, Decimal("7490.00"))
+        self.assertEqual(transaccion.ganancia, Decimal("9000.00"))
+        self.assertEqual(transaccion.monto, Decimal("763980.00"))  # 749000 + 2% del método de pago
+        self.assertEqual(transaccion.estado, "pendiente")
+
+    def test_el_cliente_no_elige_el_estado(self):
+        response = self.guardar(cotizacion_token=self.firmar(), metodo_pago_id=self.metodo.id, estado="confirmada")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaccion.objects.get().estado, "pendiente")
+
+    def test_una_cotizacion_se_usa_una_sola_vez(self):
+        token = self.firmar()
+        self.assertEqual(self.guardar(cotizacion_token=token, metodo_pago_id=self.metodo.id).status_code, 200)
+        response = self.guardar(cotizacion_token=token, metodo_pago_id=self.metodo.id)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn("ya se usó", response.json()["error"])
+        self.assertEqual(Transaccion.objects.count(), 1)
+        # Otra cotización con los mismos datos es otra operación
+        self.assertEqual(self.guardar(cotizacion_token=self.firmar(), metodo_pago_id=self.metodo.id).status_code, 200)
+        self.assertEqual(Transaccion.objects.count(), 2)
+
+    def test_token_adulterado_es_rechazado(self):
+        token = self.firmar()
+        response = self.guardar(cotizacion_token=token[:-2] + "xx", metodo_pago_id=self.metodo.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaccion.objects.exists())
+
+    def test_token_de_otro_usuario_es_rechazado(self):
+        response = self.guardar(cotizacion_token=self.firmar(usuario_id=self.user.id + 1), metodo_pago_id=self.metodo.id)
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(COTIZACION_VALIDEZ_SEGUNDOS=60)
+    def test_token_vencido_cancela_por_cotizacion(self):
+        token = self.firmar(ahora=time.time() - 120)
+        response = self.guardar(cotizacion_token=token, metodo_pago_id=self.metodo.id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["estado"], "cancelada_cotizacion")
+        self.assertEqual(Transaccion.objects.get().estado, "cancelada_cotizacion")
@@ -0,0 +1,148 @@
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from cliente_segmentacion.models import Segmentacion
+from cliente_usuario.models import Usuario_Cliente
+from clientes.models import Cliente
+from cotizaciones.models import TasaDeCambio
+from global_exchange import idempotencia
+from metodos_pagos.models import MetodoPago
+from monedas.models import Moneda
+from operaciones import cotizacion_firmada
+from operaciones.models import Transaccion
+from usuarios.models import CustomUser
+
+
+class IdempotenciaTest(TestCase):
+    """Tests de la cabecera Idempotency-Key en guardar_transaccion y crear_pago_stripe"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="reintentos", password="12345", cedula="55667788")
+        self.user.groups.add(Group.objects.get_or_create(name="Usuario Asociado")[0])
+        segmentacion = Segmentacion.objects.create(nombre="Minorista", estado="activo", descuento=0)
+        self.cliente = Cliente.objects.create(
+            nombre="Cliente Reintentos", segmentacion=segmentacion, email="reintentos@test.com", estado="activo",
+        )
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        self.pyg = Moneda.objects.create(nombre="Guaraní", abreviacion="PYG", estado=True)
+        self.usd = Moneda.objects.create(nombre="Dólar", abreviacion="USD", estado=True)
+        self.tasa = TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=self.usd, precio_base=Decimal("7400.00"),
+        )
+        self.metodo = MetodoPago.objects.create(nombre="Tarjeta", activo=True)
+        self.client.force_login(self.user)
+
+    def cotizar(self, monto="100"):
+        return cotizacion_firmada.firmar(
+            moneda_origen_id=self.usd.id, moneda_destino_id=self.pyg.id, tasa_ref_id=self.tasa.id,
+            tasa_usada=Decimal("7400"), tipo="venta", monto=Decimal(monto), ganancia=Decimal("0"),
+            descuento=Decimal("0"), cliente_id=self.cliente.id, cliente_nombre=self.cliente.nombre,
+            usuario_id=self.user.id,
+        )
+
+    def guardar(self, clave=None, monto="100", token=None):
+        """Sin ``token`` cotiza de nuevo: cada llamada es otra operación."""
+        datos = {"cotizacion_token": token or self.cotizar(monto), "metodo_pago_id": self.metodo.id}
+        cabeceras = {"HTTP_IDEMPOTENCY_KEY": clave} if clave else {}
+        return self.client.post(
+            reverse("guardar_transaccion"), json.dumps(datos), content_type="application/json", **cabeceras,
+        )
+
+    def test_reintento_repite_la_respuesta(self):
+        token = self.cotizar()
+        primera = self.guardar("clave-1", token=token)
+        segunda = self.guardar("clave-1", token=token)
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_sin_clave_no_cambia_nada(self):
+        self.guardar()
+        self.guardar()
+        self.assertEqual(Transaccion.objects.count(), 2)
+
+    def test_claves_distintas_son_pedidos_distintos(self):
+        self.guardar("clave-1")
+        self.guardar("clave-2")
+        self.assertEqual(Transaccion.objects.count(), 2)
+
+    def test_misma_clave_con_otro_pedido(self):
+        self.guardar("clave-1")
+        response = self.guardar("clave-1", monto="200")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_pedido_en_curso(self):
+        factory = RequestFactory()
+        request = factory.post("/operaciones/guardar-transaccion/", b"{}", content_type="application/json",
+                               HTTP_IDEMPOTENCY_KEY="clave-1")
+        request.user = self.user
+        respuestas = []
+
+        @idempotencia.idempotente
+        def vista(request):
+            # Mientras se ejecuta, llega el reintento
+            respuestas.append(vista(request))
+            return JsonResponse({"success": True})
+
+        self.assertEqual(vista(request).status_code, 200)
+        self.assertEqual(respuestas[0].status_code, 409)
+
+    def test_errores_del_servidor_no_se_guardan(self):
+        llamadas = []
+
+        @idempotencia.idempotente
+        def vista(request):
+            llamadas.append(1)
+            return JsonResponse({"success": False}, status=503)
+
+        request = RequestFactory().post("/x/", b"{}", content_type="application/json", HTTP_IDEMPOTENCY_KEY="c")
+        request.user = self.user
+        vista(request)
+        vista(request)
+        self.assertEqual(len(llamadas), 2)
+
+    def test_anonimos_no_comparten_claves(self):
+        llamadas = []
+
+        @idempotencia.idempotente
+        def vista(request):
+            llamadas.append(1)
+            return JsonResponse({"pedido": len(llamadas)})
+
+        def pedido(sesion=None):
+            request = RequestFactory().post("/x/", b"{}", content_type="application/json", HTTP_IDEMPOTENCY_KEY="c")
+            request.user = AnonymousUser()
+            request.session = sesion or SessionStore()
+            return json.loads(vista(request).content)
+
+        sesion = SessionStore()
+        sesion.create()
+        otra = SessionStore()
+        otra.create()
+        self.assertEqual(pedido(sesion), {"pedido": 1})
+        self.assertEqual(pedido(sesion), {"pedido": 1})  # reintento de la misma sesión
+        self.assertEqual(pedido(otra), {"pedido": 2})
+        # Sin sesión no hay a quién atribuirle la clave: no se guarda ni se repite
+        self.assertEqual(pedido(), {"pedido": 3})
+        self.assertEqual(pedido(), {"pedido": 4})
+
+    @mock.patch("operaciones.views.stripe.PaymentIntent.create")
+    def test_stripe_no_crea_dos_payment_intents(self, crear):
+        crear.return_value = mock.Mock(client_secret="pi_123_secret")
+        url = reverse("crear_pago_stripe")
+        for _ in range(2):
+            response = self.client.post(url, {"total": "10000"}, HTTP_IDEMPOTENCY_KEY="pago-1")
+            self.assertEqual(response.json(), {"client_secret": "pi_123_secret"})
+        crear.assert_called_once()
+        self.assertEqual(crear.call_args.kwargs["idempotency_key"], f"{self.user.pk}:pago-1")
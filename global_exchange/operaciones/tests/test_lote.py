@@ -0,0 +1,206 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from cliente_usuario.models import Usuario_Cliente
+from clientes.models import Cliente
+from cotizaciones.models import TasaDeCambio
+from limite_moneda.models import LimiteTransaccion
+from monedas.models import Moneda
+from operaciones import consumo
+from operaciones.models import ClienteConsumo, ReservaLimite, Transaccion
+from operaciones.tests.test_consumo import ConsumoTestBase
+from operaciones.views import LOTE_MAXIMO
+
+
+class GuardarTransaccionesLoteTest(ConsumoTestBase):
+    """Tests del guardado de transacciones en lote (guardar_transacciones_lote)"""
+
+    def setUp(self):
+        super().setUp()
+        Usuario_Cliente.objects.create(id_usuario=self.user, id_cliente=self.cliente)
+        self.client.login(username="consumo", password="12345")
+        self.url = reverse("guardar_transacciones_lote")
+        TasaDeCambio.objects.filter(pk=self.tasa.pk).update(comision_venta=Decimal("100"), comision_compra=Decimal("50"))
+
+    def orden(self, **cambios):
+        # Compra: el cliente entrega guaraníes por dólares (tasa PYG → USD)
+        datos = {
+            "monto": "7500",
+            "tipo": "compra",
+            "moneda_origen_id": self.pyg.id,
+            "moneda_destino_id": self.usd.id,
+            "tasa_ref_id": self.tasa.id,
+            "cliente_id": self.cliente.id,
+            "metodo_pago_id": self.efectivo.id,
+        }
+        datos.update(cambios)
+        return datos
+
+    def enviar(self, ordenes, **extra):
+        return self.client.post(
+            self.url, data=json.dumps({"transacciones": ordenes}), content_type="application/json", **extra,
+        )
+
+    def test_guarda_todas_y_responde_por_orden(self):
+        venta = self.orden(monto="10", tipo="venta", moneda_origen_id=self.usd.id, moneda_destino_id=self.pyg.id)
+        response = self.enviar([self.orden(), venta])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["guardadas"], data["rechazadas"]), (2, 0))
+        self.assertEqual([r["indice"] for r in data["resultados"]], [0, 1])
+        self.assertTrue(all(r["success"] for r in data["resultados"]))
+        guardadas = Transaccion.objects.filter(id__in=[r["id"] for r in data["resultados"]])
+        self.assertEqual(guardadas.count(), 2)
+        self.assertTrue(all(t.usuario_id == self.user.id for t in guardadas))
+        self.assertEqual(ReservaLimite.objects.count(), 0)
+
+    def test_tasa_ganancia_y_estado_los_pone_el_servidor(self):
+        orden = self.orden(estado="confirmada", tasa_usada="1", ganancia="999999")
+        venta = self.orden(
+            monto="10", tipo="venta", moneda_origen_id=self.usd.id, moneda_destino_id=self.pyg.id,
+            estado="confirmada", tasa_usada="1", ganancia="999999",
+        )
+        resultados = self.enviar([orden, venta]).json()["resultados"]
+        self.assertEqual([r["estado"] for r in resultados], ["pendiente", "pendiente"])
+        compra, venta = (Transaccion.objects.get(pk=r["id"]) for r in resultados)
+        self.assertEqual((compra.tasa_usada, compra.ganancia), (Decimal("7500"), Decimal("100")))
+        self.assertEqual((venta.tasa_usada, venta.ganancia), (Decimal("7350"), Decimal("500")))
+        self.assertEqual(self.gastado(), (0, 0))
+
+    def test_rechaza_tasas_de_otro_par_o_no_vigentes(self):
+        eur = Moneda.objects.create(nombre="Euro", abreviacion="EUR", estado=True)
+        inactiva = TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=eur, precio_base=Decimal("8000"), estado=False,
+        )
+        programada = TasaDeCambio.objects.create(
+            moneda_origen=self.pyg, moneda_destino=eur, precio_base=Decimal("8000"),
+            vigencia=timezone.now() + timedelta(days=1),
+        )
+        response = self.enviar([
+            self.orden(moneda_destino_id=eur.id),
+            self.orden(moneda_origen_id=self.usd.id, moneda_destino_id=self.pyg.id),
+            self.orden(moneda_destino_id=eur.id, tasa_ref_id=inactiva.id),
+            self.orden(moneda_destino_id=eur.id, tasa_ref_id=programada.id),
+            self.orden(tipo="cambio", moneda_origen_id=eur.id),
+        ])
+        errores = [r["error"] for r in response.json()["resultados"]]
+        self.assertEqual(errores[:2], ["La tasa de cambio no corresponde al par de monedas"] * 2)
+        self.assertEqual(errores[2:4], ["La tasa de cambio no está vigente"] * 2)
+        self.assertIn("cotización firmada", errores[4])
+        self.assertFalse(Transaccion.objects.exists())
+
+    def test_rechaza_una_tasa_reemplazada(self):
+        anterior = self.tasa
+        TasaDeCambio.objects.filter(pk=anterior.pk).update(vigencia=timezone.now() - timedelta(hours=1))
+        TasaDeCambio.objects.create(moneda_origen=self.pyg, moneda_destino=self.usd, precio_base=Decimal("7600"))
+        self.assertTrue(TasaDeCambio.objects.get(pk=anterior.pk).estado)
+        resultados = self.enviar([self.orden(tasa_ref_id=anterior.id)]).json()["resultados"]
+        self.assertEqual(resultados[0]["error"], "La tasa de cambio no está vigente")
+        self.assertFalse(Transaccion.objects.exists())
+
+    def test_ordenes_invalidas_no_impiden_las_demas(self):
+        otro = Cliente.objects.create(
+            nombre="Ajeno", segmentacion=self.cliente.segmentacion, email="ajeno@test.com", estado="activo",
+        )
+        response = self.enviar([
+            self.orden(moneda_origen_id=999999),
+            self.orden(cliente_id=otro.id),
+            self.orden(tasa_ref_id=None),
+            self.orden(monto="abc"),
+            self.orden(tipo="regalo"),
+            self.orden(monto="1e30"),
+            self.orden(),
+        ])
+        resultados = response.json()["resultados"]
+        self.assertEqual(resultados[0]["error"], "Moneda no encontrada")
+        self.assertEqual(resultados[1]["error"], "El cliente no está asociado al usuario")
+        self.assertIn("Faltan campos obligatorios", resultados[2]["error"])
+        self.assertEqual(resultados[3]["error"], "Monto inválido")
+        self.assertEqual(resultados[4]["error"], "Tipo de operación inválido")
+        self.assertEqual(resultados[5]["error"], "Monto inválido")
+        self.assertTrue(resultados[6]["success"])
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_consultas_constantes_segun_el_tamano_del_lote(self):
+        def consultas(cantidad):
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.enviar([self.orden(monto="1") for _ in range(cantidad)])
+            self.assertEqual(response.json()["guardadas"], cantidad)
+            return len(capturadas)
+
+        self.assertEqual(consultas(3), consultas(40))
+
+    def test_lote_vacio_o_demasiado_grande(self):
+        self.assertEqual(self.enviar([]).status_code, 400)
+        self.assertEqual(self.enviar([self.orden()] * (LOTE_MAXIMO + 1)).status_code, 400)
+        self.assertEqual(Transaccion.objects.count(), 0)
+
+    def test_reintento_con_idempotency_key_no_duplica(self):
+        ordenes = [self.orden(), self.orden(monto="5")]
+        primera = self.enviar(ordenes, HTTP_IDEMPOTENCY_KEY="cierre-1")
+        segunda = self.enviar(ordenes, HTTP_IDEMPOTENCY_KEY="cierre-1")
+        self.assertEqual(segunda["Idempotent-Replayed"], "true")
+        self.assertEqual(primera.json(), segunda.json())
+        self.assertEqual(Transaccion.objects.count(), 2)
+
+
+class GuardarLoteLimitesTest(ConsumoTestBase):
+    """Tests de consumo.guardar_lote con límites configurados"""
+
+    def setUp(self):
+        super().setUp()
+        LimiteTransaccion.objects.create(
+            limite_diario=Decimal("5000"), limite_mensual=Decimal("20000"), moneda=self.pyg,
+        )
+
+    def nueva(self, monto, estado="pendiente"):
+        return Transaccion(
+            usuario=self.user, cliente=self.cliente, monto=Decimal(monto), tipo="compra", estado=estado,
+            moneda_origen=self.usd, moneda_destino=self.pyg, tasa_usada=Decimal("7400"),
+            tasa_ref=self.tasa, metodo_pago=self.efectivo,
+        )
+
+    def test_reserva_en_orden_y_rechaza_las_que_no_entran(self):
+        self.crear(monto="1000")
+        guardadas, rechazadas = consumo.guardar_lote([
+            self.nueva("2500"), self.nueva("2000"), self.nueva("1500"), self.nueva("500"),
+        ])
+        self.assertEqual([t.monto for t in guardadas], [Decimal("2500"), Decimal("1500")])
+        self.assertEqual(set(rechazadas), {1, 3})
+        self.assertEqual((rechazadas[1].periodo, rechazadas[1].disponible), ("dia", Decimal("1500")))
+        self.assertEqual(ReservaLimite.objects.count(), 3)
+        fila = ClienteConsumo.objects.get(cliente=self.cliente, periodo="dia")
+        self.assertEqual(fila.reservado, Decimal("5000"))
+
+    def test_confirmadas_suman_al_total_y_cuentan_para_el_margen(self):
+        guardadas, rechazadas = consumo.guardar_lote([
+            self.nueva("4000", estado="confirmada"), self.nueva("1500"),
+        ])
+        self.assertEqual(len(guardadas), 1)
+        self.assertEqual(list(rechazadas), [1])
+        self.assertEqual(self.gastado(), (Decimal("4000"), Decimal("4000")))
+
+    def test_confirmadas_sin_margen_no_se_insertan(self):
+        self.crear(monto="3000")
+        guardadas, rechazadas = consumo.guardar_lote([
+            self.nueva("2500", estado="confirmada"), self.nueva("2000", estado="confirmada"),
+        ])
+        self.assertEqual([t.monto for t in guardadas], [Decimal("2000")])
+        self.assertEqual((rechazadas[0].periodo, rechazadas[0].disponible), ("dia", Decimal("2000")))
+        self.assertEqual(self.gastado(), (Decimal("2000"), Decimal("2000")))
+
+    def test_queda_igual_que_recalcular(self):
+        guardadas, _ = consumo.guardar_lote([
+            self.nueva("1000"), self.nueva("700", estado="confirmada"), self.nueva("300"),
+        ])
+        Transaccion.objects.get(pk=guardadas[0].pk).procesar(self.user)
+        antes = sorted(ClienteConsumo.objects.values_list("periodo", "total", "reservado"))
+        consumo.recalcular()
+        self.assertEqual(sorted(ClienteConsumo.objects.values_list("periodo", "total", "reservado")), antes)
+        self.assertEqual(self.gastado(), (Decimal("1700"), Decimal("1700")))
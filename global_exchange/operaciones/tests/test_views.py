@@ -1,6 +1,8 @@
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from cliente_usuario.models import Usuario_Cliente
 from usuarios.models import CustomUser
 from cliente_segmentacion.models import Segmentacion
@@ -8,6 +10,7 @@ from clientes.models import Cliente
 from cliente_usuario.models import Usuario_Cliente  # ← Importar este modelo
 from monedas.models import Moneda
 from cotizaciones.models import TasaDeCambio
+from operaciones import cotizacion_firmada
 from operaciones.models import Transaccion
 from metodos_pagos.models import MetodoPago  # ← AGREGAR IMPORT
 from decimal import Decimal
@@ -81,25 +84,98 @@ class OperacionesViewsTest(TestCase):
         self.assertIn("resultado", data)
         self.assertIn("ganancia_total", data)
 
+    def test_cotizar_operacion(self):
+        TasaDeCambio.objects.create(
+            moneda_origen=self.moneda_pyg, moneda_destino=self.moneda_usd, precio_base=Decimal("7400.00"),
+            comision_compra=Decimal("0.00"), comision_venta=Decimal("0.00"),
+        )
+        response = self.client.post(
+            reverse("cotizar_operacion"),
+            {"operacion": "venta", "valor": "7400", "origen": "PYG", "destino": "USD"},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["resultado"], 1.0)
+        self.assertEqual((data["segmento"], data["descuento"]), ("Segmento Test", 10.0))
+        self.assertTrue(data["cotizacion_token"])
+
+    def test_cotizar_operacion_consultas(self):
+        """Sólo consulta clientes y monedas: nada de transacciones, límites ni medios."""
+        url = reverse("cotizar_operacion")
+        datos = {"operacion": "venta", "valor": "1000", "origen": "PYG", "destino": "USD"}
+        self.client.post(url, datos)  # libro de tasas en memoria
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(url, datos)
+        # Sesión, usuario y permisos son del middleware; el libro de tasas
+        # se reconstruye en cada request sólo dentro de la transacción del test
+        ajenas = ("django_session", "auth_", "usuarios_customuser", "roles_permisos", "cotizaciones_tasadecambio")
+        tablas = [q["sql"] for q in consultas if not any(tabla in q["sql"] for tabla in ajenas)]
+        self.assertLessEqual(len(tablas), 2, tablas)
+        for tabla in ("operaciones_transaccion", "limite_moneda", "medio_acreditacion"):
+            self.assertFalse([sql for sql in tablas if tabla in sql])
+
+    def test_cotizar_operacion_valida_monedas(self):
+        response = self.client.post(
+            reverse("cotizar_operacion"),
+            {"operacion": "venta", "valor": "1000", "origen": "USD", "destino": "USD"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cotizar_operacion_monto_demasiado_grande(self):
+        TasaDeCambio.objects.create(
+            moneda_origen=self.moneda_pyg, moneda_destino=self.moneda_usd, precio_base=Decimal("7400.00"),
+            comision_compra=Decimal("0.00"), comision_venta=Decimal("0.00"),
+        )
+        for operacion, origen, destino in (("venta", "PYG", "USD"), ("compra", "USD", "PYG")):
+            response = self.client.post(
+                reverse("cotizar_operacion"),
+                {"operacion": operacion, "valor": "1e30", "origen": origen, "destino": destino},
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["resultado"], "Monto inválido")
+
+    def test_cotizar_operacion_solo_post(self):
+        self.assertEqual(self.client.get(reverse("cotizar_operacion")).status_code, 405)
+
     def test_guardar_transaccion(self):
         url = reverse("guardar_transaccion")
+        token = cotizacion_firmada.firmar(
+            moneda_origen_id=self.moneda_usd.id,
+            moneda_destino_id=self.moneda_pyg.id,
+            tasa_ref_id=self.tasa.id,
+            tasa_usada=Decimal("7400"),
+            tipo="venta",
+            monto=Decimal("100"),
+            ganancia=Decimal("0"),
+            descuento=Decimal("0"),
+            cliente_id=self.cliente.id,
+            cliente_nombre=self.cliente.nombre,
+            usuario_id=self.user.id,
+        )
+        payload = {"cotizacion_token": token, "metodo_pago_id": self.metodo_pago.id}
+        response = self.client.post(url, data=payload, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["success"])
+        self.assertEqual(Transaccion.objects.count(), 1)
+
+    def test_guardar_transaccion_sin_token(self):
+        """Sin cotización firmada no se guarda lo que manda el navegador"""
         payload = {
             "monto": "100",
             "tipo": "compra",
-            "estado": "pendiente",
+            "estado": "confirmada",
             "moneda_origen_id": self.moneda_pyg.id,
             "moneda_destino_id": self.moneda_usd.id,
-            "tasa_usada": "7300",
+            "tasa_usada": "1",
             "tasa_ref_id": self.tasa.id,
             "cliente_id": self.cliente.id,
-            "metodo_pago_id": self.metodo_pago.id  # ← AGREGAR ESTE CAMPO
+            "metodo_pago_id": self.metodo_pago.id,
         }
-        response = self.client.post(url, data=payload, content_type="application/json")
-        self.assertEqual(response.status_code, 200)
-        data = response.json()
-        self.assertTrue(data["success"])
-        self.assertEqual(Transaccion.objects.count(), 1)
-        
+        response = self.client.post(reverse("guardar_transaccion"), data=payload, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaccion.objects.exists())
+
     @patch("operaciones.views.send_mail")  # 👈 parcheamos send_mail en la vista
     def test_enviar_pin_envia_email_y_guarda_en_sesion(self, mock_send_mail):
         url = reverse("enviar_pin")
@@ -4,11 +4,13 @@ from medio_acreditacion.views import medio_acreditacion_dinamico
 
 urlpatterns = [
     path("", views.simulador_operaciones, name="operaciones"),
+    path("cotizar/", views.cotizar_operacion, name="cotizar_operacion"),
     path("verificar/", views.verificar_tasa, name="verificar_tasa"),
     path("horaservidor/", views.hora_servidor, name="hora_servidor"),
     path("obtener-metodos/", views.obtener_metodos_pago, name="obtener_metodos_pago"),
     path("guardar-metodo/", views.guardar_metodo_pago, name="guardar_metodo_pago"),
     path("guardar-transaccion/", views.guardar_transaccion, name="guardar_transaccion"),
+    path("guardar-transacciones/", views.guardar_transacciones_lote, name="guardar_transacciones_lote"),
     path('actualizar-estado-transaccion/', views.actualizar_estado_transaccion, name='actualizar_estado_transaccion'),
     path('verificar-limites/', views.verificar_limites, name='verificar_limites'),
     path("enviar-pin/", views.enviar_pin, name="enviar_pin"),
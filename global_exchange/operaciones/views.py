@@ -11,10 +11,11 @@ Nota:
 Mantiene la lógica existente; se agregan docstrings y comentarios aclaratorios.
 """
 import os
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
 
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from django.shortcuts import render
+from django.db import IntegrityError
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from datetime import datetime
@@ -22,6 +23,10 @@ from medio_acreditacion.models import MedioAcreditacion, TipoEntidadFinanciera
 from operaciones.models import Transaccion
 from monedas.models import Moneda
 from cotizaciones.models import TasaDeCambio
+from cotizaciones.cotizador import MONEDA_BASE, MONTO_MAXIMO, calcular, cotizar, cotizar_tasa, redondear
+from cotizaciones.cruzadas import calcular_cruce, cruzar
+from cotizaciones.libro_tasas import obtener_libro
+from cotizaciones.velas import serie_grafico
 from clientes.models import Cliente
 from cliente_usuario.models import Usuario_Cliente
 from django.utils.dateparse import parse_datetime
@@ -34,11 +39,13 @@ import json
 from django.utils import timezone
 from django.http import JsonResponse
 from limite_moneda.models import LimiteTransaccion
-from django.db.models import Sum, Case, When, F, DecimalField
+from . import consumo, cotizacion_firmada
 import random
 from django.core.mail import send_mail
 import datetime
 from roles_permisos.middleware import require_permission
+from global_exchange import idempotencia
+from global_exchange.idempotencia import idempotente
 
 @login_required
 @require_permission('add_transaccion')
@@ -55,6 +62,10 @@ def simulador_operaciones(request):
     :return: Página renderizada con contexto de simulación o JsonResponse si es AJAX.
     :rtype: HttpResponse | JsonResponse
     """
+    # El cálculo dinámico es de cotizar_operacion; páginas abiertas antes del
+    # cambio todavía lo piden acá
+    if request.method == "POST" and request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return _responder_cotizacion(request)
 
     # === Monedas activas desde la BD ===
     monedas = list(Moneda.objects.filter(estado=True).values("id", "abreviacion", "nombre"))
@@ -82,45 +93,35 @@ def simulador_operaciones(request):
 
     
 
-    # === Tasas de cambio activas (ordenadas: agrupadas por destino y descendente por vigencia) ===
-    tasas = (
-        TasaDeCambio.objects
-        .filter(estado=True)
-        .select_related("moneda_origen", "moneda_destino")
-        .order_by("moneda_destino", "-vigencia")
-    )
+    # === Tasas de cambio activas (libro de tasas en memoria, el más reciente al final) ===
+    libro = obtener_libro()
 
     metodos_pago = list(MetodoPago.objects.filter(activo=True).values("id", "nombre", "descripcion", "comision"))
     for m in metodos_pago:
         m['comision'] = float(m['comision']) if m['comision'] is not None else 0
-    # Reorganizar tasas
-    data_por_moneda = {}
-    for tasa in tasas:
-        abrev = tasa.moneda_destino.abreviacion
-        if abrev not in data_por_moneda:
-            data_por_moneda[abrev] = []
-        # Insertar al inicio para mantener el más reciente al final (coherente con uso registros[-1])
-        data_por_moneda[abrev].insert(0, {
-            "id": tasa.id,
-            "fecha": tasa.vigencia.strftime("%d %b"),
-            "comision_compra": float(tasa.comision_compra),
-            "comision_venta": float(tasa.comision_venta),
-            "precio_base": float(tasa.precio_base)
-        })
+    # Reorganizar tasas (cierres de las últimas velas diarias; el último es la cotización vigente)
+    data_por_moneda = {
+        abrev: [
+            {
+                "id": cot.tasa_id,
+                "fecha": cot.vigencia.strftime("%d %b"),
+                "comision_compra": float(cot.comision_compra),
+                "comision_venta": float(cot.comision_venta),
+                "precio_base": float(cot.precio_base)
+            }
+            for cot in serie
+        ]
+        for abrev, serie in serie_grafico(libro).items()
+    }
         
     print("data_por_monedaaaaaaaaaa:", data_por_moneda,flush=True)
-    # Comisiones y variables
-    COMISION_VTA = 0
-    COMISION_COM = 0
 
     # === Segmentación según usuario ===
-    descuento = 0
-    segmento_nombre = "Sin segmentación"
     clientes_asociados, cliente_operativo, email_cliente_operativo = obtener_clientes_usuario(request.user, request)
+    descuento, segmento_nombre = segmento_cliente(cliente_operativo)
 
-    if cliente_operativo and cliente_operativo.segmentacion and cliente_operativo.segmentacion.estado == "activo":
-        descuento = float(cliente_operativo.segmentacion.descuento or 0)
-        segmento_nombre = cliente_operativo.segmentacion.nombre
+    # Cotizaciones de todas las monedas para el descuento del cliente (una sola pasada)
+    cotizaciones = cotizar(libro, descuento)
 
     # Variables iniciales de operación
     resultado = ""
@@ -134,120 +135,50 @@ def simulador_operaciones(request):
     TC_COMP = 0
     PB_MONEDA = 0
     TASA_REF_ID =None
-    resultado_sin_desc=0
     limites = LimiteTransaccion.objects.all()  # tus límites generales por moneda
 
     hoy = localtime(now()).date()
     #hoy=datetime.date(2025, 10, 5)
-    inicio_mes = hoy.replace(day=1)
 
     limites_disponibles = []
 
 
 
     # === Determinar tasas por defecto para mostrar en GET ===
-    tasa_default = None
-    for abrev, registros in data_por_moneda.items():
-        if abrev != "PYG" and registros:
-            tasa_default = registros[-1]  # último = más reciente según construcción
-            break
-    
-    print("tasa_default:", tasa_default,flush=True)
-
-    if tasa_default:
-        COMISION_VTA = tasa_default.get("comision_venta", 0)
-        COMISION_COM = tasa_default.get("comision_compra", 0)
-        # antes usabas venta/compra según operacion, ahora usamos precio_base siempre
-        PB_MONEDA = tasa_default.get("precio_base", 0)
-        #PB_MONEDA = tasa_default["venta"] if operacion == "venta" else tasa_default["compra"]
-        TASA_REF_ID = tasa_default["id"]
-
-        TC_VTA = PB_MONEDA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-        TC_COMP = PB_MONEDA - (COMISION_COM - (COMISION_COM * descuento / 100))
-        print("PB_MONEDA de if tasa_default:",PB_MONEDA, flush=True)
+    cotizacion = next((c for abrev, c in cotizaciones.items() if abrev != "PYG"), None)
+    print("cotizacion por defecto:", cotizacion,flush=True)
+
+    if cotizacion:
+        PB_MONEDA = float(cotizacion.precio_base)
+        TASA_REF_ID = cotizacion.tasa_id
+        TC_VTA = float(cotizacion.venta)
+        TC_COMP = float(cotizacion.compra)
         print("TC_VTA de if tasa_default:",TC_VTA, flush=True)
         print("TC_COMP de if tasa_default:",TC_COMP, flush=True)
-        print("COMISION_VTA de if tasa_default:",COMISION_VTA, flush=True)
-        print("COMISION_COM de if tasa_default:",COMISION_COM, flush=True)
-    else:
-        TC_VTA = 0
-        TC_COMP = 0
 
-    print("TC_VTA de simulacion de operaciones:",TC_VTA, flush=True)
-    print("TC_COMP de simulacion de operaciones:",TC_COMP ,flush=True)   
-
-    # Procesar cálculo (AJAX / POST)
+    # Envío del formulario sin JavaScript: se muestra el resultado en la página
+    # (el cálculo mientras se escribe lo hace cotizar_operacion)
     if request.method == "POST":
         valor_input = request.POST.get("valor", "").strip()
-        operacion = request.POST.get("operacion")
         origen = request.POST.get("origen", "")
         destino = request.POST.get("destino", "")
+        datos, error = _cotizar_operacion(
+            request, libro, descuento, cliente_operativo,
+            valor_input, request.POST.get("operacion"), origen, destino,
+        )
+        if error:
+            return JsonResponse({"error": error}, status=400)
+        operacion = datos["operacion"]
+        moneda_seleccionada = datos["moneda_seleccionada"]
+        resultado = datos["resultado"]
+        ganancia_total = datos["ganancia_total"]
+        cotizacion = datos["cotizacion"]
+        if cotizacion:
+            PB_MONEDA = float(cotizacion.precio_base)
+            TASA_REF_ID = cotizacion.tasa_id
+            TC_VTA = float(cotizacion.venta)
+            TC_COMP = float(cotizacion.compra)
 
-        # Validaciones básicas
-        if origen == destino:
-            return JsonResponse({"error": "La moneda de origen y destino no puede ser la misma."}, status=400)
-        if operacion == "venta" and destino == "PYG":
-            return JsonResponse({"error": "No puedes Comprar hacia Guaraní."}, status=400)
-        if operacion == "compra" and origen == "PYG":
-            return JsonResponse({"error": "No puedes Vender usando Guaraní como moneda de origen."}, status=400)
-
-        # Selección según tipo de operación
-        moneda_seleccionada = destino if operacion == "venta" else origen
-
-        try:
-            valor = float(valor_input)
-            if valor <= 0:
-                resultado = "Monto inválido"
-            else:
-                registros = data_por_moneda.get(moneda_seleccionada, [])
-                if not registros:
-                    resultado = "No hay cotización disponible"
-                    ganancia_total = 0
-                else:
-                    ultimo = registros[-1]
-                    COMISION_VTA = ultimo.get("comision_venta", 0)
-                    COMISION_COM = ultimo.get("comision_compra", 0)
-                    # ahora leemos precio_base directamente
-                    PB_MONEDA = tasa_default.get("precio_base", 0)
-                    #PB_MONEDA = ultimo["venta"] if operacion == "venta" else ultimo["compra"]
-                    TASA_REF_ID = ultimo["id"]
-                    print("entra en el else de simulacion de operaciones:", flush=True)
-                    print("PB_MONEDA del else:",PB_MONEDA, flush=True)
-                    # Cálculos:
-                    if operacion == "venta":
-                        # Cliente entrega PYG, convertimos a moneda extranjera
-                        TC_VTA = PB_MONEDA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-                        TC_VTA_SIN_DESC = PB_MONEDA + COMISION_VTA  # sin beneficio
-                        resultado_sin_desc = round(valor / TC_VTA_SIN_DESC, 2)
-                        resultado = round(valor / TC_VTA, 2)
-                        ganancia_total = round(valor - (resultado * PB_MONEDA), 2)
-                        print("ganancia_total 244",ganancia_total,flush=True)
-                    else:
-                        # Cliente entrega moneda extranjera, recibe PYG
-                        TC_COMP = PB_MONEDA - (COMISION_COM - (COMISION_COM * descuento / 100))
-                        TC_COMP_SIN_DESC = PB_MONEDA - COMISION_COM  # sin beneficio
-                        resultado_sin_desc = round(valor * TC_COMP_SIN_DESC, 2)
-                        resultado = round(valor * TC_COMP, 2)
-                        ganancia_total = round(valor * (COMISION_COM * (1 - descuento / 100)), 2)
-        except ValueError:
-            resultado = "Monto inválido"
-
-    # Determinar tasa usada para respuesta
-    tasa_usada = TC_VTA if operacion == "venta" else TC_COMP
-    # Respuesta AJAX (cálculo dinámico)
-    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        # 'ultimo' puede no existir si nunca hubo registros
-        fecha_tasa = locals().get("ultimo", {}).get("fecha", "")
-        print("ganancia_total 261",ganancia_total,flush=True)
-        return JsonResponse({
-            "resultado": resultado,
-            "resultado_sin_desc": resultado_sin_desc,  # sin descuento
-            "ganancia_total": ganancia_total,
-            "segmento": segmento_nombre,
-            "descuento": descuento,
-            "tasa": tasa_usada,
-            "fecha_tasa": fecha_tasa
-        })
     print("TC_VTA: ", TC_VTA,flush=True)
     print("clientes_asociados: ",clientes_asociados,flush=True)
     print("cliente_operativo: ",cliente_operativo,flush=True)
@@ -255,42 +186,11 @@ def simulador_operaciones(request):
     print("TC_COMP222: ",TC_COMP,flush=True)
     print("ganancia 2744: ",ganancia_total,flush=True)
 
-    for limite in limites:
-
-        # Filtrar todas las transacciones de esos usuarios
-        transacciones_validas = Transaccion.objects.filter(
-            estado__in=["confirmada"],
-            cliente=cliente_operativo.id
-        )
-        print("transacciones_validas: ",transacciones_validas,flush=True)
-        print("Cliente Operativo id: ", cliente_operativo.id, flush=True)
-        
-        # Gastado hoy (si es venta: monto * tasa_usada)
-        gasto_diario = transacciones_validas.filter(
-            fecha__date=hoy
-        ).aggregate(
-            total=Sum(
-                Case(
-                    When(tipo__iexact='venta', then=F('monto') * F('tasa_usada')),
-                    default=F('monto'),
-                    output_field=DecimalField()
-                )
-            )
-        )["total"] or 0
-
-        # Gastado en el mes (si es venta: monto * tasa_usada)
-        gasto_mensual = transacciones_validas.filter(
-            fecha__date__gte=inicio_mes
-        ).aggregate(
-            total=Sum(
-                Case(
-                    When(tipo__iexact='venta', then=F('monto') * F('tasa_usada')),
-                    default=F('monto'),
-                    output_field=DecimalField()
-                )
-            )
-        )["total"] or 0
+    # Gasto confirmado más reservas vigentes del cliente: el margen que
+    # consumo.reservar va a dejar usar (libro de consumo, una lectura por clave)
+    gasto_diario, gasto_mensual = consumo.comprometido(cliente_operativo.id, hoy) if cliente_operativo else (0, 0)
 
+    for limite in limites:
         limites_disponibles.append({
             "limite": limite,
             "gasto_diario": gasto_diario,
@@ -358,6 +258,155 @@ def simulador_operaciones(request):
     return render(request, 'operaciones/conversorReal.html', context)
 
 
+def segmento_cliente(cliente):
+    """
+    Descuento y nombre del segmento activo del cliente.
+
+    :param cliente: Cliente operativo (con ``segmentacion`` cargada) o ``None``.
+    :type cliente: Cliente | None
+    :return: Tupla (descuento, nombre del segmento).
+    :rtype: tuple[float, str]
+    """
+    if cliente and cliente.segmentacion and cliente.segmentacion.estado == "activo":
+        return float(cliente.segmentacion.descuento or 0), cliente.segmentacion.nombre
+    return 0, "Sin segmentación"
+
+
+def _cotizar_operacion(request, libro, descuento, cliente_operativo, valor_input, operacion, origen, destino):
+    """
+    Calcula una operación con el libro de tasas en memoria.
+
+    Sólo consulta la base para firmar el token (ids de las monedas).
+
+    :return: Tupla (datos, error): ``error`` es el mensaje si la operación no
+        es válida; ``datos`` tiene el resultado, la tasa usada y el token.
+    :rtype: tuple[dict | None, str | None]
+    """
+    # Validaciones básicas
+    if origen == destino:
+        return None, "La moneda de origen y destino no puede ser la misma."
+    if operacion == "venta" and destino == "PYG":
+        return None, "No puedes Comprar hacia Guaraní."
+    if operacion == "compra" and origen == "PYG":
+        return None, "No puedes Vender usando Guaraní como moneda de origen."
+    # Sin guaraní en ningún lado es un cambio directo (tasa cruzada vía PYG)
+    if origen != "PYG" and destino != "PYG":
+        operacion = "cambio"
+
+    # Selección según tipo de operación
+    moneda_seleccionada = destino if operacion in ("venta", "cambio") else origen
+    datos = {
+        "operacion": operacion,
+        "moneda_seleccionada": moneda_seleccionada,
+        "cotizacion": None,
+        "resultado": "",
+        "resultado_sin_desc": 0,
+        "ganancia_total": 0,
+        "tasa": 0,
+        "fecha_tasa": "",
+        "cotizacion_token": "",
+    }
+
+    try:
+        valor = Decimal(valor_input)
+    except InvalidOperation:
+        valor = None
+
+    if valor is None or not valor.is_finite() or valor <= 0 or valor > MONTO_MAXIMO:
+        datos["resultado"] = "Monto inválido"
+        return datos, None
+
+    cotizacion = cotizar(libro, descuento).get(moneda_seleccionada)
+    try:
+        if operacion == "cambio":
+            cruce = cruzar(libro, origen, destino, descuento)
+            calculo = calcular_cruce(cruce, valor) if cruce and cotizacion else None
+        else:
+            calculo = calcular(cotizacion, operacion, valor) if cotizacion else None
+    except InvalidOperation:
+        datos["resultado"] = "Monto inválido"
+        return datos, None
+    if calculo is None:
+        datos["resultado"] = "No hay cotización disponible"
+        return datos, None
+
+    # Se cotiza siempre con el precio base de la moneda seleccionada
+    datos.update(
+        cotizacion=cotizacion,
+        resultado=float(calculo.resultado),
+        resultado_sin_desc=float(calculo.resultado_sin_desc),
+        ganancia_total=float(calculo.ganancia),
+        tasa=float(calculo.tasa),
+        fecha_tasa=(cruce if operacion == "cambio" else cotizacion).vigencia.strftime("%d %b"),
+    )
+
+    # Token firmado con la cotización: guardar_transaccion lo verifica
+    # en lugar de confiar en la tasa/ganancia que manda el navegador
+    if cliente_operativo:
+        ids_monedas = dict(
+            Moneda.objects.filter(estado=True, abreviacion__in=(origen, destino)).values_list("abreviacion", "id")
+        )
+        if origen in ids_monedas and destino in ids_monedas:
+            datos["cotizacion_token"] = cotizacion_firmada.firmar(
+                moneda_origen_id=ids_monedas[origen],
+                moneda_destino_id=ids_monedas[destino],
+                tasa_ref_id=cotizacion.tasa_id,
+                tasa_usada=calculo.tasa,
+                tipo={"venta": "compra", "compra": "venta"}.get(operacion, operacion),
+                monto=valor,
+                ganancia=calculo.ganancia,
+                descuento=cotizacion.descuento,
+                cliente_id=cliente_operativo.id,
+                cliente_nombre=cliente_operativo.nombre,
+                usuario_id=request.user.id,
+            )
+    return datos, None
+
+
+def _responder_cotizacion(request):
+    _, cliente_operativo, _ = obtener_clientes_usuario(request.user, request)
+    descuento, segmento_nombre = segmento_cliente(cliente_operativo)
+    libro = obtener_libro()
+    datos, error = _cotizar_operacion(
+        request, libro, descuento, cliente_operativo,
+        request.POST.get("valor", "").strip(), request.POST.get("operacion"),
+        request.POST.get("origen", ""), request.POST.get("destino", ""),
+    )
+    if error:
+        return JsonResponse({"error": error}, status=400)
+    return JsonResponse({
+        "resultado": datos["resultado"],
+        "resultado_sin_desc": datos["resultado_sin_desc"],  # sin descuento
+        "ganancia_total": datos["ganancia_total"],
+        "segmento": segmento_nombre,
+        "descuento": descuento,
+        "tasa": datos["tasa"],
+        "fecha_tasa": datos["fecha_tasa"],
+        "cotizacion_token": datos["cotizacion_token"],
+        "cotizacion_validez": cotizacion_firmada.validez(),
+    })
+
+
+@login_required
+@require_POST
+def cotizar_operacion(request):
+    """
+    Cotiza una operación para el conversor (se llama en cada cambio del monto).
+
+    Sólo resuelve el segmento del cliente operativo y usa el libro de tasas en
+    memoria: a lo sumo dos consultas (clientes del usuario y, para firmar el
+    token, los ids de las monedas), sin cargar transacciones, límites ni medios
+    de acreditación como la página del simulador.
+
+    :param request: POST con "valor", "operacion", "origen" y "destino".
+    :type request: HttpRequest
+    :return: JsonResponse con resultado, tasa, segmento y token de la cotización,
+        o error 400 si la operación no es válida.
+    :rtype: JsonResponse
+    """
+    return _responder_cotizacion(request)
+
+
 @require_POST
 def verificar_limites(request):
     """
@@ -392,40 +441,11 @@ def verificar_limites(request):
         limite_diario = limite.limite_diario
         limite_mensual = limite.limite_mensual
 
-        # Fechas base
         hoy = localtime(now()).date()
-        inicio_mes = hoy.replace(day=1)
 
-        # Filtrar solo transacciones completadas del cliente operativo
-        transacciones_validas = Transaccion.objects.filter(
-            estado="confirmada",
-            cliente=cliente_operativo
-        )
-
-        # Calcular gasto diario y mensual
-        gasto_diario = transacciones_validas.filter(
-            fecha__date=hoy
-        ).aggregate(
-            total=Sum(
-                Case(
-                    When(tipo__iexact='venta', then=F('monto') * F('tasa_usada')),
-                    default=F('monto'),
-                    output_field=DecimalField()
-                )
-            )
-        )["total"] or 0
-
-        gasto_mensual = transacciones_validas.filter(
-            fecha__date__gte=inicio_mes
-        ).aggregate(
-            total=Sum(
-                Case(
-                    When(tipo__iexact='venta', then=F('monto') * F('tasa_usada')),
-                    default=F('monto'),
-                    output_field=DecimalField()
-                )
-            )
-        )["total"] or 0
+        # Gasto confirmado más reservas vigentes del cliente: el margen que
+        # consumo.reservar va a dejar usar (libro de consumo, una lectura por clave)
+        gasto_diario, gasto_mensual = consumo.comprometido(cliente_operativo.id, hoy)
 
         # Disponibles
         disponible_diario = limite_diario - gasto_diario
@@ -535,12 +555,23 @@ def set_cliente_operativo(request):
     return JsonResponse({"success": False, "error": "Petición inválida"}, status=400)
 
 
+def _ultima_actualizacion_par(request):
+    return obtener_libro().ultima_actualizacion_par(request.GET.get("origen"), request.GET.get("destino"))
+
+
+def _etag_par(request):
+    fecha = _ultima_actualizacion_par(request)
+    return fecha.isoformat() if fecha else None
+
+
+@condition(etag_func=_etag_par, last_modified_func=_ultima_actualizacion_par)
 def verificar_tasa(request):
     """
     Verifica la tasa de cambio entre dos monedas.
 
-    Devuelve la última tasa registrada entre el origen y destino,
-    junto con su fecha de actualización.
+    Devuelve la fecha de la última actualización registrada entre el origen
+    y destino, leída del libro de tasas en memoria. Admite GET condicional
+    (ETag / Last-Modified): si la tasa no cambió responde 304.
 
     :param request: Objeto HTTP con los parámetros "origen" y "destino".
     :type request: HttpRequest
@@ -549,14 +580,10 @@ def verificar_tasa(request):
     """
     origen = request.GET.get("origen")
     destino = request.GET.get("destino")
-    try:
-        tasa = TasaDeCambio.objects.filter(
-            moneda_origen__abreviacion=origen,
-            moneda_destino__abreviacion=destino
-        ).latest("fecha_actualizacion")
-        return JsonResponse({"fecha_tasa": tasa.fecha_actualizacion.isoformat()})
-    except TasaDeCambio.DoesNotExist:
+    fecha_tasa = obtener_libro().ultima_actualizacion_par(origen, destino)
+    if fecha_tasa is None:
         return JsonResponse({"error": "No hay tasa disponible"}, status=404)
+    return JsonResponse({"fecha_tasa": fecha_tasa.isoformat()})
 
 
 def hora_servidor(request):
@@ -625,12 +652,107 @@ def guardar_metodo_pago(request):
     return JsonResponse({"error": "Método no válido"}, status=400)
 
 
+def _limite_excedido(error):
+    """Respuesta (409) cuando la operación no entra en el límite del cliente."""
+    return JsonResponse({
+        "success": False,
+        "error": str(error),
+        "limite": error.periodo,
+        "disponible": float(error.disponible),
+    }, status=409)
+
+
+def _cotizacion_usada():
+    return JsonResponse({
+        "success": False,
+        "error": "La cotización ya se usó. Tiene que volver a calcular para otra operación.",
+    }, status=409)
+
+
+def _guardar_transaccion_firmada(usuario, data, token):
+    """
+    Guarda una transacción a partir de una cotización firmada por el simulador.
+
+    Par, tasa, monto, ganancia y cliente salen del token verificado, por lo que
+    no se consultan ``Moneda``, ``TasaDeCambio`` ni ``Cliente``. Al monto cotizado
+    se le suma la comisión del método de pago elegido. La transacción se crea
+    siempre ``pendiente`` (con su reserva de límites); si el token venció,
+    queda registrada como ``cancelada_cotizacion``. Un token ya usado
+    (``cotizacion_jti``) responde 409 sin crear otra transacción.
+    """
+    try:
+        datos = cotizacion_firmada.verificar(token)
+        estado = "pendiente"
+    except cotizacion_firmada.CotizacionInvalida:
+        return JsonResponse({"success": False, "error": "Cotización inválida"}, status=400)
+    except cotizacion_firmada.CotizacionVencida as vencida:
+        datos = vencida.datos
+        estado = "cancelada_cotizacion"
+
+    if datos["usuario_id"] != (usuario.id if usuario else None):
+        return JsonResponse({"success": False, "error": "La cotización no pertenece al usuario"}, status=403)
+
+    metodo_pago_id = data.get("metodo_pago_id") or data.get("metodo_pago")
+    if not metodo_pago_id:
+        return JsonResponse({"success": False, "error": "Falta el método de pago"}, status=400)
+    comisiones = list(MetodoPago.objects.filter(id=metodo_pago_id).values_list("comision", flat=True))
+    if not comisiones:
+        return JsonResponse({"success": False, "error": "Método de pago no encontrado"}, status=404)
+    monto = datos["monto"] + redondear(datos["monto"] * (comisiones[0] or 0) / 100)
+
+    if Transaccion.objects.filter(cotizacion_jti=datos["jti"]).exists():
+        return _cotizacion_usada()
+    try:
+        transaccion = Transaccion.objects.create(
+            usuario=usuario,
+            monto=monto,
+            tipo=datos["tipo"],
+            estado=estado,
+            moneda_origen_id=datos["moneda_origen_id"],
+            moneda_destino_id=datos["moneda_destino_id"],
+            tasa_usada=datos["tasa_usada"],
+            tasa_ref_id=datos["tasa_ref_id"],
+            cliente_id=datos["cliente_id"],
+            metodo_pago_id=metodo_pago_id,
+            ganancia=datos["ganancia"],
+            cotizacion_jti=datos["jti"],
+        )
+    except IntegrityError:
+        # Otro pedido con el mismo token ganó la carrera
+        if Transaccion.objects.filter(cotizacion_jti=datos["jti"]).exists():
+            return _cotizacion_usada()
+        raise
+    if estado == "cancelada_cotizacion":
+        return JsonResponse({
+            "success": False,
+            "id": transaccion.id,
+            "estado": transaccion.estado,
+            "error": "La cotización venció. Tiene que volver a calcular para usar la última tasa.",
+        }, status=409)
+    return JsonResponse({
+        "success": True,
+        "id": transaccion.id,
+        "estado": transaccion.estado,
+        "fecha": transaccion.fecha.strftime("%d/%m/%Y %H:%M"),
+        "cliente_nombre": datos["cliente_nombre"],
+    })
+
+
+@idempotente
 def guardar_transaccion(request):
     """
     Guarda una transacción en la base de datos.
 
-    Recibe los datos en JSON: monto, tipo, monedas, tasa, estado y cliente.
-    Asocia la transacción con el usuario autenticado y el cliente operativo.
+    Recibe en JSON el ``cotizacion_token`` emitido por el simulador y el
+    método de pago. Par, tasa, monto, ganancia y cliente se toman del token
+    firmado (ver ``_guardar_transaccion_firmada``), nunca de lo que manda el
+    navegador: sin token responde 400. La transacción se crea ``pendiente``.
+
+    Una transacción pendiente reserva su importe en los límites del cliente
+    (``operaciones.consumo``); si no entra responde 409 sin guardarla.
+
+    Con la cabecera ``Idempotency-Key`` un reintento recibe la respuesta del
+    primer intento sin crear otra transacción (ver ``global_exchange.idempotencia``).
 
     :param request: Objeto HTTP con los datos de la transacción.
     :type request: HttpRequest
@@ -642,72 +764,208 @@ def guardar_transaccion(request):
     except Exception as e:
         return JsonResponse({"success": False, "error": "JSON inválido", "detail": str(e)}, status=400)
 
+    token = data.get("cotizacion_token") if isinstance(data, dict) else None
+    if not token:
+        return JsonResponse(
+            {"success": False, "error": "Falta la cotización firmada (cotizacion_token)"}, status=400,
+        )
+
+    usuario = request.user if request.user.is_authenticated else None
     try:
-        usuario = request.user if request.user.is_authenticated else None
-        monto = Decimal(str(data.get("monto", "0")))
-        tipo = data.get("tipo")
-        estado = data.get("estado", "pendiente").lower()
-        moneda_origen_id = data.get("moneda_origen_id")
-        moneda_destino_id = data.get("moneda_destino_id")
-        tasa_usada = Decimal(str(data.get("tasa_usada", "0")))
-        tasa_ref_id = data.get("tasa_ref_id")
-        cliente_id = data.get("cliente_id")
-        metodo_pago_id = data.get("metodo_pago_id")
-        ganancia = Decimal(str(data.get("ganancia", "0")))
-
-        # Validación de campos obligatorios
-        if not (moneda_origen_id and moneda_destino_id and tasa_ref_id and cliente_id):
-            return JsonResponse({"success": False, "error": "Faltan campos obligatorios (incluye cliente_id)"}, status=400)
-
-        # Obtener instancias de los modelos
-        moneda_origen = Moneda.objects.get(id=moneda_origen_id)
-        moneda_destino = Moneda.objects.get(id=moneda_destino_id)
-        tasa_ref = TasaDeCambio.objects.get(id=tasa_ref_id)
-        cliente = Cliente.objects.get(id=cliente_id, estado="activo")
-
-        # Validar que el cliente pertenece al usuario
-        if usuario:
-            relacion = Usuario_Cliente.objects.filter(
-                id_usuario=usuario, 
-                id_cliente=cliente
-            ).exists()
-            if not relacion:
-                return JsonResponse({
-                    "success": False, 
-                    "error": "El cliente no está asociado al usuario"
-                }, status=403)
-
-        # Crear la transacción
-        transaccion = Transaccion.objects.create(
-            usuario=usuario,
-            monto=monto,
-            tipo=tipo,
-            estado=estado,
-            moneda_origen=moneda_origen,
-            moneda_destino=moneda_destino,
-            tasa_usada=tasa_usada,
-            tasa_ref=tasa_ref,
-            cliente=cliente,
-            metodo_pago_id=metodo_pago_id,
-            ganancia=ganancia,
+        return _guardar_transaccion_firmada(usuario, data, token)
+    except consumo.LimiteExcedido as e:
+        return _limite_excedido(e)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": "Error al guardar", "detail": str(e)}, status=500)
+
+
+#: Máximo de transacciones por pedido a ``guardar_transacciones_lote``.
+LOTE_MAXIMO = 1000
+
+#: Operación del simulador que corresponde a cada tipo guardado (ver ``_cotizar_operacion``).
+_OPERACION_SIMULADOR = {"compra": "venta", "venta": "compra"}
+
+
+def _leer_orden(dato):
+    """
+    Valida los campos de una orden del lote.
+
+    La tasa usada, la ganancia y el estado no se leen de la orden: los calcula
+    ``_cotizar_orden`` con la tasa referenciada y toda orden nueva es pendiente.
+
+    :return: Diccionario con los valores convertidos.
+    :raises ValueError: Con el mensaje de error de la orden.
+    """
+    if not isinstance(dato, dict):
+        raise ValueError("La orden debe ser un objeto")
+    ids = {}
+    for campo in ("moneda_origen_id", "moneda_destino_id", "tasa_ref_id", "cliente_id", "metodo_pago_id"):
+        try:
+            ids[campo] = int(dato.get(campo))
+        except (TypeError, ValueError):
+            raise ValueError("Faltan campos obligatorios (incluye cliente_id y metodo_pago_id)")
+    try:
+        monto = Decimal(str(dato.get("monto", "0")))
+    except InvalidOperation:
+        raise ValueError("Monto inválido")
+    if not monto.is_finite() or monto > MONTO_MAXIMO:
+        raise ValueError("Monto inválido")
+    if monto <= 0:
+        raise ValueError("El monto debe ser mayor a cero")
+    tipo = (dato.get("tipo") or "").lower()
+    if tipo == "cambio":
+        raise ValueError("Las operaciones de cambio se guardan con cotización firmada (guardar_transaccion)")
+    if tipo not in _OPERACION_SIMULADOR:
+        raise ValueError("Tipo de operación inválido")
+    return {**ids, "monto": monto, "tipo": tipo, "estado": "pendiente"}
+
+
+def _cotizar_orden(orden, tasa, monedas, descuento, libro):
+    """
+    Tasa usada y ganancia de una orden del lote, con la tasa que referencia.
+
+    Como en el simulador, las tasas van de ``MONEDA_BASE`` a la moneda
+    extranjera: una compra (el cliente entrega guaraníes) usa la tasa
+    ``origen → destino`` y una venta la ``destino → origen``. La tasa debe
+    ser la vigente del par en el libro de tasas, no una anterior.
+
+    :return: Tupla (tasa_usada, ganancia).
+    :raises ValueError: Si la tasa no es la del par de la orden o no es la vigente.
+    """
+    origen, destino = orden["moneda_origen_id"], orden["moneda_destino_id"]
+    par = (origen, destino) if orden["tipo"] == "compra" else (destino, origen)
+    if (tasa.moneda_origen_id, tasa.moneda_destino_id) != par or monedas[par[0]].abreviacion != MONEDA_BASE:
+        raise ValueError("La tasa de cambio no corresponde al par de monedas")
+    vigente = libro.actual(monedas[par[0]].abreviacion, monedas[par[1]].abreviacion)
+    if not tasa.estado or tasa.vigencia > now() or vigente is None or vigente.id != tasa.id:
+        raise ValueError("La tasa de cambio no está vigente")
+    try:
+        calculo = calcular(cotizar_tasa(tasa, descuento), _OPERACION_SIMULADOR[orden["tipo"]], orden["monto"])
+    except InvalidOperation:
+        calculo = None
+    if calculo is None:
+        raise ValueError("No hay cotización disponible")
+    return calculo.tasa, calculo.ganancia
+
+
+@login_required
+@require_POST
+@idempotente
+def guardar_transacciones_lote(request):
+    """
+    Guarda un lote de transacciones en un solo pedido (cajas asociadas y
+    tauser, p. ej. la carga de fin de día).
+
+    Recibe ``{"transacciones": [...]}`` con, por orden, ``monto``, ``tipo``
+    (compra o venta), ``moneda_origen_id``, ``moneda_destino_id``,
+    ``tasa_ref_id``, ``cliente_id`` y ``metodo_pago_id``. La tasa usada y la
+    ganancia se calculan en el servidor con la tasa referenciada (que debe ser
+    la vigente del par en el libro de tasas) y el descuento del segmento del
+    cliente; las órdenes se guardan siempre como pendientes.
+
+    Las validaciones son por conjunto: una consulta para todas las monedas,
+    una para las tasas, una para los clientes activos (con su segmentación),
+    una para sus relaciones con el usuario y una para los métodos de pago.
+    Las órdenes válidas se insertan juntas con ``consumo.guardar_lote``
+    (reservas de límites incluidas) en una sola transacción de base de datos.
+
+    Cada orden tiene su resultado, en el mismo orden del lote: una orden
+    inválida o sin margen en el límite no impide guardar las demás.
+
+    :param request: Objeto HTTP con el lote en JSON.
+    :type request: HttpRequest
+    :return: JsonResponse con ``resultados`` por orden (``indice``, ``success``
+        y ``id``/``estado``/``fecha`` o ``error``).
+    :rtype: JsonResponse
+    """
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        ordenes = data["transacciones"]
+    except Exception as e:
+        return JsonResponse({"success": False, "error": "JSON inválido", "detail": str(e)}, status=400)
+    if not isinstance(ordenes, list) or not ordenes:
+        return JsonResponse({"success": False, "error": "Se espera una lista de transacciones"}, status=400)
+    if len(ordenes) > LOTE_MAXIMO:
+        return JsonResponse(
+            {"success": False, "error": f"El lote supera el máximo de {LOTE_MAXIMO} transacciones"}, status=400,
         )
 
-        return JsonResponse({
+    usuario = request.user
+    resultados = [None] * len(ordenes)
+    leidas = {}
+    for indice, dato in enumerate(ordenes):
+        try:
+            leidas[indice] = _leer_orden(dato)
+        except ValueError as e:
+            resultados[indice] = {"indice": indice, "success": False, "error": str(e)}
+
+    def ids(*campos):
+        return {orden[campo] for orden in leidas.values() for campo in campos}
+
+    monedas = Moneda.objects.in_bulk(ids("moneda_origen_id", "moneda_destino_id"))
+    tasas = TasaDeCambio.objects.select_related("moneda_destino").in_bulk(ids("tasa_ref_id"))
+    clientes = Cliente.objects.filter(estado="activo").select_related("segmentacion").in_bulk(ids("cliente_id"))
+    asociados = set(
+        Usuario_Cliente.objects
+        .filter(id_usuario=usuario, id_cliente__in=clientes)
+        .values_list("id_cliente_id", flat=True)
+    )
+    metodos = MetodoPago.objects.in_bulk(ids("metodo_pago_id"))
+    libro = obtener_libro()
+
+    nuevas, posiciones = [], []
+    for indice, orden in leidas.items():
+        if orden["moneda_origen_id"] not in monedas or orden["moneda_destino_id"] not in monedas:
+            error = "Moneda no encontrada"
+        elif orden["tasa_ref_id"] not in tasas:
+            error = "Tasa de cambio no encontrada"
+        elif orden["cliente_id"] not in clientes:
+            error = "Cliente no encontrado o inactivo"
+        elif orden["cliente_id"] not in asociados:
+            error = "El cliente no está asociado al usuario"
+        elif orden["metodo_pago_id"] not in metodos:
+            error = "Método de pago no encontrado"
+        else:
+            descuento, _ = segmento_cliente(clientes[orden["cliente_id"]])
+            try:
+                tasa_usada, ganancia = _cotizar_orden(orden, tasas[orden["tasa_ref_id"]], monedas, descuento, libro)
+            except ValueError as e:
+                error = str(e)
+            else:
+                nuevas.append(Transaccion(usuario=usuario, tasa_usada=tasa_usada, ganancia=ganancia, **orden))
+                posiciones.append(indice)
+                continue
+        resultados[indice] = {"indice": indice, "success": False, "error": error}
+
+    try:
+        guardadas, rechazadas = consumo.guardar_lote(nuevas)
+    except Exception as e:
+        return JsonResponse({"success": False, "error": "Error al guardar", "detail": str(e)}, status=500)
+
+    for posicion, error in rechazadas.items():
+        resultados[posiciones[posicion]] = {
+            "indice": posiciones[posicion],
+            "success": False,
+            "error": str(error),
+            "limite": error.periodo,
+            "disponible": float(error.disponible),
+        }
+    aceptadas = (indice for posicion, indice in enumerate(posiciones) if posicion not in rechazadas)
+    for indice, transaccion in zip(aceptadas, guardadas):
+        resultados[indice] = {
+            "indice": indice,
             "success": True,
             "id": transaccion.id,
             "estado": transaccion.estado,
-            "fecha": transaccion.fecha.strftime("%d/%m/%Y %H:%M"),
-            "cliente_nombre": cliente.nombre,
-        })
+            "fecha": localtime(transaccion.fecha).strftime("%d/%m/%Y %H:%M"),
+        }
 
-    except Moneda.DoesNotExist:
-        return JsonResponse({"success": False, "error": "Moneda no encontrada"}, status=404)
-    except TasaDeCambio.DoesNotExist:
-        return JsonResponse({"success": False, "error": "Tasa de cambio no encontrada"}, status=404)
-    except Cliente.DoesNotExist:
-        return JsonResponse({"success": False, "error": "Cliente no encontrado o inactivo"}, status=404)
-    except Exception as e:
-        return JsonResponse({"success": False, "error": "Error al guardar", "detail": str(e)}, status=500)
+    return JsonResponse({
+        "success": True,
+        "guardadas": len(guardadas),
+        "rechazadas": len(ordenes) - len(guardadas),
+        "resultados": resultados,
+    })
 
 
 def actualizar_estado_transaccion(request):
@@ -745,6 +1003,8 @@ def actualizar_estado_transaccion(request):
 
         except Transaccion.DoesNotExist:
             return JsonResponse({"success": False, "error": "Transacción no encontrada"}, status=404)
+        except consumo.LimiteExcedido as e:
+            return _limite_excedido(e)
         except Exception as e:
             return JsonResponse({"success": False, "error": "Error al actualizar", "detail": str(e)}, status=500)
 
@@ -755,6 +1015,7 @@ from django.conf import settings
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 @csrf_exempt
+@idempotente
 def crear_pago_stripe(request):
     """
     Crea un PaymentIntent en Stripe para procesar un pago.
@@ -792,6 +1053,9 @@ def crear_pago_stripe(request):
             // Usar data.client_secret con Stripe.js para confirmar el pago
         });
 
+    Con la cabecera ``Idempotency-Key`` un reintento recibe la misma respuesta
+    sin crear otro PaymentIntent (ver ``global_exchange.idempotencia``).
+
     Requiere:
         - Tener configurada la variable STRIPE_SECRET_KEY en settings.py
         - Tener instalada y configurada la librería stripe (pip install stripe)
@@ -801,10 +1065,14 @@ def crear_pago_stripe(request):
             total = int(request.POST.get("total", 0))
             moneda = "pyg"
 
+            # La misma clave evita también un PaymentIntent duplicado del lado de Stripe
+            clave = request.headers.get("Idempotency-Key")
+            dueno = idempotencia.alcance(request)
             payment_intent = stripe.PaymentIntent.create(
                 amount=total,
                 currency=moneda,
-                automatic_payment_methods={"enabled": True}
+                automatic_payment_methods={"enabled": True},
+                **({"idempotency_key": f"{dueno}:{clave}"} if clave and dueno else {}),
             )
 
             return JsonResponse({"client_secret": payment_intent.client_secret})
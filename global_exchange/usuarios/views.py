@@ -24,6 +24,7 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib import messages
 from .tokens import account_activation_token
 import json
+from decimal import Decimal, InvalidOperation
 from collections import namedtuple
 from django.urls import reverse
 from django.utils.http import urlencode
@@ -31,6 +32,9 @@ from django.http import JsonResponse
 from django.utils.timezone import now
 from monedas.models import Moneda
 from cotizaciones.models import TasaDeCambio
+from cotizaciones.cotizador import MONTO_MAXIMO, calcular, cotizar, redondear
+from cotizaciones.velas import serie_grafico
+from cotizaciones.libro_tasas import obtener_libro
 from datetime import datetime
 from .models import CustomUser,BackupCode
 from .forms import UserRolePermissionForm
@@ -61,35 +65,9 @@ def home(request):
     # === DATOS DESDE LA BD ===
     monedas = list(Moneda.objects.filter(estado=True).values("abreviacion", "nombre"))
 
-    # Tasas de cambio vigentes (por simplicidad: tomo la más reciente por cada moneda_destino)
-    tasas = (
-        TasaDeCambio.objects
-        .filter(estado=True)
-        .select_related("moneda_origen", "moneda_destino")
-        .order_by("moneda_destino", "-vigencia")
-    )
-    print("tasas:", tasas, flush=True)
-
-
-    # Reorganizar datos en un dict similar a tu data_por_moneda
-    data_por_moneda = {}
-    for tasa in tasas:
-        abrev = tasa.moneda_destino.abreviacion
-        if abrev not in data_por_moneda:
-            data_por_moneda[abrev] = []
-        # Insertar al inicio para que el primero sea el más reciente
-        data_por_moneda[abrev].insert(0, {
-            "fecha": tasa.vigencia,
-            #"compra": float(tasa.monto_compra),
-            #"venta": float(tasa.monto_venta),
-            "comision_compra": float(tasa.comision_compra),
-            "comision_venta": float(tasa.comision_venta)
-        })
-
-    print("data_por_moneda:", data_por_moneda, flush=True)
+    # Tasas de cambio activas desde el libro de tasas en memoria (el más reciente al final)
+    libro = obtener_libro()
 
-
-    
     # === SEGMENTACIÓN SEGÚN USUARIO ===
     descuento = 0
     segmento_nombre = "Sin Clientes"
@@ -121,38 +99,21 @@ def home(request):
 
 
     # Reorganizar datos en un dict similar a tu data_por_moneda
-    data_por_moneda = {}
-    for tasa in tasas:
-        abrev = tasa.moneda_destino.abreviacion
-        if abrev not in data_por_moneda:
-            data_por_moneda[abrev] = []
-            
-        # PB_MONEDA según operación
-        #PB_MONEDA_VTA = float(tasa.monto_venta)
-        #PB_MONEDA_COMP = float(tasa.monto_compra)
-        
-        # Calculamos tasas según fórmula
-        #TC_VTA = PB_MONEDA_VTA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-        #TC_COMP = PB_MONEDA_COMP - (COMISION_COM - (COMISION_COM * descuento / 100))
-        
-        # PB_MONEDA según operación
-        PB_MONEDA = float(tasa.precio_base)
-        print("PB_MONEDA en pagina_Aterrizaje", PB_MONEDA, flush=True)
-        # Calculamos tasas según fórmula
-        COMISION_VTA = float(tasa.comision_venta or 0)
-        COMISION_COM = float(tasa.comision_compra or 0)
-        TC_VTA = PB_MONEDA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-        TC_COMP = PB_MONEDA - (COMISION_COM - (COMISION_COM * descuento / 100))
-
-        # Insertar al inicio para que el primero sea el más reciente
-        data_por_moneda[abrev].insert(0, {
-            "fecha": tasa.vigencia,
-            "compra": round(TC_VTA, 2),
-            "venta": round(TC_COMP, 2),
-            "comision_compra": float(tasa.comision_compra),
-            "comision_venta": float(tasa.comision_venta),
-            "precio_base": float(tasa.precio_base)
-        })
+    # (cierres diarios cotizados con el descuento del cliente; el último es la cotización vigente)
+    data_por_moneda = {
+        abrev: [
+            {
+                "fecha": cot.vigencia,
+                "compra": float(redondear(cot.venta)),
+                "venta": float(redondear(cot.compra)),
+                "comision_compra": float(cot.comision_compra),
+                "comision_venta": float(cot.comision_venta),
+                "precio_base": float(cot.precio_base)
+            }
+            for cot in historial
+        ]
+        for abrev, historial in serie_grafico(libro, descuento).items()
+    }
 
     print("data_por_moneda:", data_por_moneda, flush=True)
     
@@ -169,66 +130,27 @@ def home(request):
             moneda_seleccionada = origen
 
         try:
-            valor = float(valor_input)
-            if valor <= 0:
-                resultado = "Monto inválido"
-                COMISION_VTA = 0
-                COMISION_COM = 0
-            else:
-                # === OBTENER PB_MONEDA DE LA FECHA MÁS RECIENTE ===
-                registros = data_por_moneda.get(moneda_seleccionada, [])
-                print("registros sin ordenar:", registros, flush=True)
-                if not registros:
-                    resultado = "No hay cotización disponible" # no hay cotización, no mostrar nada
-                    ganancia_total = 0
-                    COMISION_VTA = 0
-                    COMISION_COM = 0
-                else:
-                    
-                    if registros:
-                        print("entro",registros, flush=True)
-                        registros_ordenados = sorted(
-                            registros,
-                            key=lambda x: x["fecha"],
-                            reverse=True
-                        )
-                        ultimo = registros_ordenados[0]
-                        print(f"Registros ordenados: {registros_ordenados}", flush=True)
-                        print(f"Ultimo {ultimo}", flush=True)
-                        print("registrohome:", registros_ordenados, flush=True)
-                        PB_MONEDA = ultimo.get("precio_base", 0)  # siempre usar precio_base
-                        COMISION_VTA = ultimo["comision_venta"]
-                        COMISION_COM = ultimo["comision_compra"]
-                        print("PB_MONEDA en if registros:", PB_MONEDA, flush=True)
-                        print("COMISION_VTA en if registros:", COMISION_VTA, flush=True)
-                        print("COMISION_COM en if registros:", COMISION_COM, flush=True)
-                    else:
-                        PB_MONEDA = 0
-                        COMISION_VTA = 0
-                        COMISION_COM = 0
-                    print("PB_MONEDA:", PB_MONEDA,flush=True)
-                    print("COMISION_VTA:", COMISION_VTA,flush=True)
-                    print("COMISION_COM:", COMISION_COM,flush=True)
-                    # === CÁLCULOS ===
-                    print("operacion:", operacion,flush=True)
-                    if operacion == "venta":  # Vender PYG → otra moneda
-                        TC_VTA = PB_MONEDA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-                        resultado = round(valor / TC_VTA, 2)
-                        ganancia_total = round(valor - (resultado * PB_MONEDA), 2)
-                        print("COMISION_VTA:", COMISION_VTA, flush=True)
-                        print("descuento:", descuento, flush=True)
-                    else:  # Compra: otra moneda → PYG
-                        TC_COMP = PB_MONEDA - (COMISION_COM - (COMISION_COM * descuento / 100))
-                        print("TC_COMP:", TC_COMP, flush=True)
-                        print("PB_MONEDA:", PB_MONEDA, flush=True)
-                        print("COMISION_COM:", COMISION_COM, flush=True)
-                        print("descuento:", descuento, flush=True)
-                        resultado = round(valor * TC_COMP, 2)
-                        ganancia_total = round(valor * (COMISION_COM * (1 - descuento / 100)), 2)
-        except ValueError:
+            valor = Decimal(valor_input)
+        except InvalidOperation:
+            valor = None
+
+        COMISION_VTA = 0
+        COMISION_COM = 0
+        if valor is None or not valor.is_finite() or valor <= 0 or valor > MONTO_MAXIMO:
             resultado = "Monto inválido"
-            COMISION_VTA = 0
-            COMISION_COM = 0
+        else:
+            # === COTIZACIÓN VIGENTE DE LA MONEDA SELECCIONADA ===
+            cotizacion = cotizar(libro, descuento).get(moneda_seleccionada)
+            calculo = calcular(cotizacion, operacion, valor) if cotizacion else None
+            if calculo is None:
+                resultado = "No hay cotización disponible" # no hay cotización, no mostrar nada
+                ganancia_total = 0
+            else:
+                COMISION_VTA = float(cotizacion.comision_venta)
+                COMISION_COM = float(cotizacion.comision_compra)
+                resultado = float(calculo.resultado)
+                ganancia_total = float(calculo.ganancia)
+                print("operacion:", operacion, "resultado:", resultado, flush=True)
 
         # Respuesta AJAX
         if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -511,17 +433,10 @@ def pagina_aterrizaje(request):
     # === Obtener monedas activas ===
     monedas = Moneda.objects.filter(estado=True)
 
-    # === Obtener tasas de cambio ordenadas por moneda_destino y vigencia desc ===
-    tasas = (
-        TasaDeCambio.objects
-        .filter(estado=True)
-        .select_related("moneda_origen", "moneda_destino")
-        .order_by("moneda_destino__abreviacion", "-vigencia")
-    )
+    # === Tasas de cambio activas desde el libro de tasas en memoria ===
+    libro = obtener_libro()
     
     # Comisiones y descuento por segmentacion de clientes
-    COMISION_VTA = None
-    COMISION_COM = None
     descuento = 0
     # === SEGMENTACIÓN SEGÚN USUARIO ===
     if request.user.is_authenticated:  # solo si está logueado
@@ -531,34 +446,23 @@ def pagina_aterrizaje(request):
             descuento = float(cliente_operativo.segmentacion.descuento)
 
 
-    # === Reorganizar datos en dict por moneda_destino ===
-    data_por_moneda = {}
-    for tasa in tasas:
-        abrev = tasa.moneda_destino.abreviacion
-        if abrev not in data_por_moneda:
-            data_por_moneda[abrev] = []
-            
-        # PB_MONEDA según operación
-        PB_MONEDA = float(tasa.precio_base)
-        print("PB_MONEDA en pagina_Aterrizaje", PB_MONEDA, flush=True)
-        # Calculamos tasas según fórmula
-        COMISION_VTA = float(tasa.comision_venta or 0)
-        COMISION_COM = float(tasa.comision_compra or 0)
-        TC_VTA = PB_MONEDA + COMISION_VTA - (COMISION_VTA * descuento / 100)
-        TC_COMP = PB_MONEDA - (COMISION_COM - (COMISION_COM * descuento / 100))
-
-        print("TC_VTA en pagina_Aterrizaje", TC_VTA, flush=True)
-        print("TC_COMP en pagina_Aterrizaje", TC_COMP, flush=True)
-
-        # Insertar al inicio para que el primero sea el más reciente
-        data_por_moneda[abrev].insert(0, {
-            "fecha": tasa.vigencia,
-            "compra": round(TC_COMP, 2),
-            "venta": round(TC_VTA, 2),
-            "comision_compra": float(tasa.comision_compra),
-            "comision_venta": float(tasa.comision_venta),
-            "precio_base": float(tasa.precio_base)
-        })
+    # === Reorganizar datos en dict por moneda_destino (ordenado por abreviación) ===
+    # Cierres de las últimas velas diarias; el último punto es la cotización vigente
+    historial_cotizado = serie_grafico(libro, descuento)
+    data_por_moneda = {
+        abrev: [
+            {
+                "fecha": cot.vigencia,
+                "compra": float(redondear(cot.compra)),
+                "venta": float(redondear(cot.venta)),
+                "comision_compra": float(cot.comision_compra),
+                "comision_venta": float(cot.comision_venta),
+                "precio_base": float(cot.precio_base)
+            }
+            for cot in historial_cotizado[abrev]
+        ]
+        for abrev in sorted(historial_cotizado)
+    }
 
     print("data_por_moneda aterrizaje:", data_por_moneda, flush=True)
     